@@ -5,9 +5,10 @@
 import logging
 from typing import List
 from uuid import UUID
-from fastapi import APIRouter, Depends, HTTPException, status, Query
+from fastapi import APIRouter, Depends, HTTPException, status, Query, Request
 from sqlalchemy.orm import Session
 
+from app.core.cache import cached_response
 from app.core.database.connection import get_db
 from app.api.v1.services.category_service import CategoryService
 from app.api.v1.schemas.category import (
@@ -47,24 +48,14 @@ async def get_categories(
     """
     categories = category_service.get_categories(include_inactive)
     
-    # Преобразуем в схему ответа с подсчетом уровня вложенности
+    # Уровни вложенности (по замыканию иерархии) и количество товаров -
+    # по одному запросу на весь список
+    levels = category_service.get_category_levels()
+    products_counts = category_service.get_products_counts()
+    
+    # Преобразуем в схему ответа
     items = []
     for category in categories:
-        # Определяем уровень вложенности
-        level = 0
-        current_cat = category
-        while current_cat.parent_id:
-            level += 1
-            current_cat = category_service.get_category_by_id(current_cat.parent_id)
-            if not current_cat:
-                break
-        
-        # Подсчитываем товары в категории
-        from app.database.models import Product as ProductModel
-        products_count = category_service.db.query(ProductModel).filter(
-            ProductModel.category_id == category.id
-        ).count()
-        
         item = CategoryListItem(
             id=category.id,
             name=category.name,
@@ -72,8 +63,8 @@ async def get_categories(
             parent_id=category.parent_id,
             sort_order=category.sort_order,
             is_active=category.is_active,
-            products_count=products_count,
-            level=level,
+            products_count=products_counts.get(category.id, 0),
+            level=levels.get(category.id, 0),
             created_at=category.created_at,
             updated_at=category.updated_at
         )
@@ -84,6 +75,7 @@ async def get_categories(
 
 @router.get("/tree", response_model=List[CategoryTree], summary="Дерево категорий")
 async def get_category_tree(
+    request: Request,
     include_inactive: bool = Query(False, description="Включать неактивные категории"),
     current_user: UserModel = Depends(get_current_active_user),
     category_service: CategoryService = Depends(get_category_service)
@@ -98,8 +90,15 @@ async def get_category_tree(
     - Основную информацию
     - Количество товаров
     - Массив дочерних категорий
+    
+    Ответ содержит ETag; при совпадении If-None-Match возвращается 304.
     """
-    return category_service.get_category_tree(include_inactive)
+    return cached_response(
+        request,
+        ("categories",),
+        category_service.get_tree_watermark(),
+        lambda: category_service.get_category_tree(include_inactive)
+    )
 
 
 @router.get("/{category_id}", response_model=Category, summary="Информация о категории")
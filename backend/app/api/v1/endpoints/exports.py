@@ -0,0 +1,64 @@
+"""
+Эндпоинты выгрузки данных.
+"""
+
+import logging
+from datetime import date
+from typing import Optional
+from uuid import UUID
+from fastapi import APIRouter, Depends, Query
+from sqlalchemy.orm import Session
+
+from app.core.database.connection import get_db
+from app.api.v1.services.export_service import ExportService
+from app.api.v1.schemas.export import ExportEntity, ExportFormat
+from app.api.v1.dependencies import get_current_active_user
+from app.database.models import User as UserModel
+
+logger = logging.getLogger(__name__)
+
+router = APIRouter()
+
+
+@router.get("/workbook", summary="Выгрузка в книгу Excel")
+async def export_workbook(
+    product_id: Optional[UUID] = Query(None, description="Фильтр по товару"),
+    date_from: Optional[date] = Query(None, description="Дата начала периода прогнозов"),
+    date_to: Optional[date] = Query(None, description="Дата окончания периода прогнозов"),
+    current_user: UserModel = Depends(get_current_active_user),
+    db: Session = Depends(get_db)
+):
+    """
+    Книга Excel с листами товаров, остатков и прогнозов.
+    
+    Строки читаются из БД серверным курсором и сразу записываются на лист, книга
+    не собирается в памяти.
+    """
+    return ExportService(db).workbook_response(product_id, date_from, date_to)
+
+
+@router.get("/{entity}", summary="Выгрузка данных")
+async def export_data(
+    entity: ExportEntity,
+    format: ExportFormat = Query(ExportFormat.CSV, description="Формат файла"),
+    gzip: bool = Query(False, description="Сжать CSV gzip"),
+    
+    # Параметры фильтрации
+    product_id: Optional[UUID] = Query(None, description="Фильтр по товару"),
+    date_from: Optional[date] = Query(None, description="Дата начала периода (продажи, прогнозы)"),
+    date_to: Optional[date] = Query(None, description="Дата окончания периода (продажи, прогнозы)"),
+    
+    # Зависимости
+    current_user: UserModel = Depends(get_current_active_user),
+    db: Session = Depends(get_db)
+):
+    """
+    Потоковая выгрузка товаров, остатков, продаж или прогнозов в CSV, Parquet,
+    Arrow или Excel.
+    
+    Parquet и Arrow содержат типизированные колонки (числа, даты, суммы
+    DECIMAL) и читаются BI-инструментами без разбора текста.
+    """
+    service = ExportService(db)
+    query = service.get_query(entity, product_id, date_from, date_to)
+    return service.response(query, entity.value, format, gzip)
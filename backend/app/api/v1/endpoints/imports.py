@@ -0,0 +1,98 @@
+"""
+Эндпоинты фонового импорта данных.
+"""
+
+import logging
+from typing import List
+from uuid import UUID
+from fastapi import APIRouter, Depends, File, Form, Query, UploadFile, status
+from fastapi.concurrency import run_in_threadpool
+from sqlalchemy.orm import Session
+
+from app.core.database.connection import get_db
+from app.api.v1.services.import_job_service import ImportJobService, submit_import_job
+from app.api.v1.services.import_readers import detect_file_format
+from app.api.v1.services.import_service import ImportService
+from app.api.v1.schemas.import_data import ImportPreview, ImportStatus
+from app.api.v1.dependencies import require_manager
+from app.database.models import User as UserModel
+
+logger = logging.getLogger(__name__)
+
+router = APIRouter()
+
+
+def get_import_job_service(db: Session = Depends(get_db)) -> ImportJobService:
+    """Получение сервиса задач импорта."""
+    return ImportJobService(db)
+
+
+@router.post(
+    "/products",
+    response_model=ImportStatus,
+    status_code=status.HTTP_202_ACCEPTED,
+    summary="Запуск импорта товаров из файла"
+)
+async def create_product_import(
+    file: UploadFile = File(..., description="Файл CSV, Excel, JSON, Parquet или Arrow"),
+    update_existing: bool = Form(False, description="Обновлять существующие товары"),
+    current_user: UserModel = Depends(require_manager),
+    service: ImportJobService = Depends(get_import_job_service)
+):
+    """
+    Запуск импорта товаров.
+    
+    Файл сохраняется на сервере и обрабатывается в фоне пакетами. Ход импорта
+    отслеживается по GET /imports/{job_id}.
+    """
+    job = await service.create_job(file, current_user.id, update_existing)
+    submit_import_job(job.id)
+    return service.to_status(job)
+
+
+@router.post(
+    "/products/preview",
+    response_model=ImportPreview,
+    summary="Предварительная проверка импорта товаров"
+)
+async def preview_product_import(
+    file: UploadFile = File(..., description="Файл CSV, Excel, JSON, Parquet или Arrow"),
+    update_existing: bool = Form(False, description="Обновлять существующие товары"),
+    current_user: UserModel = Depends(require_manager),
+    db: Session = Depends(get_db)
+):
+    """
+    Тестовый запуск импорта без сохранения (dry-run).
+    
+    Возвращает количество валидных и невалидных строк, ошибки валидации
+    и образец данных. Проверка выполняется вне цикла событий.
+    """
+    file_format = detect_file_format(file.filename)
+    await file.seek(0)
+    return await run_in_threadpool(
+        ImportService(db).preview_products_stream, file.file, file_format, update_existing
+    )
+
+
+@router.get("/", response_model=List[ImportStatus], summary="Последние задачи импорта")
+async def get_imports(
+    limit: int = Query(20, ge=1, le=100, description="Количество задач"),
+    current_user: UserModel = Depends(require_manager),
+    service: ImportJobService = Depends(get_import_job_service)
+):
+    """Получение последних задач импорта текущего пользователя."""
+    return [service.to_status(job) for job in service.get_jobs(current_user.id, limit)]
+
+
+@router.get("/{job_id}", response_model=ImportStatus, summary="Статус задачи импорта")
+async def get_import(
+    job_id: UUID,
+    current_user: UserModel = Depends(require_manager),
+    service: ImportJobService = Depends(get_import_job_service)
+):
+    """
+    Получение статуса, прогресса и результата задачи импорта.
+    
+    Задачи других пользователей доступны только администратору.
+    """
+    return service.to_status(service.get_job(job_id, current_user))
@@ -5,22 +5,26 @@
 import logging
 from typing import List
 from uuid import UUID
-from fastapi import APIRouter, Depends, HTTPException, status, Query
+from fastapi import APIRouter, Depends, HTTPException, status, Query, Request
 from sqlalchemy.orm import Session
 
+from app.core.cache import cached_response
 from app.core.database.connection import get_db
 from app.api.v1.services.product_service import ProductService
+from app.api.v1.services.export_service import ExportService
 from app.api.v1.schemas.product import (
     Product, ProductCreate, ProductUpdate, ProductListItem, 
-    ProductFilters, ProductBulkUpdate
+    ProductFilters, ProductBulkUpdate, ProductFacets,
+    ProductBulkCreate, ProductBulkCreateResult
 )
+from app.api.v1.schemas.export import ExportFormat
 from app.api.v1.schemas.common import (
     PaginationParams, PaginatedResponse, SuccessResponse
 )
 from app.api.v1.dependencies import (
     get_current_active_user, require_operator, require_manager
 )
-from app.database.models import User as UserModel
+from app.database.models import User as UserModel, Product as ProductModel
 
 logger = logging.getLogger(__name__)
 
@@ -32,22 +36,43 @@ def get_product_service(db: Session = Depends(get_db)) -> ProductService:
     return ProductService(db)
 
 
-@router.get("", response_model=PaginatedResponse, summary="Список товаров")
-async def get_products(
-    # Параметры пагинации
-    page: int = Query(1, ge=1, description="Номер страницы"),
-    size: int = Query(20, ge=1, le=100, description="Размер страницы"),
-    
-    # Параметры фильтрации
+def get_product_filters(
     search: str = Query(None, description="Поиск по названию, артикулу или описанию"),
     category_id: UUID = Query(None, description="Фильтр по категории"),
+    include_descendants: bool = Query(False, description="Включать товары подкатегорий"),
     supplier_id: UUID = Query(None, description="Фильтр по поставщику"),
     status: str = Query(None, description="Фильтр по статусу"),
     stock_status: str = Query(None, description="Фильтр по статусу остатков"),
     min_price: float = Query(None, ge=0, description="Минимальная цена"),
     max_price: float = Query(None, ge=0, description="Максимальная цена"),
     low_stock: bool = Query(None, description="Только товары с низким остатком"),
-    out_of_stock: bool = Query(None, description="Только товары без остатков"),
+    out_of_stock: bool = Query(None, description="Только товары без остатков")
+) -> ProductFilters:
+    """Параметры фильтрации списка товаров из query-строки."""
+    return ProductFilters(
+        search=search,
+        category_id=category_id,
+        include_descendants=include_descendants,
+        supplier_id=supplier_id,
+        status=status,
+        stock_status=stock_status,
+        min_price=min_price,
+        max_price=max_price,
+        low_stock=low_stock,
+        out_of_stock=out_of_stock
+    )
+
+
+@router.get("", response_model=PaginatedResponse, summary="Список товаров")
+async def get_products(
+    request: Request,
+    
+    # Параметры пагинации
+    page: int = Query(1, ge=1, description="Номер страницы"),
+    size: int = Query(20, ge=1, le=100, description="Размер страницы"),
+    
+    # Параметры фильтрации
+    filters: ProductFilters = Depends(get_product_filters),
     
     # Параметры сортировки
     sort_by: str = Query("created_at", description="Поле для сортировки"),
@@ -63,6 +88,7 @@ async def get_products(
     Поддерживаемые фильтры:
     - **search**: Поиск по названию, артикулу или описанию
     - **category_id**: Фильтр по категории
+    - **include_descendants**: Вместе с category_id - товары всех подкатегорий
     - **supplier_id**: Фильтр по поставщику
     - **status**: Фильтр по статусу (active, inactive, discontinued)
     - **stock_status**: Фильтр по статусу остатков
@@ -72,78 +98,109 @@ async def get_products(
     
     Поддерживаемые поля для сортировки:
     - name, sku, unit_price, created_at, updated_at
+    - total_quantity, reserved_quantity (по сводным остаткам)
+    
+    Ответ содержит ETag; при совпадении If-None-Match возвращается 304.
     """
     pagination = PaginationParams(page=page, size=size)
-    filters = ProductFilters(
-        search=search,
-        category_id=category_id,
-        supplier_id=supplier_id,
-        status=status,
+    filters.sort_by = sort_by
+    filters.sort_order = sort_order
+    
+    def build_response() -> PaginatedResponse:
+        products, total = product_service.get_products(pagination, filters)
+        items = [_build_product_list_item(product) for product in products]
+        return PaginatedResponse.create(items, total, page, size)
+    
+    return cached_response(
+        request,
+        ("products", "categories"),
+        product_service.get_products_watermark(),
+        build_response
+    )
+
+
+def _build_product_list_item(product: ProductModel) -> ProductListItem:
+    """Преобразование товара в элемент списка."""
+    # Остатки берем из сводки, которую поддерживают триггеры на inventory
+    summary = product.stock_summary
+    total_quantity = summary.total_quantity if summary else 0
+    stock_status = summary.stock_status if summary else "out_of_stock"
+    
+    return ProductListItem(
+        id=product.id,
+        name=product.name,
+        sku=product.sku,
+        unit_price=product.unit_price,
+        status=product.status,
+        category={
+            "id": product.category.id,
+            "name": product.category.name,
+            "description": product.category.description,
+            "parent_id": product.category.parent_id
+        } if product.category else None,
+        supplier={
+            "id": product.supplier.id,
+            "name": product.supplier.name,
+            "code": product.supplier.code,
+            "contact_person": product.supplier.contact_person,
+            "email": product.supplier.email,
+            "phone": product.supplier.phone,
+            "rating": product.supplier.rating
+        } if product.supplier else None,
+        tags=[{
+            "id": tag.id,
+            "name": tag.name,
+            "color": tag.color,
+            "description": tag.description
+        } for tag in product.tags],
+        total_quantity=total_quantity,
         stock_status=stock_status,
-        min_price=min_price,
-        max_price=max_price,
-        low_stock=low_stock,
-        out_of_stock=out_of_stock,
-        sort_by=sort_by,
-        sort_order=sort_order
+        created_at=product.created_at,
+        updated_at=product.updated_at
     )
+
+
+@router.get("/facets", response_model=ProductFacets, summary="Фасеты списка товаров")
+async def get_product_facets(
+    filters: ProductFilters = Depends(get_product_filters),
+    current_user: UserModel = Depends(get_current_active_user),
+    product_service: ProductService = Depends(get_product_service)
+):
+    """
+    Количество товаров по значениям фильтров для текущей выборки.
     
-    products, total = product_service.get_products(pagination, filters)
-    
-    # Преобразуем в схему ответа
-    items = []
-    for product in products:
-        # Подсчитываем общее количество на складах
-        total_quantity = sum(inv.quantity for inv in product.inventory_records)
-        
-        # Определяем общий статус остатков
-        stock_status = "out_of_stock"
-        if total_quantity > 0:
-            min_quantities = [inv.min_quantity for inv in product.inventory_records]
-            if min_quantities and total_quantity <= min(min_quantities):
-                stock_status = "low_stock"
-            else:
-                stock_status = "in_stock"
-        
-        item = ProductListItem(
-            id=product.id,
-            name=product.name,
-            sku=product.sku,
-            unit_price=product.unit_price,
-            status=product.status,
-            category={
-                "id": product.category.id,
-                "name": product.category.name,
-                "description": product.category.description,
-                "parent_id": product.category.parent_id
-            } if product.category else None,
-            supplier={
-                "id": product.supplier.id,
-                "name": product.supplier.name,
-                "code": product.supplier.code,
-                "contact_person": product.supplier.contact_person,
-                "email": product.supplier.email,
-                "phone": product.supplier.phone,
-                "rating": product.supplier.rating
-            } if product.supplier else None,
-            tags=[{
-                "id": tag.id,
-                "name": tag.name,
-                "color": tag.color,
-                "description": tag.description
-            } for tag in product.tags],
-            total_quantity=total_quantity,
-            stock_status=stock_status,
-            created_at=product.created_at,
-            updated_at=product.updated_at
-        )
-        items.append(item)
+    Принимает те же фильтры, что и список товаров, и возвращает счетчики:
+    - **categories**: по категориям
+    - **suppliers**: по поставщикам
+    - **statuses**: по статусам товара
+    - **stock_statuses**: по статусам остатков
     
-    return PaginatedResponse.create(items, total, page, size)
+    Все счетчики вычисляются одним запросом к базе данных.
+    """
+    return product_service.get_product_facets(filters)
+
+
+@router.get("/export", summary="Выгрузка товаров")
+async def export_products(
+    filters: ProductFilters = Depends(get_product_filters),
+    format: ExportFormat = Query(ExportFormat.CSV, description="Формат файла"),
+    gzip: bool = Query(False, description="Сжать CSV gzip"),
+    current_user: UserModel = Depends(get_current_active_user),
+    db: Session = Depends(get_db)
+):
+    """
+    Потоковая выгрузка товаров в CSV, Parquet, Arrow или Excel.
+    
+    Принимает те же фильтры, что и список товаров. Файл формируется по мере
+    чтения из БД и не собирается в памяти целиком.
+    """
+    service = ExportService(db)
+    return service.response(service.products_query(filters), "products", format, gzip)
 
 
 @router.get("/{product_id}", response_model=Product, summary="Карточка товара")
 async def get_product(
+    request: Request,
     product_id: UUID,
     current_user: UserModel = Depends(get_current_active_user),
     product_service: ProductService = Depends(get_product_service)
@@ -156,7 +213,26 @@ async def get_product(
     - Категорию и поставщика
     - Теги товара
     - Остатки по всем локациям
+    
+    Ответ содержит ETag; при совпадении If-None-Match возвращается 304.
     """
+    watermark = product_service.get_product_watermark(product_id)
+    if watermark is None:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Товар не найден"
+        )
+    
+    return cached_response(
+        request,
+        ("products", "categories"),
+        watermark,
+        lambda: _get_product_detail(product_id, product_service)
+    )
+
+
+def _get_product_detail(product_id: UUID, product_service: ProductService) -> Product:
+    """Загрузка товара и формирование полного ответа."""
     product = product_service.get_product_by_id(product_id)
     if not product:
         raise HTTPException(
@@ -164,7 +240,11 @@ async def get_product(
             detail="Товар не найден"
         )
     
-    # Формируем полный ответ
+    return _build_product_detail(product)
+
+
+def _build_product_detail(product: ProductModel) -> Product:
+    """Преобразование товара в полную схему ответа."""
     return Product(
         id=product.id,
         name=product.name,
@@ -244,7 +324,7 @@ async def create_product(
     product = product_service.create_product(product_data, current_user.id)
     
     # Возвращаем созданный товар
-    return await get_product(product.id, current_user, product_service)
+    return _get_product_detail(product.id, product_service)
 
 
 @router.put("/{product_id}", response_model=Product, summary="Обновление товара")
@@ -265,7 +345,7 @@ async def update_product(
     product = product_service.update_product(product_id, product_data, current_user.id)
     
     # Возвращаем обновленный товар
-    return await get_product(product.id, current_user, product_service)
+    return _get_product_detail(product.id, product_service)
 
 
 @router.delete("/{product_id}", response_model=SuccessResponse, summary="Удаление товара")
@@ -304,14 +384,28 @@ async def bulk_update_products(
     - Назначения категории или поставщика
     - Добавления тегов
     
-    Все изменения логируются отдельно для каждого товара.
+    Обновление выполняется одним запросом для всех товаров, изменения
+    логируются отдельной записью для каждого товара.
     """
     products = product_service.bulk_update_products(bulk_data, current_user.id)
     
     # Возвращаем обновленные товары
-    result = []
-    for product in products:
-        product_detail = await get_product(product.id, current_user, product_service)
-        result.append(product_detail)
+    return [_build_product_detail(product) for product in products] 
+
+
+@router.post("/bulk", response_model=ProductBulkCreateResult, summary="Массовое создание товаров")
+async def bulk_create_products(
+    bulk_data: ProductBulkCreate,
+    current_user: UserModel = Depends(require_operator),
+    product_service: ProductService = Depends(get_product_service)
+):
+    """
+    Массовое создание товаров (до 10 000 за запрос).
+    
+    Пакет проверяется целиком: уникальность SKU (в базе и внутри запроса),
+    существование категорий, поставщиков и тегов. Корректные товары
+    создаются, для остальных возвращается причина ошибки.
     
-    return result 
\ No newline at end of file
+    Возвращает результат по каждой строке запроса.
+    """
+    return product_service.bulk_create_products(bulk_data, current_user.id)
\ No newline at end of file
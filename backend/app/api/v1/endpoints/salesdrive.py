@@ -7,7 +7,8 @@ from typing import List, Optional
 from datetime import datetime, timedelta
 from uuid import UUID
 
-from fastapi import APIRouter, Depends, HTTPException, status, BackgroundTasks
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, status, BackgroundTasks
+from pydantic import ValidationError
 from sqlalchemy.orm import Session
 
 from app.core.database.connection import get_db
@@ -16,10 +17,15 @@ from app.api.v1.schemas.auth import UserInfo
 from app.api.v1.schemas.common import SuccessResponse, ErrorResponse
 from app.api.v1.schemas.salesdrive import (
     SalesDriveSyncRequest, SalesDriveSyncResult, SalesDriveConnectionTest,
-    SalesDriveApiConfig, SalesDriveProductsResponse, SalesDriveOrdersResponse
+    SalesDriveApiConfig, SalesDriveProductsResponse, SalesDriveOrdersResponse,
+    SalesDriveWebhookEvent
 )
 from app.api.v1.schemas.import_data import ImportResult, ImportStatus
-from app.api.v1.services.salesdrive_service import SalesDriveService, SalesDriveAPIError
+from app.api.v1.services.salesdrive_service import (
+    SalesDriveService, SalesDriveAPIError, api_metrics, circuit_breaker, rate_limiter
+)
+from app.api.v1.services.salesdrive_webhooks import SIGNATURE_HEADER, enqueue_event, verify_signature
+from app.core.config import settings
 
 logger = logging.getLogger(__name__)
 
@@ -196,16 +202,18 @@ async def start_sync(
     "/sync/products",
     response_model=ImportResult,
     summary="Синхронизация товаров",
-    description="Синхронизирует товары из SalesDrive с локальной базой данных"
+    description="Синхронизирует товары из SalesDrive с локальной базой данных. "
+                "По умолчанию загружаются только товары, измененные после прошлой синхронизации"
 )
 async def sync_products(
+    full: bool = Query(False, description="Полная сверка всего каталога"),
     db: Session = Depends(get_db),
     current_user: UserInfo = Depends(require_manager)
 ):
     """Синхронизация товаров из SalesDrive."""
     try:
         service = SalesDriveService(db)
-        result = await service.sync_products(current_user.id)
+        result = await service.sync_products(current_user.id, full=full)
         
         logger.info(f"Products sync completed by user {current_user.id}: "
                    f"{result.processed_items} processed, {result.created_items} created, "
@@ -304,43 +312,65 @@ async def get_sync_status(
         )
 
 
+@router.get(
+    "/api-status",
+    response_model=dict,
+    summary="Состояние доступа к SalesDrive API",
+    description="Состояние выключателя запросов, пауза после превышения лимита и метрики по endpoint API"
+)
+async def get_api_status(
+    current_user: UserInfo = Depends(require_manager)
+):
+    """Состояние доступа к SalesDrive API."""
+    return {
+        "circuit_state": circuit_breaker.state,
+        "cooldown_seconds": round(rate_limiter.paused_for(), 1),
+        "endpoints": api_metrics.snapshot()
+    }
+
+
 @router.post(
     "/webhook",
     response_model=SuccessResponse,
     summary="Webhook от SalesDrive",
-    description="Обработка webhook событий от SalesDrive API"
+    description="Прием webhook событий от SalesDrive API: событие сохраняется в очередь и обрабатывается в фоне"
 )
 async def handle_webhook(
-    event_data: dict,
+    request: Request,
     db: Session = Depends(get_db)
 ):
-    """Обработка webhook от SalesDrive."""
+    """Прием webhook от SalesDrive."""
+    if not settings.SALESDRIVE_WEBHOOK_SECRET:
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Прием webhook SalesDrive не настроен"
+        )
+    
+    body = await request.body()
+    if not verify_signature(body, request.headers.get(SIGNATURE_HEADER)):
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Неверная подпись webhook"
+        )
+    
     try:
-        event_type = event_data.get('event_type')
-        
-        logger.info(f"Received SalesDrive webhook: {event_type}")
-        
-        # Обработка различных типов событий
-        if event_type == 'product.updated':
-            # Обновление товара
-            product_id = event_data.get('data', {}).get('id')
-            logger.info(f"Product updated: {product_id}")
-            
-        elif event_type == 'order.created':
-            # Новый заказ
-            order_id = event_data.get('data', {}).get('id')
-            logger.info(f"New order created: {order_id}")
-            
-        elif event_type == 'order.status_changed':
-            # Изменение статуса заказа
-            order_id = event_data.get('data', {}).get('id')
-            new_status = event_data.get('data', {}).get('status')
-            logger.info(f"Order {order_id} status changed to: {new_status}")
+        event = SalesDriveWebhookEvent.model_validate_json(body)
+    except ValidationError as e:
+        raise HTTPException(
+            status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
+            detail=f"Некорректное событие webhook: {e.errors()}"
+        )
+    
+    try:
+        if enqueue_event(db, event):
+            logger.info(f"Received SalesDrive webhook: {event.event_type} ({event.event_id})")
+        else:
+            logger.info(f"Duplicate SalesDrive webhook ignored: {event.event_id}")
         
-        return SuccessResponse(message="Webhook обработан успешно")
+        return SuccessResponse(message="Webhook принят")
     
     except Exception as e:
-        logger.error(f"Error processing webhook: {e}")
+        logger.error(f"Error queueing webhook: {e}")
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail=f"Ошибка обработки webhook: {str(e)}"
@@ -359,7 +389,7 @@ async def _run_sync_task(
         # Синхронизация товаров
         if sync_request.sync_products:
             logger.info("Starting products sync...")
-            await service.sync_products(user_id)
+            await service.sync_products(user_id, full=sync_request.full_sync)
             logger.info("Products sync completed")
         
         # Синхронизация заказов
@@ -4,7 +4,7 @@
 
 from fastapi import APIRouter
 
-from app.api.v1.endpoints import auth, products, categories, salesdrive, sales, forecasts
+from app.api.v1.endpoints import auth, products, categories, salesdrive, sales, forecasts, imports, exports
 from app.features.analytics.router import router as analytics_router
 from app.features.inventory.router import router as inventory_router
 from app.features.integration.router import router as integration_router
@@ -43,6 +43,18 @@ api_router.include_router(
     tags=["Прогнозирование"]
 )
 
+api_router.include_router(
+    imports.router,
+    prefix="/imports",
+    tags=["Импорт"]
+)
+
+api_router.include_router(
+    exports.router,
+    prefix="/exports",
+    tags=["Выгрузка"]
+)
+
 api_router.include_router(
     salesdrive.router,
     prefix="/salesdrive",
@@ -5,6 +5,7 @@
 from .product import *
 from .category import *
 from .import_data import *
+from .export import *
 from .forecast import *
 from .auth import *
 from .common import * 
\ No newline at end of file
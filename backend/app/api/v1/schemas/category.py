@@ -45,6 +45,7 @@ class CategoryTree(UUIDMixin):
     sort_order: int = Field(description="Порядок сортировки")
     is_active: bool = Field(description="Активна ли категория")
     products_count: int = Field(default=0, description="Количество товаров в категории")
+    total_products_count: int = Field(default=0, description="Количество товаров с учетом подкатегорий")
     children: List["CategoryTree"] = Field(default=[], description="Дочерние категории")
 
 
@@ -0,0 +1,21 @@
+"""
+Схемы для выгрузки данных.
+"""
+
+from enum import Enum
+
+
+class ExportFormat(str, Enum):
+    """Форматы выгрузки."""
+    CSV = "csv"
+    PARQUET = "parquet"
+    ARROW = "arrow"
+    XLSX = "xlsx"
+
+
+class ExportEntity(str, Enum):
+    """Выгружаемые данные."""
+    PRODUCTS = "products"
+    INVENTORY = "inventory"
+    SALES = "sales"
+    FORECASTS = "forecasts"
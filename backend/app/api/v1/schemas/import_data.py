@@ -26,6 +26,9 @@ class ImportSource(str, Enum):
     SALESDRIVE = "salesdrive"
     EXCEL = "excel"
     CSV = "csv"
+    JSON = "json"
+    PARQUET = "parquet"
+    ARROW = "arrow"
     MANUAL = "manual"
 
 
@@ -73,6 +76,7 @@ class ImportStatus(UUIDMixin, TimestampMixin):
     progress: int = Field(default=0, ge=0, le=100, description="Прогресс в процентах")
     result: Optional[ImportResult] = Field(None, description="Результат импорта")
     error_message: Optional[str] = Field(None, description="Сообщение об ошибке")
+    file_name: Optional[str] = Field(None, description="Имя импортируемого файла")
     started_by: UUID = Field(description="ID пользователя, запустившего импорт")
     started_at: datetime = Field(description="Время начала импорта")
     completed_at: Optional[datetime] = Field(None, description="Время завершения импорта")
@@ -101,6 +105,11 @@ class ImportPreview(BaseModel):
     invalid_rows: int = Field(description="Количество невалидных строк")
     sample_data: List[Dict[str, Any]] = Field(description="Образец данных")
     validation_errors: List[ImportValidationError] = Field(description="Ошибки валидации")
+    update_rows: int = Field(default=0, description="Количество строк, которые обновят товары")
+    skipped_rows: int = Field(default=0, description="Количество валидных строк, которые не будут записаны")
+    notices: List[ImportValidationError] = Field(
+        default=[], description="Существующие товары и повторы артикулов"
+    )
     column_mapping: Dict[str, str] = Field(description="Маппинг колонок")
 
 
@@ -135,6 +135,7 @@ class ProductListItem(UUIDMixin, TimestampMixin):
 class ProductFilters(FilterParams):
     """Фильтры для списка товаров."""
     category_id: Optional[UUID] = Field(None, description="Фильтр по категории")
+    include_descendants: bool = Field(default=False, description="Включать товары подкатегорий")
     supplier_id: Optional[UUID] = Field(None, description="Фильтр по поставщику")
     status: Optional[ProductStatus] = Field(None, description="Фильтр по статусу")
     stock_status: Optional[StockStatus] = Field(None, description="Фильтр по статусу остатков")
@@ -145,12 +146,52 @@ class ProductFilters(FilterParams):
     out_of_stock: Optional[bool] = Field(None, description="Только товары без остатков")
 
 
+class FacetValue(BaseModel):
+    """Значение фасета с количеством товаров."""
+    value: Optional[str] = Field(None, description="Значение фасета (None - не задано)")
+    label: Optional[str] = Field(None, description="Отображаемое название")
+    count: int = Field(description="Количество товаров")
+
+
+class ProductFacets(BaseModel):
+    """Счетчики фасетов для фильтров списка товаров."""
+    total: int = Field(description="Общее количество товаров по текущему фильтру")
+    categories: List[FacetValue] = Field(default=[], description="Количество по категориям")
+    suppliers: List[FacetValue] = Field(default=[], description="Количество по поставщикам")
+    statuses: List[FacetValue] = Field(default=[], description="Количество по статусам товара")
+    stock_statuses: List[FacetValue] = Field(default=[], description="Количество по статусам остатков")
+
+
 class ProductBulkUpdate(BaseModel):
     """Массовое обновление товаров."""
     product_ids: List[UUID] = Field(..., min_items=1, description="ID товаров для обновления")
     updates: ProductUpdate = Field(..., description="Данные для обновления")
 
 
+class ProductBulkCreate(BaseModel):
+    """Массовое создание товаров."""
+    products: List[ProductCreate] = Field(
+        ..., min_items=1, max_items=10000, description="Товары для создания"
+    )
+
+
+class ProductBulkCreateRowResult(BaseModel):
+    """Результат создания одного товара из пакета."""
+    index: int = Field(description="Номер строки в запросе (с 0)")
+    sku: str = Field(description="Артикул товара")
+    success: bool = Field(description="Товар создан")
+    product_id: Optional[UUID] = Field(None, description="ID созданного товара")
+    error: Optional[str] = Field(None, description="Причина отказа")
+
+
+class ProductBulkCreateResult(BaseModel):
+    """Результат массового создания товаров."""
+    total: int = Field(description="Всего строк в запросе")
+    created: int = Field(description="Создано товаров")
+    failed: int = Field(description="Строк с ошибками")
+    results: List[ProductBulkCreateRowResult] = Field(default=[], description="Результаты по строкам")
+
+
 class ProductImport(BaseModel):
     """Импорт товара."""
     external_id: str = Field(..., description="Внешний ID товара")
@@ -5,5 +5,6 @@
 from .product_service import ProductService
 from .category_service import CategoryService
 from .import_service import ImportService
+from .export_service import ExportService
 from .forecast_service import ForecastService
 from .auth_service import AuthService 
\ No newline at end of file
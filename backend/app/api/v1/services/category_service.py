@@ -3,17 +3,27 @@
 """
 
 import logging
-from typing import List, Optional
+from collections import defaultdict
+from typing import Dict, List, Optional, Tuple
 from uuid import UUID
 from sqlalchemy.orm import Session, joinedload
-from sqlalchemy import func
+from sqlalchemy import func, desc, exists
 from fastapi import HTTPException, status
+from pydantic import TypeAdapter
 
-from app.database.models import Category as CategoryModel, Product as ProductModel
+from app.core.cache import response_cache, get_data_version
+from app.database.models import (
+    Category as CategoryModel,
+    CategoryClosure,
+    Product as ProductModel
+)
 from app.api.v1.schemas.category import CategoryCreate, CategoryUpdate, Category, CategoryTree
 
 logger = logging.getLogger(__name__)
 
+# Сериализация снимка дерева категорий
+_category_tree_adapter = TypeAdapter(List[CategoryTree])
+
 
 class CategoryService:
     """Сервис для работы с категориями."""
@@ -33,42 +43,88 @@ class CategoryService:
         return query.order_by(CategoryModel.sort_order, CategoryModel.name).all()
     
     def get_category_tree(self, include_inactive: bool = False) -> List[CategoryTree]:
-        """Получение дерева категорий."""
-        # Получаем все категории
-        categories = self.get_categories(include_inactive)
+        """
+        Получение дерева категорий.
         
-        # Создаем словарь для быстрого поиска
-        category_dict = {cat.id: cat for cat in categories}
+        Дерево берется из снимка в кеше. Ключ снимка содержит версию данных
+        каталога из БД (data_versions), поэтому любое зафиксированное
+        изменение, в том числе в обход сервисов и в другом воркере, дает
+        новый снимок и на локальном кеше.
+        """
+        version = response_cache.get_version("categories")
+        data_version = get_data_version(self.db)
+        key = f"snapshot:category_tree:{int(include_inactive)}:{version}:{data_version}"
         
-        # Подсчитываем количество товаров в каждой категории
-        product_counts = dict(
-            self.db.query(
-                ProductModel.category_id,
-                func.count(ProductModel.id)
-            ).group_by(ProductModel.category_id).all()
-        )
+        snapshot = response_cache.get(key)
+        if snapshot is not None:
+            return _category_tree_adapter.validate_json(snapshot)
         
-        # Строим дерево
-        def build_tree(parent_id: Optional[UUID] = None) -> List[CategoryTree]:
-            tree = []
-            for category in categories:
-                if category.parent_id == parent_id:
-                    children = build_tree(category.id)
-                    
-                    tree_item = CategoryTree(
-                        id=category.id,
-                        name=category.name,
-                        description=category.description,
-                        sort_order=category.sort_order,
-                        is_active=category.is_active,
-                        products_count=product_counts.get(category.id, 0),
-                        children=children
-                    )
-                    tree.append(tree_item)
-            
-            return sorted(tree, key=lambda x: (x.sort_order, x.name))
+        tree = self.build_category_tree(include_inactive)
+        response_cache.set(key, _category_tree_adapter.dump_json(tree))
+        return tree
+    
+    def build_category_tree(self, include_inactive: bool = False) -> List[CategoryTree]:
+        """
+        Построение дерева категорий за один проход.
+        
+        products_count - товары непосредственно в категории,
+        total_products_count - товары во всем поддереве.
+        """
+        query = self.db.query(CategoryModel)
+        if not include_inactive:
+            query = query.filter(CategoryModel.is_active == True)
+        categories = query.all()
+        
+        product_counts = self.get_products_counts()
+        
+        # Родитель -> дочерние категории
+        children_map: Dict[Optional[UUID], List[CategoryModel]] = defaultdict(list)
+        for category in categories:
+            children_map[category.parent_id].append(category)
+        
+        # Порядок обхода сверху вниз (без рекурсии - глубина дерева не ограничена)
+        order = []
+        stack = [None]
+        while stack:
+            parent_id = stack.pop()
+            for category in children_map.get(parent_id, []):
+                order.append(category)
+                stack.append(category.id)
+        
+        # Узлы строим снизу вверх: дочерние узлы и их суммы уже готовы
+        nodes: Dict[UUID, CategoryTree] = {}
+        for category in reversed(order):
+            children = sorted(
+                (nodes[child.id] for child in children_map.get(category.id, [])),
+                key=lambda x: (x.sort_order, x.name)
+            )
+            products_count = product_counts.get(category.id, 0)
+            nodes[category.id] = CategoryTree(
+                id=category.id,
+                name=category.name,
+                description=category.description,
+                sort_order=category.sort_order,
+                is_active=category.is_active,
+                products_count=products_count,
+                total_products_count=products_count + sum(
+                    child.total_products_count for child in children
+                ),
+                children=children
+            )
         
-        return build_tree()
+        return sorted(
+            (nodes[category.id] for category in children_map.get(None, [])),
+            key=lambda x: (x.sort_order, x.name)
+        )
+    
+    def get_tree_watermark(self) -> Tuple:
+        """
+        Watermark дерева категорий для ETag.
+        
+        Версия каталога из data_versions (категории и количество товаров в
+        узлах), увеличивается триггерами при фиксации транзакций.
+        """
+        return (get_data_version(self.db),)
     
     def get_category_by_id(self, category_id: UUID) -> Optional[CategoryModel]:
         """Получение категории по ID."""
@@ -111,6 +167,7 @@ class CategoryService:
         self.db.add(db_category)
         self.db.commit()
         self.db.refresh(db_category)
+        response_cache.invalidate("categories", "products")
         
         logger.info(f"Создана категория: {db_category.name}")
         return db_category
@@ -156,6 +213,7 @@ class CategoryService:
         
         self.db.commit()
         self.db.refresh(category)
+        response_cache.invalidate("categories", "products")
         
         logger.info(f"Обновлена категория: {category.name}")
         return category
@@ -194,47 +252,59 @@ class CategoryService:
         # Удаляем категорию
         self.db.delete(category)
         self.db.commit()
+        response_cache.invalidate("categories", "products")
         
         logger.info(f"Удалена категория: {category.name}")
         return True
     
     def get_category_path(self, category_id: UUID) -> List[CategoryModel]:
-        """Получение пути к категории (от корня до текущей)."""
-        path = []
-        current_category = self.get_category_by_id(category_id)
-        
-        while current_category:
-            path.insert(0, current_category)
-            if current_category.parent_id:
-                current_category = self.get_category_by_id(current_category.parent_id)
-            else:
-                break
-        
-        return path
+        """Получение пути к категории (от корня до текущей) одним запросом."""
+        return self.db.query(CategoryModel).join(
+            CategoryClosure, CategoryClosure.ancestor_id == CategoryModel.id
+        ).filter(
+            CategoryClosure.descendant_id == category_id
+        ).order_by(desc(CategoryClosure.depth)).all()
     
     def get_category_descendants(self, category_id: UUID) -> List[CategoryModel]:
-        """Получение всех потомков категории."""
-        descendants = []
-        
-        def collect_descendants(parent_id: UUID):
-            children = self.db.query(CategoryModel).filter(
-                CategoryModel.parent_id == parent_id
-            ).all()
-            
-            for child in children:
-                descendants.append(child)
-                collect_descendants(child.id)
-        
-        collect_descendants(category_id)
-        return descendants
+        """Получение всех потомков категории одним запросом (по уровням)."""
+        return self.db.query(CategoryModel).join(
+            CategoryClosure, CategoryClosure.descendant_id == CategoryModel.id
+        ).filter(
+            CategoryClosure.ancestor_id == category_id,
+            CategoryClosure.depth > 0
+        ).order_by(
+            CategoryClosure.depth, CategoryModel.sort_order, CategoryModel.name
+        ).all()
+    
+    def get_category_levels(self) -> Dict[UUID, int]:
+        """Уровень вложенности каждой категории (0 - корневая)."""
+        return dict(
+            self.db.query(
+                CategoryClosure.descendant_id,
+                func.max(CategoryClosure.depth)
+            ).group_by(CategoryClosure.descendant_id).all()
+        )
+    
+    def get_products_counts(self) -> Dict[UUID, int]:
+        """Количество товаров, непосредственно входящих в каждую категорию."""
+        return dict(
+            self.db.query(
+                ProductModel.category_id,
+                func.count(ProductModel.id)
+            ).filter(
+                ProductModel.category_id.isnot(None)
+            ).group_by(ProductModel.category_id).all()
+        )
     
     def _would_create_cycle(self, new_parent_id: UUID, category_id: Optional[UUID]) -> bool:
         """Проверка, создаст ли изменение родителя циклическую зависимость."""
         if not category_id:
             return False
         
-        # Проверяем, не является ли новый родитель потомком текущей категории
-        descendants = self.get_category_descendants(category_id)
-        descendant_ids = [desc.id for desc in descendants]
-        
-        return new_parent_id in descendant_ids or new_parent_id == category_id 
\ No newline at end of file
+        # Новый родитель не может быть самой категорией или её потомком
+        return self.db.query(
+            exists().where(
+                CategoryClosure.ancestor_id == category_id,
+                CategoryClosure.descendant_id == new_parent_id
+            )
+        ).scalar()
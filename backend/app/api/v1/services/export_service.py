@@ -0,0 +1,482 @@
+"""
+Сервис потоковой выгрузки данных.
+
+Строки читаются из БД серверным курсором пакетами по EXPORT_BATCH_SIZE и
+сразу превращаются в части ответа, поэтому расход памяти не зависит от
+количества выгружаемых строк. Ответ отдается после завершения эндпоинта,
+поэтому генераторы выгрузки читают строки в собственной сессии, а не в сессии
+запроса (get_db).
+"""
+
+import csv
+import io
+import logging
+import tempfile
+import zlib
+from datetime import date, timedelta
+from typing import Any, Dict, Iterator, List, Optional, Sequence, Tuple
+from uuid import UUID
+
+import pyarrow as pa
+import pyarrow.parquet as pq
+import xlsxwriter
+from fastapi.responses import StreamingResponse
+from sqlalchemy import Boolean, Date, DateTime, Float, Integer, Numeric, String, cast, func
+from sqlalchemy.orm import Session, Query
+
+from app.core.database.connection import SessionLocal
+from app.database.models import (
+    ForecastTemplate as ForecastTemplateModel, Inventory as InventoryModel,
+    Order as OrderModel, Product as ProductModel, Sale as SaleModel,
+    SalesForecast as ForecastModel
+)
+from app.api.v1.schemas.export import ExportEntity, ExportFormat
+from app.api.v1.schemas.product import ProductFilters
+from app.api.v1.services.import_readers import READ_CHUNK_SIZE
+from app.api.v1.services.product_service import ProductService
+
+logger = logging.getLogger(__name__)
+
+# Строк в одном пакете серверного курсора
+EXPORT_BATCH_SIZE = 5000
+
+# Строк в группе Parquet (и в записываемой за раз части Arrow)
+EXPORT_ROW_GROUP_SIZE = 100000
+
+# Кодировка CSV: BOM нужен Excel, чтобы открыть файл в UTF-8
+EXPORT_CSV_ENCODING = "utf-8-sig"
+
+# Сжатие колонок Parquet и буферов Arrow IPC
+EXPORT_COMPRESSION = "zstd"
+
+EXPORT_EXTENSIONS = {
+    ExportFormat.CSV: "csv",
+    ExportFormat.PARQUET: "parquet",
+    ExportFormat.ARROW: "arrow",
+    ExportFormat.XLSX: "xlsx",
+}
+
+EXPORT_MEDIA_TYPES = {
+    ExportFormat.CSV: "text/csv",
+    ExportFormat.PARQUET: "application/vnd.apache.parquet",
+    ExportFormat.ARROW: "application/vnd.apache.arrow.file",
+    ExportFormat.XLSX: "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
+}
+
+# Названия листов Excel
+EXPORT_SHEET_TITLES = {
+    ExportEntity.PRODUCTS: "Товары",
+    ExportEntity.INVENTORY: "Остатки",
+    ExportEntity.SALES: "Продажи",
+    ExportEntity.FORECASTS: "Прогнозы",
+}
+
+# Листы общей книги Excel
+EXPORT_WORKBOOK_ENTITIES = (ExportEntity.PRODUCTS, ExportEntity.INVENTORY, ExportEntity.FORECASTS)
+
+# Строк на листе Excel, включая заголовок; остальные строки - на следующем листе
+XLSX_MAX_ROWS = 1048576
+
+XLSX_DATE_FORMAT = "dd.mm.yyyy"
+XLSX_DATETIME_FORMAT = "dd.mm.yyyy hh:mm:ss"
+
+# Строки пишутся как есть: без превращения в формулы, ссылки и числа
+XLSX_OPTIONS = {
+    "constant_memory": True,
+    "strings_to_formulas": False,
+    "strings_to_urls": False,
+    "strings_to_numbers": False,
+}
+
+
+def _arrow_type(column_type) -> pa.DataType:
+    """Тип колонки Arrow по типу колонки запроса."""
+    if isinstance(column_type, Boolean):
+        return pa.bool_()
+    if isinstance(column_type, Integer):
+        return pa.int64()
+    if isinstance(column_type, Float):
+        return pa.float64()
+    if isinstance(column_type, Numeric):
+        scale = column_type.scale if column_type.scale is not None else 10
+        return pa.decimal128(column_type.precision or 38, scale)
+    if isinstance(column_type, DateTime):
+        return pa.timestamp("us")
+    if isinstance(column_type, Date):
+        return pa.date32()
+    return pa.string()
+
+
+def _xlsx_number_format(column_type) -> Optional[str]:
+    """Формат ячеек Excel по типу колонки запроса."""
+    if isinstance(column_type, DateTime):
+        return XLSX_DATETIME_FORMAT
+    if isinstance(column_type, Date):
+        return XLSX_DATE_FORMAT
+    if isinstance(column_type, Numeric) and not isinstance(column_type, Float) and column_type.scale:
+        return "0." + "0" * column_type.scale
+    return None
+
+
+def _arrow_schema(query: Query) -> pa.Schema:
+    return pa.schema([
+        (column["name"], _arrow_type(column["type"])) for column in query.column_descriptions
+    ])
+
+
+def _record_batch(rows: List[Sequence[Any]], schema: pa.Schema) -> pa.RecordBatch:
+    """Пакет строк курсора в колонки Arrow (без промежуточных объектов на строку)."""
+    columns = list(zip(*rows)) if rows else [()] * len(schema)
+    return pa.RecordBatch.from_arrays(
+        [pa.array(values, type=field.type) for values, field in zip(columns, schema)],
+        schema=schema
+    )
+
+
+class _ChunkSink(io.RawIOBase):
+    """Поток записи, из которого записанные байты забираются частями."""
+    
+    def __init__(self):
+        super().__init__()
+        self._chunks = []
+        self._position = 0
+    
+    def writable(self) -> bool:
+        return True
+    
+    def write(self, data) -> int:
+        self._chunks.append(bytes(data))
+        self._position += len(data)
+        return len(data)
+    
+    def tell(self) -> int:
+        return self._position
+    
+    def take(self) -> bytes:
+        data = b"".join(self._chunks)
+        self._chunks.clear()
+        return data
+
+
+class ExportService:
+    """Сервис выгрузки данных."""
+    
+    def __init__(self, db: Session):
+        self.db = db
+    
+    @staticmethod
+    def iter_batches(db: Session, query: Query) -> Iterator[List[Sequence[Any]]]:
+        """
+        Строки запроса пакетами в сессии db.
+        
+        yield_per включает серверный курсор psycopg2: в памяти одновременно
+        находится только один пакет строк.
+        """
+        result = db.execute(
+            query.statement.execution_options(yield_per=EXPORT_BATCH_SIZE)
+        )
+        try:
+            yield from result.partitions()
+        finally:
+            result.close()
+    
+    def iter_csv(self, query: Query, compress: bool = False) -> Iterator[bytes]:
+        """CSV по запросу частями; compress - сжатие gzip на лету."""
+        compressor = zlib.compressobj(wbits=16 + zlib.MAX_WBITS) if compress else None
+        buffer = io.StringIO()
+        writer = csv.writer(buffer)
+        
+        def take(encoding: str = "utf-8") -> bytes:
+            data = buffer.getvalue().encode(encoding)
+            buffer.seek(0)
+            buffer.truncate()
+            return compressor.compress(data) if compressor else data
+        
+        # BOM - только в начале файла
+        writer.writerow([column["name"] for column in query.column_descriptions])
+        chunk = take(EXPORT_CSV_ENCODING)
+        
+        rows_count = 0
+        db = SessionLocal()
+        try:
+            for batch in self.iter_batches(db, query):
+                if chunk:
+                    yield chunk
+                writer.writerows(batch)
+                rows_count += len(batch)
+                chunk = take()
+        finally:
+            db.close()
+        
+        if compressor:
+            chunk += compressor.flush()
+        yield chunk
+        logger.info(f"Выгружено строк: {rows_count}")
+    
+    def iter_columnar(self, query: Query, export_format: ExportFormat) -> Iterator[bytes]:
+        """
+        Parquet или Arrow IPC по запросу частями.
+        
+        Типы колонок берутся из запроса. Пакеты курсора собираются в группы
+        по EXPORT_ROW_GROUP_SIZE строк, каждая группа записывается и сразу
+        отдается в ответ.
+        """
+        schema = _arrow_schema(query)
+        sink = _ChunkSink()
+        if export_format == ExportFormat.PARQUET:
+            writer = pq.ParquetWriter(sink, schema, compression=EXPORT_COMPRESSION)
+        else:
+            writer = pa.ipc.new_file(
+                sink, schema, options=pa.ipc.IpcWriteOptions(compression=EXPORT_COMPRESSION)
+            )
+        
+        pending = []
+        pending_rows = 0
+        rows_count = 0
+        db = SessionLocal()
+        try:
+            for batch in self.iter_batches(db, query):
+                pending.append(_record_batch(batch, schema))
+                pending_rows += len(batch)
+                if pending_rows >= EXPORT_ROW_GROUP_SIZE:
+                    writer.write_table(pa.Table.from_batches(pending, schema))
+                    rows_count += pending_rows
+                    pending, pending_rows = [], 0
+                    yield sink.take()
+        finally:
+            db.close()
+        
+        if pending:
+            writer.write_table(pa.Table.from_batches(pending, schema))
+            rows_count += pending_rows
+        writer.close()
+        yield sink.take()
+        logger.info(f"Выгружено строк: {rows_count}")
+    
+    def iter_xlsx(self, sheets: List[Tuple[str, Query]]) -> Iterator[bytes]:
+        """
+        Книга Excel по запросам, по листу на запрос.
+        
+        xlsxwriter в режиме constant_memory сбрасывает каждую строку во
+        временный файл листа, поэтому в памяти строки не накапливаются. Архив
+        XLSX собирается после записи всех листов во временный файл и отдается
+        из него частями. Все листы читаются в одной сессии.
+        """
+        with tempfile.TemporaryFile() as output:
+            workbook = xlsxwriter.Workbook(output, XLSX_OPTIONS)
+            header_format = workbook.add_format({"bold": True})
+            formats: Dict[str, Any] = {}
+            
+            def cell_format(column_type):
+                number_format = _xlsx_number_format(column_type)
+                if number_format and number_format not in formats:
+                    formats[number_format] = workbook.add_format({"num_format": number_format})
+                return formats.get(number_format)
+            
+            db = SessionLocal()
+            try:
+                for title, query in sheets:
+                    self._write_sheet(db, workbook, title, query, header_format, cell_format)
+            finally:
+                db.close()
+            workbook.close()
+            
+            output.seek(0)
+            while True:
+                chunk = output.read(READ_CHUNK_SIZE)
+                if not chunk:
+                    break
+                yield chunk
+    
+    def _write_sheet(self, db: Session, workbook, title: str, query: Query, header_format, cell_format) -> None:
+        """Строки запроса на лист книги; при переполнении - на листы «title 2» и т.д."""
+        columns = query.column_descriptions
+        header = [column["name"] for column in columns]
+        formats = [cell_format(column["type"]) for column in columns]
+        worksheet = None
+        sheets_count = 0
+        row_index = 0
+        
+        def add_worksheet():
+            nonlocal worksheet, sheets_count, row_index
+            sheets_count += 1
+            worksheet = workbook.add_worksheet(title if sheets_count == 1 else f"{title} {sheets_count}")
+            worksheet.freeze_panes(1, 0)
+            worksheet.write_row(0, 0, header, header_format)
+            row_index = 1
+        
+        add_worksheet()
+        rows_count = 0
+        for batch in self.iter_batches(db, query):
+            for values in batch:
+                if row_index >= XLSX_MAX_ROWS:
+                    add_worksheet()
+                for column, value in enumerate(values):
+                    if value is not None:
+                        worksheet.write(row_index, column, value, formats[column])
+                row_index += 1
+            rows_count += len(batch)
+        logger.info(f"Выгружено строк на лист {title}: {rows_count}")
+    
+    def response(
+        self,
+        query: Query,
+        name: str,
+        export_format: ExportFormat = ExportFormat.CSV,
+        compress: bool = False
+    ) -> StreamingResponse:
+        """
+        Потоковый ответ с выгрузкой запроса.
+        
+        compress (gzip) применяется только к CSV: остальные форматы сжимаются сами.
+        """
+        if export_format == ExportFormat.CSV:
+            content = self.iter_csv(query, compress)
+        elif export_format == ExportFormat.XLSX:
+            content = self.iter_xlsx([(EXPORT_SHEET_TITLES.get(name, name), query)])
+            compress = False
+        else:
+            content = self.iter_columnar(query, export_format)
+            compress = False
+        
+        filename = f"{name}.{EXPORT_EXTENSIONS[export_format]}"
+        if compress:
+            filename += ".gz"
+        return self._streaming_response(
+            content,
+            filename,
+            "application/gzip" if compress else EXPORT_MEDIA_TYPES[export_format]
+        )
+    
+    def workbook_response(
+        self,
+        product_id: Optional[UUID] = None,
+        date_from: Optional[date] = None,
+        date_to: Optional[date] = None
+    ) -> StreamingResponse:
+        """Книга Excel с листами EXPORT_WORKBOOK_ENTITIES."""
+        sheets = [
+            (EXPORT_SHEET_TITLES[entity], self.get_query(entity, product_id, date_from, date_to))
+            for entity in EXPORT_WORKBOOK_ENTITIES
+        ]
+        return self._streaming_response(
+            self.iter_xlsx(sheets), "export.xlsx", EXPORT_MEDIA_TYPES[ExportFormat.XLSX]
+        )
+    
+    @staticmethod
+    def _streaming_response(content: Iterator[bytes], filename: str, media_type: str) -> StreamingResponse:
+        return StreamingResponse(
+            content,
+            media_type=media_type,
+            headers={"Content-Disposition": f'attachment; filename="{filename}"'}
+        )
+    
+    def products_query(
+        self,
+        filters: Optional[ProductFilters] = None,
+        product_id: Optional[UUID] = None
+    ) -> Query:
+        """Запрос выгрузки товаров."""
+        query = ProductService(self.db).get_export_query(filters)
+        if product_id:
+            query = query.filter(ProductModel.id == product_id)
+        return query
+    
+    def inventory_query(self, product_id: Optional[UUID] = None) -> Query:
+        """Запрос выгрузки остатков по локациям."""
+        query = self.db.query(
+            ProductModel.sku,
+            ProductModel.name,
+            InventoryModel.location,
+            InventoryModel.quantity,
+            InventoryModel.reserved_quantity,
+            InventoryModel.min_quantity,
+            InventoryModel.max_quantity,
+            InventoryModel.reorder_point,
+            func.lower(cast(InventoryModel.stock_status, String)).label("stock_status"),
+            InventoryModel.last_counted_at,
+            InventoryModel.updated_at
+        ).join(ProductModel, ProductModel.id == InventoryModel.product_id)
+        
+        if product_id:
+            query = query.filter(InventoryModel.product_id == product_id)
+        return query.order_by(ProductModel.sku, InventoryModel.location)
+    
+    def sales_query(
+        self,
+        product_id: Optional[UUID] = None,
+        date_from: Optional[date] = None,
+        date_to: Optional[date] = None
+    ) -> Query:
+        """Запрос выгрузки продаж; date_to включается в период."""
+        query = self.db.query(
+            SaleModel.sale_date,
+            OrderModel.order_number,
+            ProductModel.sku,
+            ProductModel.name,
+            SaleModel.quantity,
+            SaleModel.unit_price,
+            SaleModel.discount_amount,
+            SaleModel.tax_amount,
+            SaleModel.total_amount,
+            SaleModel.customer_name,
+            SaleModel.location,
+            SaleModel.payment_method
+        ).join(
+            ProductModel, ProductModel.id == SaleModel.product_id
+        ).outerjoin(
+            OrderModel, OrderModel.id == SaleModel.order_id
+        )
+        
+        if product_id:
+            query = query.filter(SaleModel.product_id == product_id)
+        if date_from:
+            query = query.filter(SaleModel.sale_date >= date_from)
+        if date_to:
+            query = query.filter(SaleModel.sale_date < date_to + timedelta(days=1))
+        return query.order_by(SaleModel.sale_date, SaleModel.id)
+    
+    def forecasts_query(
+        self,
+        product_id: Optional[UUID] = None,
+        date_from: Optional[date] = None,
+        date_to: Optional[date] = None
+    ) -> Query:
+        """Запрос выгрузки прогнозов продаж."""
+        query = self.db.query(
+            ProductModel.sku,
+            ForecastModel.forecast_date,
+            ForecastModel.predicted_quantity,
+            ForecastModel.actual_quantity,
+            ForecastModel.confidence_level,
+            ForecastTemplateModel.name.label("template"),
+            ForecastModel.created_at
+        ).join(
+            ProductModel, ProductModel.id == ForecastModel.product_id
+        ).outerjoin(
+            ForecastTemplateModel, ForecastTemplateModel.id == ForecastModel.template_id
+        )
+        
+        if product_id:
+            query = query.filter(ForecastModel.product_id == product_id)
+        if date_from:
+            query = query.filter(ForecastModel.forecast_date >= date_from)
+        if date_to:
+            query = query.filter(ForecastModel.forecast_date <= date_to)
+        return query.order_by(ProductModel.sku, ForecastModel.forecast_date)
+    
+    def get_query(
+        self,
+        entity: ExportEntity,
+        product_id: Optional[UUID] = None,
+        date_from: Optional[date] = None,
+        date_to: Optional[date] = None
+    ) -> Query:
+        """Запрос выгрузки по виду данных."""
+        if entity == ExportEntity.PRODUCTS:
+            return self.products_query(product_id=product_id)
+        if entity == ExportEntity.INVENTORY:
+            return self.inventory_query(product_id)
+        if entity == ExportEntity.SALES:
+            return self.sales_query(product_id, date_from, date_to)
+        return self.forecasts_query(product_id, date_from, date_to)
@@ -14,7 +14,7 @@ from fastapi import HTTPException, status
 
 from app.database.models import (
     Product as ProductModel,
-    Sale as SaleModel,
+    SalesDaily as SalesDailyModel,
     SalesForecast as SalesForecastModel,
     ForecastTemplate as ForecastTemplateModel,
     Inventory as InventoryModel,
@@ -52,37 +52,32 @@ class ForecastService:
         product_id: UUID, 
         days: int = 365
     ) -> pd.DataFrame:
-        """Получение истории продаж для товара."""
+        """Получение истории продаж для товара (по дневной сводке sales_daily)."""
         end_date = datetime.utcnow()
         start_date = end_date - timedelta(days=days)
         
-        sales = self.db.query(SaleModel).filter(
+        sales = self.db.query(SalesDailyModel).filter(
             and_(
-                SaleModel.product_id == product_id,
-                SaleModel.sale_date >= start_date,
-                SaleModel.sale_date <= end_date
+                SalesDailyModel.product_id == product_id,
+                SalesDailyModel.sale_date >= start_date.date(),
+                SalesDailyModel.sale_date <= end_date.date()
             )
-        ).order_by(SaleModel.sale_date).all()
+        ).order_by(SalesDailyModel.sale_date).all()
         
         if not sales:
             return pd.DataFrame(columns=['date', 'quantity', 'amount'])
         
-        # Создаем DataFrame
-        data = []
-        for sale in sales:
-            data.append({
-                'date': sale.sale_date.date(),
-                'quantity': sale.quantity,
-                'amount': sale.total_amount
-            })
-        
-        df = pd.DataFrame(data)
-        
-        # Группируем по дням и суммируем
-        df = df.groupby('date').agg({
-            'quantity': 'sum',
-            'amount': 'sum'
-        }).reset_index()
+        # Создаем DataFrame: одна строка сводки - один день
+        df = pd.DataFrame([
+            {
+                'date': day.sale_date,
+                'quantity': day.quantity,
+                'amount': day.total_amount
+            }
+            for day in sales
+        ])
+        df['date'] = pd.to_datetime(df['date'])
+        df['amount'] = df['amount'].astype(float)
         
         # Заполняем пропущенные дни нулями
         date_range = pd.date_range(start=start_date.date(), end=end_date.date(), freq='D')
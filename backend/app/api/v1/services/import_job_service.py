@@ -0,0 +1,389 @@
+"""
+Фоновые задачи импорта.
+
+Загруженный файл сохраняется в UPLOAD_DIR, задача обрабатывается пулом
+потоков пакетами. После каждого пакета в той же транзакции сохраняются
+прогресс, промежуточный результат и контрольная точка (rows_committed), поэтому
+прерванная задача продолжается с последнего записанного пакета. Пока задача
+выполняется, updated_at обновляется по таймеру независимо от пакетов: долгий
+разбор файла не делает задачу прерванной для других процессов.
+"""
+
+import asyncio
+import logging
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+from typing import List, Optional, Set
+from uuid import UUID, uuid4
+
+from fastapi import HTTPException, status, UploadFile
+from sqlalchemy import and_, desc, func, or_, update
+from sqlalchemy.orm import Session
+
+from app.core.config import settings
+from app.core.database.connection import SessionLocal
+from app.database.models import ImportJob as ImportJobModel, SyncStatus, User as UserModel, UserRole
+from app.api.v1.schemas.import_data import ImportResult, ImportSource, ImportStatus
+from app.api.v1.services.import_parallel import ParallelFileReader, shutdown_parse_pool
+from app.api.v1.services.import_readers import READ_CHUNK_SIZE, detect_file_format
+from app.api.v1.services.import_service import ImportService
+
+logger = logging.getLogger(__name__)
+
+# Сколько ошибок и предупреждений хранится в результате задачи
+IMPORT_JOB_MAX_MESSAGES = 1000
+
+# Источник импорта по формату файла
+FILE_FORMAT_SOURCES = {
+    "csv": ImportSource.CSV,
+    "excel": ImportSource.EXCEL,
+    "json": ImportSource.JSON,
+    "parquet": ImportSource.PARQUET,
+    "arrow": ImportSource.ARROW,
+}
+
+_executor = ThreadPoolExecutor(
+    max_workers=settings.IMPORT_JOB_WORKERS,
+    thread_name_prefix="import-job"
+)
+
+# Задачи в очереди пула этого процесса: повторно не ставятся
+_queued_jobs: Set[UUID] = set()
+_queued_jobs_lock = threading.Lock()
+
+
+class ImportJobService:
+    """Сервис задач импорта."""
+    
+    def __init__(self, db: Session):
+        self.db = db
+    
+    async def create_job(
+        self,
+        file: UploadFile,
+        user_id: UUID,
+        update_existing: bool = False
+    ) -> ImportJobModel:
+        """Сохранение загруженного файла и создание задачи импорта."""
+        file_format = detect_file_format(file.filename)
+        
+        upload_dir = os.path.join(settings.UPLOAD_DIR, "imports")
+        os.makedirs(upload_dir, exist_ok=True)
+        job_id = uuid4()
+        extension = os.path.splitext(file.filename)[1].lower()
+        file_path = os.path.join(upload_dir, f"{job_id}{extension}")
+        
+        # Файл копируется порциями, не загружаясь в память целиком
+        file_size = 0
+        with open(file_path, "wb") as target:
+            while True:
+                chunk = await file.read(READ_CHUNK_SIZE)
+                if not chunk:
+                    break
+                file_size += len(chunk)
+                if file_size > settings.MAX_FILE_SIZE:
+                    break
+                target.write(chunk)
+        
+        if file_size > settings.MAX_FILE_SIZE:
+            _remove_upload(file_path)
+            raise HTTPException(
+                status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+                detail=f"Размер файла превышает {settings.MAX_FILE_SIZE} байт"
+            )
+        
+        job = ImportJobModel(
+            id=job_id,
+            source=FILE_FORMAT_SOURCES[file_format].value,
+            file_name=file.filename,
+            file_path=file_path,
+            file_format=file_format,
+            file_size=file_size,
+            update_existing=update_existing,
+            status=SyncStatus.IDLE,
+            created_by=user_id
+        )
+        self.db.add(job)
+        self.db.commit()
+        self.db.refresh(job)
+        
+        logger.info(f"Создана задача импорта {job.id}: {job.file_name} ({file_size} байт)")
+        return job
+    
+    def get_job(self, job_id: UUID, user: Optional[UserModel] = None) -> ImportJobModel:
+        """
+        Получение задачи импорта по ID.
+        
+        Если передан user, чужая задача доступна только администратору;
+        для остальных она не найдена.
+        """
+        job = self.db.query(ImportJobModel).filter(ImportJobModel.id == job_id).first()
+        if job and user and user.role != UserRole.ADMIN and job.created_by != user.id:
+            job = None
+        if not job:
+            raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND,
+                detail="Задача импорта не найдена"
+            )
+        return job
+    
+    def get_jobs(self, user_id: Optional[UUID] = None, limit: int = 20) -> List[ImportJobModel]:
+        """Последние задачи импорта."""
+        query = self.db.query(ImportJobModel)
+        if user_id:
+            query = query.filter(ImportJobModel.created_by == user_id)
+        return query.order_by(desc(ImportJobModel.created_at)).limit(limit).all()
+    
+    @staticmethod
+    def to_status(job: ImportJobModel) -> ImportStatus:
+        """Статус задачи в формате API."""
+        return ImportStatus(
+            id=job.id,
+            created_at=job.created_at,
+            updated_at=job.updated_at,
+            source=job.source,
+            status=job.status.value,
+            progress=job.progress or 0,
+            result=ImportResult(**job.result) if job.result else None,
+            error_message=job.error_message,
+            file_name=job.file_name,
+            started_by=job.created_by,
+            started_at=job.started_at or job.created_at,
+            completed_at=job.completed_at
+        )
+
+
+def _stale_before():
+    return func.current_timestamp() - timedelta(seconds=settings.IMPORT_JOB_STALE_SECONDS)
+
+
+def _stale_condition():
+    """Задача ожидает запуска или прервана (давно не обновлялась)."""
+    return or_(
+        ImportJobModel.status == SyncStatus.IDLE,
+        and_(
+            ImportJobModel.status == SyncStatus.RUNNING,
+            ImportJobModel.updated_at < _stale_before()
+        )
+    )
+
+
+def _claim_job(db: Session, job_id: UUID) -> bool:
+    """
+    Захват задачи на выполнение.
+    
+    Условный UPDATE: из нескольких процессов задачу получает только один.
+    """
+    claimed = db.execute(
+        update(ImportJobModel)
+        .where(ImportJobModel.id == job_id, _stale_condition())
+        .values(
+            status=SyncStatus.RUNNING,
+            started_at=func.coalesce(ImportJobModel.started_at, func.current_timestamp()),
+            updated_at=func.current_timestamp()
+        )
+    ).rowcount
+    db.commit()
+    return claimed == 1
+
+
+class _JobHeartbeat:
+    """
+    Обновление updated_at выполняемой задачи по таймеру.
+    
+    Работает в отдельном потоке и со своей сессией: пока процесс жив, задача
+    не считается прерванной, даже если разбор первой порции файла дольше
+    IMPORT_JOB_STALE_SECONDS.
+    """
+    
+    def __init__(self, job_id: UUID, interval: float = max(1, settings.IMPORT_JOB_STALE_SECONDS // 3)):
+        self.job_id = job_id
+        self.interval = interval
+        self._stopped = threading.Event()
+        self._thread = threading.Thread(
+            target=self._run,
+            name=f"import-job-heartbeat-{job_id}",
+            daemon=True
+        )
+    
+    def __enter__(self) -> "_JobHeartbeat":
+        self._thread.start()
+        return self
+    
+    def __exit__(self, exc_type, exc_val, exc_tb) -> None:
+        self._stopped.set()
+        self._thread.join()
+    
+    def _run(self) -> None:
+        while not self._stopped.wait(self.interval):
+            db = SessionLocal()
+            try:
+                db.execute(
+                    update(ImportJobModel)
+                    .where(ImportJobModel.id == self.job_id, ImportJobModel.status == SyncStatus.RUNNING)
+                    .values(updated_at=func.current_timestamp())
+                )
+                db.commit()
+            except Exception as e:
+                logger.warning(f"Не удалось обновить задачу импорта {self.job_id}: {e}")
+            finally:
+                db.close()
+
+
+def _remove_upload(file_path: Optional[str]) -> None:
+    """Удаление загруженного файла задачи."""
+    if not file_path:
+        return
+    try:
+        os.remove(file_path)
+    except FileNotFoundError:
+        pass
+    except OSError as e:
+        logger.warning(f"Не удалось удалить файл импорта {file_path}: {e}")
+
+
+def _result_for_storage(result: ImportResult) -> dict:
+    """Результат для сохранения в задаче с ограничением числа сообщений."""
+    data = result.model_dump()
+    data["errors"] = data["errors"][:IMPORT_JOB_MAX_MESSAGES]
+    data["warnings"] = data["warnings"][:IMPORT_JOB_MAX_MESSAGES]
+    return data
+
+
+def run_import_job(job_id: UUID) -> None:
+    """Выполнение (или продолжение) задачи импорта."""
+    db = SessionLocal()
+    try:
+        if not _claim_job(db, job_id):
+            return
+        
+        job = db.query(ImportJobModel).filter(ImportJobModel.id == job_id).one()
+        result = ImportResult(**job.result) if job.result else ImportResult(
+            total_items=0,
+            processed_items=0,
+            created_items=0,
+            updated_items=0,
+            failed_items=0
+        )
+        if job.rows_committed:
+            logger.info(f"Продолжение задачи импорта {job.id} со строки {job.rows_committed + 1}")
+        
+        # Файл разбирается в пуле процессов, строки приходят в порядке файла
+        reader = ParallelFileReader(job.file_path, job.file_format)
+        
+        def save_checkpoint(rows_committed: int) -> None:
+            job.rows_committed = rows_committed
+            job.result = _result_for_storage(result)
+            if job.file_size:
+                job.progress = max(
+                    job.progress or 0,
+                    min(99, reader.position * 100 // job.file_size)
+                )
+        
+        with _JobHeartbeat(job.id):
+            ImportService(db).import_products_rows(
+                reader,
+                job.created_by,
+                result,
+                update_existing=job.update_existing,
+                skip_rows=job.rows_committed or 0,
+                on_batch=save_checkpoint
+            )
+        
+        job.status = SyncStatus.PARTIAL if result.failed_items else SyncStatus.SUCCESS
+        job.progress = 100
+        job.result = _result_for_storage(result)
+        job.completed_at = datetime.utcnow()
+        db.commit()
+        
+        _remove_upload(job.file_path)
+        logger.info(f"Задача импорта {job.id} завершена: {result.processed_items} обработано, "
+                   f"{result.failed_items} ошибок")
+    
+    except Exception as e:
+        db.rollback()
+        error = e.detail if isinstance(e, HTTPException) else str(e)
+        logger.error(f"Ошибка задачи импорта {job_id}: {error}")
+        
+        db.execute(
+            update(ImportJobModel)
+            .where(ImportJobModel.id == job_id)
+            .values(
+                status=SyncStatus.ERROR,
+                error_message=error,
+                completed_at=datetime.utcnow()
+            )
+        )
+        db.commit()
+        
+        # Задача с ошибкой не возобновляется: файл больше не нужен
+        _remove_upload(db.query(ImportJobModel.file_path).filter(ImportJobModel.id == job_id).scalar())
+    
+    finally:
+        db.close()
+
+
+def _run_queued_job(job_id: UUID) -> None:
+    try:
+        run_import_job(job_id)
+    finally:
+        with _queued_jobs_lock:
+            _queued_jobs.discard(job_id)
+
+
+def submit_import_job(job_id: UUID) -> bool:
+    """Постановка задачи импорта в очередь пула (False - задача уже в очереди)."""
+    with _queued_jobs_lock:
+        if job_id in _queued_jobs:
+            return False
+        _queued_jobs.add(job_id)
+    _executor.submit(_run_queued_job, job_id)
+    return True
+
+
+def resume_import_jobs() -> int:
+    """
+    Постановка в очередь прерванных задач импорта.
+    
+    Берутся задачи, не обновлявшиеся дольше IMPORT_JOB_STALE_SECONDS:
+    ожидающая задача, созданная недавно, стоит в очереди создавшего ее
+    процесса. Задачи из очереди этого процесса повторно не ставятся.
+    """
+    db = SessionLocal()
+    try:
+        job_ids = [
+            job_id for (job_id,) in db.query(ImportJobModel.id).filter(
+                ImportJobModel.status.in_([SyncStatus.IDLE, SyncStatus.RUNNING]),
+                ImportJobModel.updated_at < _stale_before()
+            )
+        ]
+    finally:
+        db.close()
+    
+    job_ids = [job_id for job_id in job_ids if submit_import_job(job_id)]
+    if job_ids:
+        logger.info(f"Возобновлено задач импорта: {len(job_ids)}")
+    return len(job_ids)
+
+
+async def watch_import_jobs() -> None:
+    """
+    Периодическое возобновление прерванных задач.
+    
+    Задача, прерванная падением процесса, становится доступной для захвата
+    через IMPORT_JOB_STALE_SECONDS после последнего обновления.
+    """
+    while True:
+        try:
+            await asyncio.to_thread(resume_import_jobs)
+        except Exception as e:
+            logger.error(f"Ошибка возобновления задач импорта: {e}")
+        await asyncio.sleep(settings.IMPORT_JOB_STALE_SECONDS)
+
+
+def shutdown_import_jobs() -> None:
+    """Остановка пулов: задачи из очереди будут возобновлены при следующем запуске."""
+    _executor.shutdown(wait=False, cancel_futures=True)
+    shutdown_parse_pool()
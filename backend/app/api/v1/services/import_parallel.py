@@ -0,0 +1,228 @@
+"""
+Параллельный разбор файлов импорта.
+
+CSV делится на диапазоны байтов по границам записей, Excel - по листам. Части
+разбираются в пуле процессов и отдаются в порядке файла; одновременно в
+обработке не больше двух частей на процесс, поэтому расход памяти ограничен.
+"""
+
+import io
+import logging
+import multiprocessing
+import os
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from typing import Any, Callable, Dict, Iterator, List, Optional, Tuple
+
+from fastapi import HTTPException, status
+from openpyxl import load_workbook
+
+from app.core.config import settings
+from app.api.v1.services.import_readers import (
+    ENCODING_SAMPLE_SIZE, READ_CHUNK_SIZE, CsvFormat, excel_sheet_names, iter_csv_rows,
+    iter_excel_rows, iter_file_rows, sniff_csv
+)
+
+logger = logging.getLogger(__name__)
+
+# Часть файла: функция разбора, ее аргументы, позиция в файле после части
+ParseTask = Tuple[Callable[..., List[Dict[str, Any]]], tuple, int]
+
+_pool: Optional[ProcessPoolExecutor] = None
+
+
+class ImportParseError(Exception):
+    """Ошибка разбора части файла в процессе пула."""
+
+
+def _parse_workers() -> int:
+    return settings.IMPORT_PARSE_WORKERS or os.cpu_count() or 1
+
+
+def _get_pool() -> ProcessPoolExecutor:
+    global _pool
+    if _pool is None:
+        # spawn: разбор запускается из потоков задач импорта, fork там небезопасен
+        _pool = ProcessPoolExecutor(
+            max_workers=_parse_workers(),
+            mp_context=multiprocessing.get_context("spawn")
+        )
+    return _pool
+
+
+def shutdown_parse_pool() -> None:
+    """Остановка пула процессов разбора."""
+    global _pool
+    if _pool is not None:
+        _pool.shutdown(wait=False, cancel_futures=True)
+        _pool = None
+
+
+def _parse_csv_range(
+    path: str,
+    header: bytes,
+    start: int,
+    end: int,
+    csv_format: CsvFormat
+) -> List[Dict[str, Any]]:
+    """Разбор диапазона байтов CSV (выполняется в процессе пула)."""
+    with open(path, "rb") as stream:
+        stream.seek(start)
+        data = stream.read(end - start)
+    try:
+        return list(iter_csv_rows(io.BytesIO(header + data), csv_format))
+    except HTTPException as e:
+        # HTTPException не передается между процессами
+        raise ImportParseError(e.detail)
+
+
+def _parse_excel_sheet(path: str, sheet_name: str) -> List[Dict[str, Any]]:
+    """Разбор листа Excel (выполняется в процессе пула)."""
+    with open(path, "rb") as stream:
+        try:
+            return list(iter_excel_rows(stream, sheet_name))
+        except HTTPException as e:
+            raise ImportParseError(e.detail)
+
+
+def _record_end(stream, start: int, target: int, size: int) -> int:
+    """
+    Конец записи CSV, ближайший к target.
+    
+    start - начало записи. Перевод строки завершает запись только вне
+    кавычек, то есть при четном числе кавычек от start (экранированная
+    кавычка "" четность не меняет).
+    """
+    if target >= size:
+        return size
+    stream.seek(start)
+    quotes = stream.read(target - start).count(b'"')
+    position = target
+    while position < size:
+        block = stream.read(READ_CHUNK_SIZE)
+        if not block:
+            break
+        offset = 0
+        while True:
+            newline = block.find(b"\n", offset)
+            if newline < 0:
+                quotes += block.count(b'"', offset)
+                break
+            quotes += block.count(b'"', offset, newline)
+            if quotes % 2 == 0:
+                return position + newline + 1
+            offset = newline + 1
+        position += len(block)
+    return size
+
+
+class ParallelFileReader:
+    """
+    Строки файла импорта, разобранные в пуле процессов, в порядке файла.
+    
+    Небольшие файлы и файлы из одной части читаются в текущем процессе.
+    position - сколько байт файла уже отдано, для расчета прогресса.
+    """
+    
+    def __init__(self, path: str, file_format: str):
+        self.path = path
+        self.file_format = file_format
+        self.size = os.path.getsize(path)
+        self._position = 0
+        self._stream = None
+    
+    @property
+    def position(self) -> int:
+        if self._stream is not None and not self._stream.closed:
+            return self._stream.tell()
+        return self._position
+    
+    def __iter__(self) -> Iterator[Dict[str, Any]]:
+        tasks = None
+        if _parse_workers() > 1:
+            if self.file_format == "csv" and self.size > settings.IMPORT_PARSE_CHUNK_SIZE:
+                tasks = self._csv_tasks()
+            elif self.file_format == "excel":
+                tasks = self._excel_tasks()
+        
+        if tasks is None:
+            with open(self.path, "rb") as self._stream:
+                yield from iter_file_rows(self._stream, self.file_format)
+            self._position = self.size
+            return
+        
+        yield from self._run_ordered(tasks)
+    
+    def _csv_tasks(self) -> Optional[Iterator[ParseTask]]:
+        """
+        Диапазоны CSV примерно по IMPORT_PARSE_CHUNK_SIZE байт.
+        
+        Каждой части передается начало файла до конца заголовка. None для
+        UTF-16: в нем байт перевода строки не является границей символа.
+        """
+        with open(self.path, "rb") as stream:
+            csv_format = sniff_csv(stream.read(ENCODING_SAMPLE_SIZE))
+        if csv_format.encoding == "utf-16":
+            return None
+        return self._csv_ranges(csv_format)
+    
+    def _csv_ranges(self, csv_format: CsvFormat) -> Iterator[ParseTask]:
+        with open(self.path, "rb") as stream:
+            header_end = 0
+            for _ in range(csv_format.skip_rows + 1):
+                header_end = _record_end(stream, header_end, header_end, self.size)
+            stream.seek(0)
+            header = stream.read(header_end)
+            
+            start = header_end
+            while start < self.size:
+                end = _record_end(stream, start, start + settings.IMPORT_PARSE_CHUNK_SIZE, self.size)
+                yield _parse_csv_range, (self.path, header, start, end, csv_format), end
+                start = end
+    
+    def _excel_tasks(self) -> Optional[List[ParseTask]]:
+        """Листы Excel; None, если лист с данными один."""
+        with open(self.path, "rb") as stream:
+            try:
+                workbook = load_workbook(stream, read_only=True)
+            except Exception:
+                # Ошибку покажет последовательное чтение
+                return None
+            try:
+                sheet_names = excel_sheet_names(workbook)
+            finally:
+                workbook.close()
+        
+        if len(sheet_names) < 2:
+            return None
+        return [
+            (_parse_excel_sheet, (self.path, name), self.size * (index + 1) // len(sheet_names))
+            for index, name in enumerate(sheet_names)
+        ]
+    
+    def _run_ordered(self, tasks) -> Iterator[Dict[str, Any]]:
+        """Разбор частей в пуле с выдачей строк в порядке частей."""
+        pool = _get_pool()
+        window = _parse_workers() * 2
+        pending = deque()
+        try:
+            for function, args, end in tasks:
+                pending.append((pool.submit(function, *args), end))
+                if len(pending) >= window:
+                    yield from self._collect(*pending.popleft())
+            while pending:
+                yield from self._collect(*pending.popleft())
+        finally:
+            for future, _ in pending:
+                future.cancel()
+    
+    def _collect(self, future, end: int) -> Iterator[Dict[str, Any]]:
+        try:
+            rows = future.result()
+        except ImportParseError as e:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail=str(e)
+            )
+        yield from rows
+        self._position = end
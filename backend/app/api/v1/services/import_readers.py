@@ -0,0 +1,492 @@
+"""
+Потоковое чтение файлов импорта.
+
+Файл читается из потока загрузки порциями, строки разбираются по мере чтения
+и отдаются пакетами фиксированного размера, поэтому расход памяти не зависит
+от размера файла.
+"""
+
+import codecs
+import csv
+import io
+import re
+from collections import Counter
+from itertools import islice
+from typing import Any, BinaryIO, Dict, Iterable, Iterator, List, NamedTuple, Optional, Tuple
+
+import ijson
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+from fastapi import HTTPException, status
+from openpyxl import load_workbook
+
+# Размер порции чтения файла
+READ_CHUNK_SIZE = 1024 * 1024
+
+# Сколько байт из начала файла используется для определения кодировки
+ENCODING_SAMPLE_SIZE = 64 * 1024
+
+# Сколько байт из начала файла используется для определения разделителя и заголовка
+DIALECT_SAMPLE_SIZE = 8 * 1024
+
+# Ключи JSON-объекта, под которыми может лежать массив записей
+JSON_ARRAY_KEYS = ("data", "items", "products", "records")
+
+# Строк в одном пакете записей Parquet/Arrow
+ARROW_BATCH_SIZE = 10000
+
+# Сигнатура файла Arrow IPC (без нее - потоковый формат IPC)
+ARROW_FILE_MAGIC = b"ARROW1"
+
+# Метки порядка байтов и соответствующие кодировки
+CSV_BOMS = (
+    (codecs.BOM_UTF8, "utf-8-sig"),
+    (codecs.BOM_UTF16_LE, "utf-16"),
+    (codecs.BOM_UTF16_BE, "utf-16"),
+)
+
+# Однобайтовые кириллические кодировки, из которых выбирается наиболее вероятная
+CYRILLIC_ENCODINGS = ("cp1251", "koi8-r", "cp866")
+
+# Частые строчные буквы кириллицы (русский и украинский)
+FREQUENT_CYRILLIC_LETTERS = frozenset("оеаинтсрвлкмдпуяыьгзбчйхжшюіїєґ")
+
+# Допустимые разделители CSV
+CSV_DELIMITERS = ",;\t|"
+
+# Последовательности не-ASCII байтов
+NON_ASCII_RUN = re.compile(rb"[\x80-\xff]+")
+
+# Строка файла: (номер строки данных начиная с 1, значения по заголовкам)
+ImportRow = Tuple[int, Dict[str, Any]]
+
+
+class CsvFormat(NamedTuple):
+    """Параметры CSV файла, определенные по его началу."""
+    encoding: str
+    delimiter: str = ","
+    skip_rows: int = 0  # Строк перед заголовком (название отчета и т.п.)
+
+
+def _cyrillic_score(text: str) -> int:
+    """Насколько текст похож на кириллический: строчные частые буквы весят больше."""
+    lower = sum(1 for char in text if char in FREQUENT_CYRILLIC_LETTERS)
+    upper = sum(1 for char in text if "А" <= char <= "Я")
+    return lower * 2 + upper
+
+
+def detect_encoding(sample: bytes) -> str:
+    """
+    Определение кодировки по началу файла.
+    
+    BOM, затем UTF-8; иначе однобайтовая кириллическая кодировка, в которой
+    не-ASCII байты дают больше всего частых букв, или latin1, если текст не
+    похож на кириллический.
+    """
+    for bom, encoding in CSV_BOMS:
+        if sample.startswith(bom):
+            return encoding
+    
+    try:
+        sample.decode("utf-8")
+        return "utf-8"
+    except UnicodeDecodeError as e:
+        # Последний символ образца может быть обрезан посередине
+        if e.start >= len(sample) - 3 and e.reason == "unexpected end of data":
+            return "utf-8"
+    
+    # В кириллице не-ASCII байты идут словами, в западноевропейских
+    # текстах - отдельными буквами внутри латинских слов
+    runs = NON_ASCII_RUN.findall(sample)
+    high_bytes = b"".join(runs)
+    in_words = sum(len(run) for run in runs if len(run) > 1)
+    if in_words * 2 < len(high_bytes):
+        return "latin1"
+    
+    scores = {
+        encoding: _cyrillic_score(high_bytes.decode(encoding, errors="ignore"))
+        for encoding in CYRILLIC_ENCODINGS
+    }
+    encoding = max(CYRILLIC_ENCODINGS, key=scores.get)
+    return encoding if scores[encoding] else "latin1"
+
+
+def _row_widths(text: str, delimiter: str) -> List[int]:
+    """Число полей в непустых строках образца."""
+    rows = csv.reader(io.StringIO(text, newline=""), delimiter=delimiter)
+    return [len(row) if any(cell.strip() for cell in row) else 0 for row in rows]
+
+
+def _modal_width(widths: List[int]) -> Tuple[int, int]:
+    """Самое частое число полей и количество строк с ним."""
+    counts = Counter(width for width in widths if width)
+    return counts.most_common(1)[0] if counts else (0, 0)
+
+
+def _detect_delimiter(text: str) -> str:
+    """
+    Разделитель CSV.
+    
+    Выбирается разделитель, при котором больше всего строк образца имеют
+    одинаковое число полей (больше одного); при равенстве - предложенный
+    csv.Sniffer, затем запятая.
+    """
+    try:
+        sniffed = csv.Sniffer().sniff(text, delimiters=CSV_DELIMITERS).delimiter
+    except csv.Error:
+        sniffed = ","
+    
+    def consistency(delimiter: str) -> Tuple[int, bool]:
+        width, rows = _modal_width(_row_widths(text, delimiter))
+        return (rows if width > 1 else 0, delimiter == sniffed)
+    
+    return max(CSV_DELIMITERS, key=consistency)
+
+
+def _detect_header_row(text: str, delimiter: str) -> int:
+    """
+    Номер строки заголовка (с нуля).
+    
+    Заголовок - первая строка, в которой столько же полей, сколько в
+    большинстве строк образца; строки перед ним (название отчета, период
+    и т.п.) пропускаются.
+    """
+    widths = _row_widths(text, delimiter)
+    width, _ = _modal_width(widths)
+    for index, row_width in enumerate(widths):
+        if row_width and row_width >= width:
+            return index
+    return 0
+
+
+def sniff_csv(sample: bytes) -> CsvFormat:
+    """Определение кодировки, разделителя и строки заголовка по началу файла."""
+    encoding = detect_encoding(sample)
+    text = sample[:DIALECT_SAMPLE_SIZE].decode(encoding, errors="ignore")
+    
+    # Последняя строка образца может быть обрезана
+    if len(sample) > DIALECT_SAMPLE_SIZE and "\n" in text:
+        text = text[:text.rindex("\n") + 1]
+    
+    delimiter = _detect_delimiter(text)
+    return CsvFormat(encoding, delimiter, _detect_header_row(text, delimiter))
+
+
+def _sniff_stream(stream: BinaryIO) -> CsvFormat:
+    csv_format = sniff_csv(stream.read(ENCODING_SAMPLE_SIZE))
+    stream.seek(0)
+    return csv_format
+
+
+def iter_csv_rows(stream: BinaryIO, csv_format: Optional[CsvFormat] = None) -> Iterator[Dict[str, Any]]:
+    """
+    Построчное чтение CSV.
+    
+    Формат определяется по началу файла, затем файл декодируется один раз
+    по мере чтения.
+    """
+    if csv_format is None:
+        csv_format = _sniff_stream(stream)
+    
+    text = io.TextIOWrapper(
+        io.BufferedReader(_RawStream(stream), READ_CHUNK_SIZE),
+        encoding=csv_format.encoding,
+        newline=""
+    )
+    try:
+        # Строки перед заголовком
+        if csv_format.skip_rows:
+            preamble = csv.reader(text, delimiter=csv_format.delimiter)
+            for _ in range(csv_format.skip_rows):
+                next(preamble, None)
+        yield from csv.DictReader(text, delimiter=csv_format.delimiter)
+    except UnicodeDecodeError:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Не удалось определить кодировку файла"
+        )
+    except csv.Error as e:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Ошибка чтения CSV файла: {str(e)}"
+        )
+    finally:
+        # Поток загрузки закрывает его владелец
+        text.detach()
+
+
+def iter_csv_frames(
+    stream: BinaryIO,
+    chunk_size: int,
+    csv_format: Optional[CsvFormat] = None
+) -> Iterator[pd.DataFrame]:
+    """
+    Чтение CSV блоками DataFrame парсером pandas.
+    
+    Значения читаются как строки без преобразования пустых в NaN; индекс -
+    номера строк данных начиная с 1, как в iter_batches.
+    """
+    if csv_format is None:
+        csv_format = _sniff_stream(stream)
+    
+    try:
+        reader = pd.read_csv(
+            stream,
+            chunksize=chunk_size,
+            dtype=str,
+            keep_default_na=False,
+            encoding=csv_format.encoding,
+            sep=csv_format.delimiter,
+            skiprows=csv_format.skip_rows
+        )
+        for frame in reader:
+            frame.index += 1
+            yield frame
+    except pd.errors.EmptyDataError:
+        return
+    except UnicodeDecodeError:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Не удалось определить кодировку файла"
+        )
+    except pd.errors.ParserError as e:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Ошибка чтения CSV файла: {str(e)}"
+        )
+
+
+def _find_json_items_prefix(stream: BinaryIO) -> str:
+    """
+    Определение пути к записям в JSON.
+    
+    Массив верхнего уровня - записи; объект с массивом под одним из ключей
+    JSON_ARRAY_KEYS - записи этого массива; иначе сам объект - единственная
+    запись.
+    """
+    events = ijson.parse(stream)
+    try:
+        _, event, _ = next(events)
+        if event == "start_array":
+            return "item"
+        if event != "start_map":
+            raise ValueError("Неподдерживаемая структура JSON")
+        
+        key = None
+        for prefix, event, value in events:
+            if prefix == "" and event == "map_key":
+                key = value
+            elif prefix == key and event == "start_array" and key in JSON_ARRAY_KEYS:
+                return f"{key}.item"
+        return ""
+    finally:
+        stream.seek(0)
+
+
+def iter_json_rows(stream: BinaryIO) -> Iterator[Dict[str, Any]]:
+    """Потоковое чтение записей JSON."""
+    try:
+        prefix = _find_json_items_prefix(stream)
+        for item in ijson.items(stream, prefix, use_float=True):
+            if not isinstance(item, dict):
+                raise ValueError("Неподдерживаемая структура JSON")
+            yield item
+    except (ijson.JSONError, StopIteration, ValueError) as e:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Ошибка парсинга JSON: {str(e) or 'пустой файл'}"
+        )
+
+
+def _sheet_header(sheet) -> List[str]:
+    """Заголовки колонок листа (первая строка)."""
+    header = next(sheet.iter_rows(values_only=True, max_row=1), None) or ()
+    return [str(value).strip() if value is not None else "" for value in header]
+
+
+def excel_sheet_names(workbook) -> List[str]:
+    """
+    Листы книги с данными импорта.
+    
+    Первый лист и следующие за ним листы с такими же заголовками (данные,
+    разбитые на несколько листов).
+    """
+    sheets = workbook.worksheets
+    header = _sheet_header(sheets[0])
+    return [sheets[0].title] + [
+        sheet.title for sheet in sheets[1:] if _sheet_header(sheet) == header
+    ]
+
+
+def _iter_sheet_rows(sheet) -> Iterator[Dict[str, Any]]:
+    rows = sheet.iter_rows(values_only=True)
+    header = next(rows, None)
+    if header is None:
+        return
+    
+    columns = [str(value).strip() if value is not None else "" for value in header]
+    for values in rows:
+        # Пустые строки в конце листа
+        if all(value is None for value in values):
+            continue
+        yield {column: value for column, value in zip(columns, values) if column}
+
+
+def iter_excel_rows(stream: BinaryIO, sheet_name: Optional[str] = None) -> Iterator[Dict[str, Any]]:
+    """
+    Построчное чтение Excel в режиме только для чтения.
+    
+    Без sheet_name читаются все листы с данными (excel_sheet_names).
+    """
+    try:
+        workbook = load_workbook(stream, read_only=True, data_only=True)
+    except Exception as e:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Ошибка чтения Excel файла: {str(e)}"
+        )
+    
+    try:
+        sheet_names = [sheet_name] if sheet_name else excel_sheet_names(workbook)
+        for name in sheet_names:
+            yield from _iter_sheet_rows(workbook[name])
+    finally:
+        workbook.close()
+
+
+def _iter_record_batches(
+    stream: BinaryIO,
+    file_format: str,
+    batch_size: int = ARROW_BATCH_SIZE
+) -> Iterator[pa.RecordBatch]:
+    """Пакеты записей Parquet или Arrow IPC (файловый и потоковый формат)."""
+    try:
+        if file_format == "parquet":
+            yield from pq.ParquetFile(stream).iter_batches(batch_size=batch_size)
+            return
+        
+        is_file = stream.read(len(ARROW_FILE_MAGIC)) == ARROW_FILE_MAGIC
+        stream.seek(0)
+        if is_file:
+            reader = pa.ipc.open_file(stream)
+            for index in range(reader.num_record_batches):
+                yield reader.get_batch(index)
+        else:
+            yield from pa.ipc.open_stream(stream)
+    except (pa.ArrowException, OSError) as e:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Ошибка чтения файла {file_format}: {str(e)}"
+        )
+
+
+def iter_arrow_rows(stream: BinaryIO, file_format: str) -> Iterator[Dict[str, Any]]:
+    """Построчное чтение Parquet или Arrow IPC; значения сохраняют типы колонок."""
+    for batch in _iter_record_batches(stream, file_format):
+        yield from batch.to_pylist()
+
+
+def iter_arrow_frames(stream: BinaryIO, file_format: str, chunk_size: int) -> Iterator[pd.DataFrame]:
+    """Чтение Parquet или Arrow IPC блоками DataFrame без разбора строк."""
+    start = 1
+    for batch in _iter_record_batches(stream, file_format, chunk_size):
+        frame = batch.to_pandas()
+        frame.index += start
+        start += len(frame)
+        yield frame
+
+
+def detect_file_format(filename: str) -> str:
+    """Определение формата файла импорта по расширению."""
+    filename = (filename or "").lower()
+    if filename.endswith(".csv"):
+        return "csv"
+    if filename.endswith((".xlsx", ".xls")):
+        return "excel"
+    if filename.endswith(".json"):
+        return "json"
+    if filename.endswith(".parquet"):
+        return "parquet"
+    if filename.endswith((".arrow", ".feather", ".arrows")):
+        return "arrow"
+    raise HTTPException(
+        status_code=status.HTTP_400_BAD_REQUEST,
+        detail="Неподдерживаемый формат файла. Поддерживаются: CSV, Excel, JSON, Parquet, Arrow"
+    )
+
+
+def iter_file_rows(stream: BinaryIO, file_format: str) -> Iterator[Dict[str, Any]]:
+    """Построчное чтение файла импорта указанного формата."""
+    if file_format == "csv":
+        return iter_csv_rows(stream)
+    if file_format == "excel":
+        return iter_excel_rows(stream)
+    if file_format == "json":
+        return iter_json_rows(stream)
+    if file_format in ("parquet", "arrow"):
+        return iter_arrow_rows(stream, file_format)
+    raise HTTPException(
+        status_code=status.HTTP_400_BAD_REQUEST,
+        detail="Неподдерживаемый формат файла. Поддерживаются: CSV, Excel, JSON, Parquet, Arrow"
+    )
+
+
+def iter_batches(
+    rows: Iterable[Dict[str, Any]],
+    batch_size: int,
+    skip: int = 0
+) -> Iterator[List[ImportRow]]:
+    """
+    Разбиение строк на пакеты с сохранением номеров строк.
+    
+    Первые skip строк пропускаются (уже обработаны), нумерация не меняется.
+    """
+    numbered = islice(enumerate(rows, start=1), skip, None)
+    while True:
+        batch = list(islice(numbered, batch_size))
+        if not batch:
+            return
+        yield batch
+
+
+def batch_to_frame(batch: List[ImportRow]) -> pd.DataFrame:
+    """DataFrame пакета, индекс - номера строк файла."""
+    return pd.DataFrame.from_records(
+        [item for _, item in batch],
+        index=[row_number for row_number, _ in batch]
+    )
+
+
+def iter_file_frames(stream: BinaryIO, file_format: str, chunk_size: int) -> Iterator[pd.DataFrame]:
+    """
+    Чтение файла импорта блоками DataFrame.
+    
+    CSV разбирается сразу в DataFrame, Parquet и Arrow преобразуются из
+    пакетов записей, остальные форматы - построчно с группировкой строк в блоки.
+    """
+    if file_format == "csv":
+        return iter_csv_frames(stream, chunk_size)
+    if file_format in ("parquet", "arrow"):
+        return iter_arrow_frames(stream, file_format, chunk_size)
+    rows = iter_file_rows(stream, file_format)
+    return (batch_to_frame(batch) for batch in iter_batches(rows, chunk_size))
+
+
+class _RawStream(io.RawIOBase):
+    """Адаптер файла загрузки (SpooledTemporaryFile) к интерфейсу io."""
+    
+    def __init__(self, stream: BinaryIO):
+        self._stream = stream
+    
+    def readable(self) -> bool:
+        return True
+    
+    def readinto(self, buffer) -> int:
+        data = self._stream.read(len(buffer))
+        buffer[:len(data)] = data
+        return len(data)
+    
+    def close(self) -> None:
+        # Не закрываем исходный поток
+        super().close()
@@ -3,31 +3,106 @@
 """
 
 import logging
-import csv
-import json
-import pandas as pd
-from typing import List, Dict, Any, Optional, Union, BinaryIO
-from uuid import UUID
+from typing import List, Dict, Any, Callable, Iterable, Optional, Tuple, Union, BinaryIO
+from uuid import UUID, uuid4
 from datetime import datetime
-from io import StringIO, BytesIO
+from pydantic import ValidationError
+from sqlalchemy import select
 from sqlalchemy.orm import Session
 from fastapi import HTTPException, status, UploadFile
 
+from app.core.cache import response_cache
+from app.core.config import settings
+from app.core.database.bulk import any_of, copy_rows
 from app.database.models import (
     Product as ProductModel,
-    Category as CategoryModel,
-    Supplier as SupplierModel,
     UserLog as UserLogModel
 )
 from app.api.v1.schemas.import_data import (
     ImportResult, ImportStatus, ImportSource, ImportMapping,
-    ProductImportData, CategoryImportData, SupplierImportData
+    ImportPreview, ImportValidationError, ProductImportData, CategoryImportData, SupplierImportData
 )
+from app.api.v1.schemas.product import ProductCreate
 from app.api.v1.services.product_service import ProductService
 from app.api.v1.services.category_service import CategoryService
+from app.api.v1.services.import_readers import (
+    detect_file_format, iter_file_rows, iter_file_frames, iter_batches, ImportRow
+)
+from app.api.v1.services.import_validation import (
+    PRODUCT_IMPORT_FIELDS, errors_to_records, normalized_skus, sku_notices, validate_products_frame
+)
+from app.api.v1.services.reference_resolver import ReferenceResolver
 
 logger = logging.getLogger(__name__)
 
+# Сколько строк файла показывается в предварительном просмотре
+IMPORT_PREVIEW_SAMPLE_SIZE = 10
+
+# Сколько ошибок валидации возвращается в предварительном просмотре
+IMPORT_PREVIEW_MAX_ERRORS = 1000
+
+# Колонки временной таблицы импорта товаров
+IMPORT_STAGE_COLUMNS = (
+    "row_number", "id", "sku", "name", "description", "unit_price", "cost_price",
+    "unit_of_measure", "category_id", "supplier_id", "barcode", "status"
+)
+
+# Временная таблица с типами колонок products, удаляется при коммите
+IMPORT_STAGE_DDL = """
+CREATE TEMP TABLE import_products_stage ON COMMIT DROP AS
+SELECT 0 AS row_number, id, sku, name, description, unit_price, cost_price,
+    unit_of_measure, category_id, supplier_id, barcode, status
+FROM products
+WITH NO DATA
+"""
+
+# Слияние временной таблицы с products. Все CTE видят снимок до вставки,
+# поэтому existing - товары, существовавшие до импорта пакета.
+IMPORT_MERGE_SQL = """
+WITH existing AS (
+    SELECT s.sku
+    FROM import_products_stage s
+    JOIN products p ON p.sku = s.sku
+),
+merged AS (
+    INSERT INTO products (
+        id, sku, name, description, unit_price, cost_price, unit_of_measure,
+        category_id, supplier_id, barcode, status, created_at, updated_at
+    )
+    SELECT id, sku, name, description, unit_price, cost_price, unit_of_measure,
+        category_id, supplier_id, barcode, status, CURRENT_TIMESTAMP, CURRENT_TIMESTAMP
+    FROM import_products_stage
+    ORDER BY row_number
+    ON CONFLICT (sku) DO {conflict_action}
+    RETURNING id, sku
+),
+written AS (
+    SELECT s.row_number, merged.id, s.sku IN (SELECT sku FROM existing) AS updated,
+        to_jsonb(s) - 'row_number' - 'id' AS new_values
+    FROM merged
+    JOIN import_products_stage s ON s.sku = merged.sku
+),
+logged AS (
+    INSERT INTO user_logs (id, user_id, action, entity_type, entity_id, new_values, created_at)
+    SELECT gen_random_uuid(), %(user_id)s::uuid,
+        CASE WHEN updated THEN 'UPDATE' ELSE 'CREATE' END,
+        'product', id, new_values, CURRENT_TIMESTAMP
+    FROM written
+)
+SELECT row_number, updated FROM written
+"""
+
+# Поля, обновляемые у существующих товаров (update_existing)
+IMPORT_UPDATE_ACTION = """UPDATE SET
+        name = EXCLUDED.name,
+        description = EXCLUDED.description,
+        unit_price = EXCLUDED.unit_price,
+        cost_price = EXCLUDED.cost_price,
+        unit_of_measure = EXCLUDED.unit_of_measure,
+        category_id = EXCLUDED.category_id,
+        supplier_id = EXCLUDED.supplier_id,
+        updated_at = EXCLUDED.updated_at"""
+
 
 class ImportService:
     """Сервис для импорта данных."""
@@ -42,7 +117,8 @@ class ImportService:
         log_entry = UserLogModel(
             user_id=user_id,
             action=action,
-            details=details,
+            entity_type="import",
+            new_values=details,
             ip_address="system",
             user_agent="ImportService"
         )
@@ -50,76 +126,7 @@ class ImportService:
     
     def _detect_file_format(self, file: UploadFile) -> str:
         """Определение формата файла."""
-        filename = file.filename.lower()
-        
-        if filename.endswith('.csv'):
-            return 'csv'
-        elif filename.endswith(('.xlsx', '.xls')):
-            return 'excel'
-        elif filename.endswith('.json'):
-            return 'json'
-        else:
-            raise HTTPException(
-                status_code=status.HTTP_400_BAD_REQUEST,
-                detail="Неподдерживаемый формат файла. Поддерживаются: CSV, Excel, JSON"
-            )
-    
-    def _parse_csv_file(self, file_content: bytes, encoding: str = 'utf-8') -> List[Dict[str, Any]]:
-        """Парсинг CSV файла."""
-        try:
-            content = file_content.decode(encoding)
-            csv_reader = csv.DictReader(StringIO(content))
-            return list(csv_reader)
-        except UnicodeDecodeError:
-            # Пробуем другие кодировки
-            for enc in ['cp1251', 'latin1']:
-                try:
-                    content = file_content.decode(enc)
-                    csv_reader = csv.DictReader(StringIO(content))
-                    return list(csv_reader)
-                except UnicodeDecodeError:
-                    continue
-            raise HTTPException(
-                status_code=status.HTTP_400_BAD_REQUEST,
-                detail="Не удалось определить кодировку файла"
-            )
-    
-    def _parse_excel_file(self, file_content: bytes) -> List[Dict[str, Any]]:
-        """Парсинг Excel файла."""
-        try:
-            df = pd.read_excel(BytesIO(file_content))
-            # Заменяем NaN на None
-            df = df.where(pd.notnull(df), None)
-            return df.to_dict('records')
-        except Exception as e:
-            raise HTTPException(
-                status_code=status.HTTP_400_BAD_REQUEST,
-                detail=f"Ошибка чтения Excel файла: {str(e)}"
-            )
-    
-    def _parse_json_file(self, file_content: bytes) -> List[Dict[str, Any]]:
-        """Парсинг JSON файла."""
-        try:
-            content = file_content.decode('utf-8')
-            data = json.loads(content)
-            
-            if isinstance(data, list):
-                return data
-            elif isinstance(data, dict):
-                # Если это объект, ищем массив данных
-                for key in ['data', 'items', 'products', 'records']:
-                    if key in data and isinstance(data[key], list):
-                        return data[key]
-                # Если не найден массив, возвращаем как единственный элемент
-                return [data]
-            else:
-                raise ValueError("Неподдерживаемая структура JSON")
-                
-        except (json.JSONDecodeError, ValueError) as e:
-            raise HTTPException(
-                status_code=status.HTTP_400_BAD_REQUEST,
-                detail=f"Ошибка парсинга JSON: {str(e)}"
-            )
+        return detect_file_format(file.filename)
     
     def _map_fields(self, data: Dict[str, Any], mapping: ImportMapping) -> Dict[str, Any]:
         """Маппинг полей согласно настройкам."""
@@ -143,41 +150,284 @@ class ImportService:
         
         return mapped_data
     
-    def _find_or_create_category(self, category_name: str) -> Optional[CategoryModel]:
-        """Поиск или создание категории."""
-        if not category_name:
-            return None
+    def _prepare_product_row(self, item_data: Dict[str, Any]) -> ProductCreate:
+        """Проверка и приведение типов строки импорта."""
+        values = {key: (None if value == '' else value) for key, value in item_data.items()}
+        for field in ('name', 'sku', 'barcode'):
+            if values.get(field) is not None:
+                values[field] = str(values[field]).strip()
         
-        category = self.category_service.get_category_by_name(category_name)
-        if not category:
-            from app.api.v1.schemas.category import CategoryCreate
-            category_data = CategoryCreate(
-                name=category_name,
-                description=f"Автоматически создана при импорте"
-            )
-            category = self.category_service.create_category(category_data)
+        return ProductCreate(
+            name=values['name'],
+            sku=values['sku'],
+            description=values.get('description'),
+            unit_price=values.get('unit_price') or 0,
+            cost_price=values.get('cost_price') or 0,
+            unit_of_measure=values.get('unit_of_measure') or 'шт',
+            barcode=values.get('barcode'),
+            status=values.get('status') or 'active'
+        )
+    
+    def _import_products_batch(
+        self,
+        batch: List[ImportRow],
+        user_id: UUID,
+        references: ReferenceResolver,
+        result: ImportResult,
+        mapping: Optional[ImportMapping],
+        update_existing: bool
+    ):
+        """
+        Запись пакета строк импорта.
         
-        return category
+        Строки проверяются в Python, затем весь пакет загружается COPY во
+        временную таблицу и сливается с products одним
+        INSERT ... ON CONFLICT (sku). Ошибка проверки относится к своей строке,
+        ошибка записи - ко всем строкам пакета. Повтор артикула внутри пакета
+        записывается так же, как повтор в следующем пакете: с update_existing
+        остается последняя строка, без него - первая.
+        """
+        rows = []
+        # Артикул -> позиция в rows: ON CONFLICT не может изменить одну строку
+        # дважды за запрос, поэтому в пакет попадает одна строка артикула
+        positions: Dict[str, int] = {}
+        superseded = []
+        for row_number, raw_item in batch:
+            # Применяем маппинг если есть
+            if mapping:
+                item_data = self._map_fields(raw_item, mapping)
+            else:
+                item_data = raw_item
+            
+            # Валидируем обязательные поля
+            if not item_data.get('name'):
+                result.failed_items += 1
+                result.errors.append(f"Строка {row_number}: отсутствует название товара")
+                continue
+            
+            if not item_data.get('sku'):
+                result.failed_items += 1
+                result.errors.append(f"Строка {row_number}: отсутствует артикул товара")
+                continue
+            
+            try:
+                product = self._prepare_product_row(item_data)
+            except ValidationError as e:
+                result.failed_items += 1
+                result.errors.append(f"Строка {row_number}: {self._format_validation_error(e)}")
+                continue
+            
+            position = positions.get(product.sku)
+            if position is None:
+                positions[product.sku] = len(rows)
+                rows.append((row_number, item_data, product))
+            elif update_existing:
+                superseded.append(rows[position][0])
+                rows[position] = (row_number, item_data, product)
+            else:
+                result.warnings.append(f"Товар с артикулом {product.sku} уже существует")
+        
+        if not rows:
+            return
+        
+        try:
+            with self.db.begin_nested():
+                # Категории и поставщики пакета разрешаются по словарям,
+                # недостающие создаются одним INSERT
+                references.resolve(
+                    (item_data.get('category') for _, item_data, _ in rows),
+                    (item_data.get('supplier') for _, item_data, _ in rows)
+                )
+                prepared = [
+                    (
+                        row_number, uuid4(), product.sku, product.name, product.description,
+                        product.unit_price, product.cost_price, product.unit_of_measure,
+                        references.category_id(item_data.get('category')),
+                        references.supplier_id(item_data.get('supplier')),
+                        product.barcode, product.status.name
+                    )
+                    for row_number, item_data, product in rows
+                ]
+                written = self._merge_products(prepared, user_id, update_existing)
+        except Exception as e:
+            # Ошибку драйвера показываем без текста SQL
+            error = str(getattr(e, 'orig', None) or e)
+            # Справочники, созданные в точке сохранения, откатились вместе с
+            # ней, а словари еще содержат их ID - загружаем словари заново
+            references.reset()
+            result.failed_items += len(rows) + len(superseded)
+            for row_number in sorted([row[0] for row in rows] + superseded):
+                result.errors.append(f"Строка {row_number}: {error}")
+            logger.error(f"Ошибка записи пакета импорта: {e}")
+            return
+        
+        for row_number, _, product in rows:
+            if row_number not in written:
+                result.warnings.append(f"Товар с артикулом {product.sku} уже существует")
+        
+        for row_number in superseded:
+            result.warnings.append(f"Строка {row_number}: артикул повторяется в файле, записана последняя строка")
+        
+        actions = list(written.values())
+        result.created_items += actions.count("CREATE")
+        result.updated_items += actions.count("UPDATE")
+        result.processed_items += len(actions) + len(superseded)
     
-    def _find_or_create_supplier(self, supplier_name: str) -> Optional[SupplierModel]:
-        """Поиск или создание поставщика."""
-        if not supplier_name:
-            return None
+    def _merge_products(
+        self,
+        rows: List[Tuple[Any, ...]],
+        user_id: UUID,
+        update_existing: bool
+    ) -> Dict[int, str]:
+        """
+        Слияние проверенных строк с товарами через временную таблицу.
         
-        supplier = self.db.query(SupplierModel).filter(
-            SupplierModel.name == supplier_name
-        ).first()
+        Строки передаются в порядке IMPORT_STAGE_COLUMNS. Возвращает действие
+        (CREATE/UPDATE) для каждой записанной строки; строки существующих
+        товаров без update_existing не записываются.
+        """
+        connection = self.db.connection()
+        connection.exec_driver_sql(IMPORT_STAGE_DDL)
+        copy_rows(connection, "import_products_stage", IMPORT_STAGE_COLUMNS, rows)
         
-        if not supplier:
-            supplier = SupplierModel(
-                name=supplier_name,
-                contact_person="Автоимпорт",
-                email=f"import@{supplier_name.lower().replace(' ', '')}.com"
-            )
-            self.db.add(supplier)
-            self.db.flush()
+        conflict_action = IMPORT_UPDATE_ACTION if update_existing else "NOTHING"
+        written = connection.exec_driver_sql(
+            IMPORT_MERGE_SQL.format(conflict_action=conflict_action),
+            {"user_id": str(user_id)}
+        )
+        return {
+            row_number: "UPDATE" if updated else "CREATE"
+            for row_number, updated in written
+        }
+    
+    @staticmethod
+    def _format_validation_error(error: ValidationError) -> str:
+        """Текст ошибки валидации строки."""
+        return "; ".join(
+            f"{'.'.join(str(part) for part in item['loc'])}: {item['msg']}"
+            for item in error.errors()
+        )
+    
+    def import_products_stream(
+        self,
+        stream: BinaryIO,
+        file_format: str,
+        user_id: UUID,
+        result: ImportResult,
+        mapping: Optional[ImportMapping] = None,
+        update_existing: bool = False
+    ) -> ImportResult:
+        """Пакетный импорт товаров из потока файла."""
+        return self.import_products_rows(
+            iter_file_rows(stream, file_format), user_id, result, mapping, update_existing
+        )
+    
+    def import_products_rows(
+        self,
+        rows: Iterable[Dict[str, Any]],
+        user_id: UUID,
+        result: ImportResult,
+        mapping: Optional[ImportMapping] = None,
+        update_existing: bool = False,
+        skip_rows: int = 0,
+        on_batch: Optional[Callable[[int], None]] = None
+    ) -> ImportResult:
+        """
+        Пакетный импорт товаров из строк файла.
+        
+        Каждый пакет коммитится отдельно. skip_rows - количество строк, уже
+        записанных ранее (продолжение прерванного импорта). on_batch
+        вызывается с номером последней строки пакета перед коммитом, чтобы
+        контрольная точка сохранялась в одной транзакции с пакетом.
+        """
+        references = ReferenceResolver(self.db)
+        for batch in iter_batches(rows, settings.IMPORT_BATCH_SIZE, skip=skip_rows):
+            result.total_items += len(batch)
+            self._import_products_batch(batch, user_id, references, result, mapping, update_existing)
+            if on_batch is not None:
+                on_batch(batch[-1][0])
+            
+            # Коммитим каждый пакет
+            self.db.commit()
+            logger.info(f"Обработано {result.processed_items} из {result.total_items} записей")
         
-        return supplier
+        if result.created_items or result.updated_items:
+            response_cache.invalidate("products", "categories")
+        return result
+    
+    def preview_products_stream(
+        self,
+        stream: BinaryIO,
+        file_format: str,
+        update_existing: bool = False
+    ) -> ImportPreview:
+        """
+        Предварительный просмотр импорта товаров (dry-run).
+        
+        Файл читается пакетами IMPORT_PREVIEW_BATCH_SIZE строк; каждый пакет
+        проверяется векторно в DataFrame, существующие артикулы пакета
+        выбираются одним запросом. Существующие товары и повторы артикулов -
+        не ошибки, а замечания о том, как импорт запишет строку. В БД ничего
+        не записывается.
+        """
+        total_rows = 0
+        invalid_rows = 0
+        update_rows = 0
+        skipped_rows = 0
+        sample_data: List[Dict[str, Any]] = []
+        column_mapping: Dict[str, str] = {}
+        validation_errors: List[ImportValidationError] = []
+        notices: List[ImportValidationError] = []
+        seen_skus = set()
+        
+        for frame in iter_file_frames(stream, file_format, settings.IMPORT_PREVIEW_BATCH_SIZE):
+            total_rows += len(frame)
+            if len(sample_data) < IMPORT_PREVIEW_SAMPLE_SIZE:
+                sample = frame.head(IMPORT_PREVIEW_SAMPLE_SIZE - len(sample_data))
+                sample_data.extend(
+                    sample.astype(object).where(sample.notna(), None).to_dict("records")
+                )
+            for column in frame.columns:
+                if column in PRODUCT_IMPORT_FIELDS:
+                    column_mapping.setdefault(column, column)
+            
+            skus = normalized_skus(frame).dropna().unique().tolist()
+            existing_skus = self.db.execute(
+                select(ProductModel.sku).where(any_of(ProductModel.sku, skus))
+            ).scalars().all() if skus else []
+            
+            errors = validate_products_frame(frame)
+            invalid = errors["row"].unique()
+            invalid_rows += len(invalid)
+            free = IMPORT_PREVIEW_MAX_ERRORS - len(validation_errors)
+            if free > 0:
+                validation_errors.extend(
+                    ImportValidationError(**error) for error in errors_to_records(errors.head(free))
+                )
+            
+            frame_notices = sku_notices(frame, invalid, seen_skus, existing_skus, update_existing)
+            if update_existing:
+                update_rows += len(frame_notices)
+            else:
+                skipped_rows += len(frame_notices)
+            free = IMPORT_PREVIEW_MAX_ERRORS - len(notices)
+            if free > 0:
+                notices.extend(
+                    ImportValidationError(**notice)
+                    for notice in errors_to_records(frame_notices.head(free))
+                )
+        
+        return ImportPreview(
+            total_rows=total_rows,
+            valid_rows=total_rows - invalid_rows,
+            invalid_rows=invalid_rows,
+            sample_data=sample_data,
+            validation_errors=validation_errors,
+            update_rows=update_rows,
+            skipped_rows=skipped_rows,
+            notices=notices,
+            column_mapping=column_mapping
+        )
     
     async def import_products_from_file(
         self,
@@ -199,117 +449,26 @@ class ImportService:
         )
         
         try:
-            # Читаем файл
-            file_content = await file.read()
             file_format = self._detect_file_format(file)
             
-            # Парсим данные
-            if file_format == 'csv':
-                raw_data = self._parse_csv_file(file_content)
-            elif file_format == 'excel':
-                raw_data = self._parse_excel_file(file_content)
-            elif file_format == 'json':
-                raw_data = self._parse_json_file(file_content)
-            
-            result.total_items = len(raw_data)
-            
             # Логируем начало импорта
             self._log_import_action(user_id, "import_started", {
                 "file_name": file.filename,
-                "file_format": file_format,
-                "total_items": result.total_items
+                "file_format": file_format
             })
             
-            # Обрабатываем каждую запись
-            for i, raw_item in enumerate(raw_data):
-                try:
-                    # Применяем маппинг если есть
-                    if mapping:
-                        item_data = self._map_fields(raw_item, mapping)
-                    else:
-                        item_data = raw_item
-                    
-                    # Валидируем обязательные поля
-                    if not item_data.get('name'):
-                        result.failed_items += 1
-                        result.errors.append(f"Строка {i+1}: отсутствует название товара")
-                        continue
-                    
-                    if not item_data.get('sku'):
-                        result.failed_items += 1
-                        result.errors.append(f"Строка {i+1}: отсутствует артикул товара")
-                        continue
-                    
-                    # Ищем существующий товар
-                    existing_product = self.db.query(ProductModel).filter(
-                        ProductModel.sku == item_data['sku']
-                    ).first()
-                    
-                    if existing_product and not update_existing:
-                        result.warnings.append(f"Товар с артикулом {item_data['sku']} уже существует")
-                        continue
-                    
-                    # Обрабатываем категорию
-                    category = None
-                    if item_data.get('category'):
-                        category = self._find_or_create_category(item_data['category'])
-                    
-                    # Обрабатываем поставщика
-                    supplier = None
-                    if item_data.get('supplier'):
-                        supplier = self._find_or_create_supplier(item_data['supplier'])
-                    
-                    if existing_product and update_existing:
-                        # Обновляем существующий товар
-                        existing_product.name = item_data['name']
-                        existing_product.description = item_data.get('description')
-                        existing_product.unit_price = float(item_data.get('unit_price', 0))
-                        existing_product.cost_price = float(item_data.get('cost_price', 0))
-                        existing_product.unit_of_measure = item_data.get('unit_of_measure', 'шт')
-                        existing_product.category_id = category.id if category else None
-                        existing_product.supplier_id = supplier.id if supplier else None
-                        
-                        result.updated_items += 1
-                    else:
-                        # Создаем новый товар
-                        from app.api.v1.schemas.product import ProductCreate
-                        product_data = ProductCreate(
-                            name=item_data['name'],
-                            sku=item_data['sku'],
-                            description=item_data.get('description'),
-                            unit_price=float(item_data.get('unit_price', 0)),
-                            cost_price=float(item_data.get('cost_price', 0)),
-                            unit_of_measure=item_data.get('unit_of_measure', 'шт'),
-                            category_id=category.id if category else None,
-                            supplier_id=supplier.id if supplier else None,
-                            barcode=item_data.get('barcode'),
-                            status=item_data.get('status', 'active')
-                        )
-                        
-                        new_product = self.product_service.create_product(product_data)
-                        result.created_items += 1
-                    
-                    result.processed_items += 1
-                    
-                    # Коммитим каждые 100 записей
-                    if result.processed_items % 100 == 0:
-                        self.db.commit()
-                        logger.info(f"Обработано {result.processed_items} из {result.total_items} записей")
-                
-                except Exception as e:
-                    result.failed_items += 1
-                    error_msg = f"Строка {i+1}: {str(e)}"
-                    result.errors.append(error_msg)
-                    logger.error(error_msg)
-            
-            # Финальный коммит
-            self.db.commit()
+            # Файл читается потоково и обрабатывается пакетами
+            await file.seek(0)
+            self.import_products_stream(
+                file.file, file_format, user_id, result, mapping, update_existing
+            )
             
             # Логируем завершение импорта
             self._log_import_action(user_id, "import_completed", {
                 "file_name": file.filename,
-                "result": result.dict()
+                "result": result.model_dump()
             })
+            self.db.commit()
             
             logger.info(f"Импорт завершен: {result.processed_items} обработано, "
                        f"{result.created_items} создано, {result.updated_items} обновлено, "
@@ -317,15 +476,19 @@ class ImportService:
         
         except Exception as e:
             self.db.rollback()
-            result.errors.append(f"Критическая ошибка импорта: {str(e)}")
-            logger.error(f"Критическая ошибка импорта: {e}")
+            error = e.detail if isinstance(e, HTTPException) else str(e)
+            result.errors.append(f"Критическая ошибка импорта: {error}")
+            logger.error(f"Критическая ошибка импорта: {error}")
             
             # Логируем ошибку
             self._log_import_action(user_id, "import_failed", {
                 "file_name": file.filename,
-                "error": str(e)
+                "error": error
             })
+            self.db.commit()
             
+            if isinstance(e, HTTPException):
+                raise
             raise HTTPException(
                 status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
                 detail=f"Ошибка импорта: {str(e)}"
@@ -333,50 +496,6 @@ class ImportService:
         
         return result
     
-    def export_products_to_csv(self, filters: Optional[Dict[str, Any]] = None) -> str:
-        """Экспорт товаров в CSV."""
-        query = self.db.query(ProductModel)
-        
-        # Применяем фильтры если есть
-        if filters:
-            if filters.get('category_id'):
-                query = query.filter(ProductModel.category_id == filters['category_id'])
-            if filters.get('supplier_id'):
-                query = query.filter(ProductModel.supplier_id == filters['supplier_id'])
-            if filters.get('status'):
-                query = query.filter(ProductModel.status == filters['status'])
-        
-        products = query.all()
-        
-        # Создаем CSV
-        output = StringIO()
-        writer = csv.writer(output)
-        
-        # Заголовки
-        headers = [
-            'sku', 'name', 'description', 'unit_price', 'cost_price',
-            'unit_of_measure', 'category', 'supplier', 'barcode', 'status'
-        ]
-        writer.writerow(headers)
-        
-        # Данные
-        for product in products:
-            row = [
-                product.sku,
-                product.name,
-                product.description or '',
-                product.unit_price,
-                product.cost_price or 0,
-                product.unit_of_measure,
-                product.category.name if product.category else '',
-                product.supplier.name if product.supplier else '',
-                product.barcode or '',
-                product.status
-            ]
-            writer.writerow(row)
-        
-        return output.getvalue()
-    
     def get_import_template(self, entity_type: str = 'products') -> Dict[str, Any]:
         """Получение шаблона для импорта."""
         if entity_type == 'products':
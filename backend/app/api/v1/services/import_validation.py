@@ -0,0 +1,156 @@
+"""
+Векторная проверка строк импорта товаров.
+
+Пакет строк файла представлен DataFrame, и каждое правило проверяется сразу для
+всех строк пакета операциями pandas. Используется для предварительного
+просмотра импорта (dry-run) без записи в БД.
+"""
+
+from typing import Any, Dict, Iterable, List, Optional, Set
+
+import numpy as np
+import pandas as pd
+
+from app.api.v1.schemas.product import ProductStatus
+
+# Поля товара, которые распознаются в файле импорта
+PRODUCT_IMPORT_FIELDS = (
+    "name", "sku", "barcode", "description", "unit_price", "cost_price",
+    "unit_of_measure", "status", "category", "supplier"
+)
+
+# Максимальная длина текстовых полей (по колонкам БД)
+PRODUCT_FIELD_LENGTHS = {
+    "name": 255,
+    "sku": 100,
+    "barcode": 100,
+    "unit_of_measure": 20,
+    "category": 100,
+    "supplier": 255,
+}
+
+# Цены хранятся как DECIMAL(12, 2)
+PRICE_LIMIT = 10 ** 10
+
+# Колонки таблицы ошибок
+ERROR_COLUMNS = ["row", "field", "value", "error"]
+
+
+def _text(frame: pd.DataFrame, field: str) -> pd.Series:
+    """Значения колонки как строки без пробелов по краям, пустые - NA."""
+    if field not in frame.columns:
+        return pd.Series(np.nan, index=frame.index, dtype=object)
+    values = frame[field]
+    text = values.where(values.isna(), values.astype(str)).str.strip()
+    return text.where(text != "")
+
+
+def _errors(mask: pd.Series, field: str, values: pd.Series, error: str) -> Optional[pd.DataFrame]:
+    """Ошибки для строк, отмеченных маской."""
+    mask = mask.fillna(False).astype(bool)
+    if not mask.any():
+        return None
+    return pd.DataFrame({
+        "row": mask.index[mask],
+        "field": field,
+        "value": values[mask].to_numpy(dtype=object),
+        "error": error,
+    }, columns=ERROR_COLUMNS)
+
+
+def normalized_skus(frame: pd.DataFrame) -> pd.Series:
+    """Артикулы пакета в том виде, в котором они будут записаны."""
+    return _text(frame, "sku")
+
+
+def _table(items: List[Optional[pd.DataFrame]]) -> pd.DataFrame:
+    """Объединение таблиц ERROR_COLUMNS в порядке строк файла."""
+    items = [item for item in items if item is not None]
+    if not items:
+        return pd.DataFrame(columns=ERROR_COLUMNS)
+    return pd.concat(items, ignore_index=True).sort_values("row", kind="stable", ignore_index=True)
+
+
+def validate_products_frame(frame: pd.DataFrame) -> pd.DataFrame:
+    """
+    Проверка пакета строк импорта.
+    
+    Возвращает таблицу ошибок с колонками ERROR_COLUMNS; строки с ошибками
+    не будут записаны.
+    """
+    # Каждая колонка приводится к строкам один раз
+    texts = {field: _text(frame, field) for field in PRODUCT_IMPORT_FIELDS}
+    errors = []
+    
+    # Обязательные поля
+    errors.append(_errors(texts["name"].isna(), "name", texts["name"],
+                          "Отсутствует название товара"))
+    errors.append(_errors(texts["sku"].isna(), "sku", texts["sku"],
+                          "Отсутствует артикул товара"))
+    
+    # Длина текстовых полей
+    for field, max_length in PRODUCT_FIELD_LENGTHS.items():
+        errors.append(_errors(texts[field].str.len() > max_length, field, texts[field],
+                              f"Длина превышает {max_length} символов"))
+    
+    # Числовые поля
+    for field in ("unit_price", "cost_price"):
+        text = texts[field]
+        numbers = pd.to_numeric(text, errors="coerce").astype(float)
+        errors.append(_errors(text.notna() & ~np.isfinite(numbers), field, text,
+                              "Значение не является числом"))
+        errors.append(_errors(numbers < 0, field, text, "Цена не может быть отрицательной"))
+        errors.append(_errors(numbers.abs() >= PRICE_LIMIT, field, text,
+                              "Превышено максимальное значение"))
+    
+    status_values = texts["status"]
+    errors.append(_errors(
+        status_values.notna() & ~status_values.isin([item.value for item in ProductStatus]),
+        "status", status_values, "Неизвестный статус товара"
+    ))
+    
+    return _table(errors)
+
+
+def sku_notices(
+    frame: pd.DataFrame,
+    invalid_rows: Iterable[int],
+    seen_skus: Set[str],
+    existing_skus: Iterable[str] = (),
+    update_existing: bool = False
+) -> pd.DataFrame:
+    """
+    Существующие товары и повторы артикулов среди валидных строк пакета.
+    
+    Это не ошибки: импорт записывает такие строки как IMPORT_MERGE_SQL.
+    С update_existing строка обновляет товар, при повторах артикула в файле
+    остается последняя строка; без update_existing товар не меняется и
+    строка пропускается. seen_skus - артикулы валидных строк предыдущих
+    пакетов (дополняется артикулами пакета), existing_skus - артикулы
+    пакета, уже существующие в БД. Возвращает таблицу с колонками
+    ERROR_COLUMNS, по одной записи на строку.
+    """
+    skus = normalized_skus(frame)
+    skus = skus[~skus.index.isin(list(invalid_rows))].dropna()
+    values = skus.to_numpy(dtype=object)
+    repeated = skus.duplicated(keep="first") | pd.Series(
+        [sku in seen_skus for sku in values], index=skus.index, dtype=bool
+    )
+    seen_skus.update(values)
+    existing = skus.isin(set(existing_skus)) & ~repeated
+    
+    if update_existing:
+        return _table([
+            _errors(existing, "sku", skus, "Товар с таким артикулом существует и будет обновлен"),
+            _errors(repeated, "sku", skus, "Артикул повторяется в файле, записывается последняя строка"),
+        ])
+    return _table([
+        _errors(existing, "sku", skus, "Товар с таким артикулом уже существует, строка не будет записана"),
+        _errors(repeated, "sku", skus, "Артикул повторяется в файле, строка не будет записана"),
+    ])
+
+
+def errors_to_records(errors: pd.DataFrame) -> List[Dict[str, Any]]:
+    """Ошибки в виде словарей; NA заменяется на None."""
+    errors = errors.astype(object).where(errors.notna(), None)
+    return errors.to_dict("records")
@@ -4,28 +4,47 @@
 
 import logging
 from typing import List, Optional, Tuple
-from uuid import UUID
-from sqlalchemy.orm import Session, joinedload
-from sqlalchemy import and_, or_, func, desc, asc
+from uuid import UUID, uuid4
+from sqlalchemy.orm import Session, Query, joinedload, contains_eager
+from sqlalchemy import (
+    and_, or_, func, desc, asc, distinct, tuple_, cast, String,
+    select, insert, update, delete
+)
+from sqlalchemy.dialects.postgresql import insert as pg_insert
 from fastapi import HTTPException, status
+from fastapi.encoders import jsonable_encoder
 
+from app.core.cache import response_cache, get_data_version
+from app.core.database.bulk import any_of
 from app.database.models import (
     Product as ProductModel, 
     Category as CategoryModel,
+    CategoryClosure,
     Supplier as SupplierModel,
     ProductTag as ProductTagModel,
     ProductTagRelation,
     Inventory as InventoryModel,
+    ProductStockSummary,
     UserLog as UserLogModel
 )
 from app.api.v1.schemas.product import (
     ProductCreate, ProductUpdate, ProductFilters, Product, 
-    ProductListItem, ProductBulkUpdate
+    ProductListItem, ProductBulkUpdate, ProductFacets, FacetValue, StockStatus,
+    ProductBulkCreate, ProductBulkCreateResult, ProductBulkCreateRowResult
 )
 from app.api.v1.schemas.common import PaginationParams
 
 logger = logging.getLogger(__name__)
 
+# Количество строк в одном многострочном INSERT при массовом создании
+BULK_INSERT_CHUNK_SIZE = 1000
+
+# Поля сортировки списка товаров из сводных остатков
+SUMMARY_SORT_FIELDS = {
+    "total_quantity": ProductStockSummary.total_quantity,
+    "reserved_quantity": ProductStockSummary.reserved_quantity,
+}
+
 
 class ProductService:
     """Сервис для работы с товарами."""
@@ -39,14 +58,149 @@ class ProductService:
         filters: ProductFilters
     ) -> Tuple[List[ProductModel], int]:
         """Получение списка товаров с фильтрацией и пагинацией."""
-        query = self.db.query(ProductModel).options(
+        query = self.db.query(ProductModel).outerjoin(
+            ProductStockSummary, ProductStockSummary.product_id == ProductModel.id
+        ).options(
             joinedload(ProductModel.category),
             joinedload(ProductModel.supplier),
             joinedload(ProductModel.tags),
-            joinedload(ProductModel.inventory_records)
+            contains_eager(ProductModel.stock_summary)
         )
         
         # Применяем фильтры
+        query = self._apply_filters(query, filters)
+        
+        # Подсчет общего количества
+        total = query.count()
+        
+        # Сортировка
+        if filters.sort_by:
+            sort_column = SUMMARY_SORT_FIELDS.get(filters.sort_by) or getattr(
+                ProductModel, filters.sort_by, None
+            )
+            if sort_column:
+                if filters.sort_order == "desc":
+                    query = query.order_by(desc(sort_column))
+                else:
+                    query = query.order_by(asc(sort_column))
+        
+        # Пагинация
+        products = query.offset(pagination.offset).limit(pagination.size).all()
+        
+        return products, total
+    
+    def get_product_facets(self, filters: ProductFilters) -> ProductFacets:
+        """
+        Подсчет фасетов (категории, поставщики, статусы, статусы остатков).
+        
+        Все счетчики считаются одним запросом с GROUPING SETS по текущему
+        фильтру; товары считаются через COUNT(DISTINCT), поэтому JOIN с
+        тегами не завышает значения.
+        """
+        stock_status = func.coalesce(
+            ProductStockSummary.stock_status, StockStatus.OUT_OF_STOCK.value
+        )
+        
+        query = self.db.query(
+            func.grouping(ProductModel.category_id).label("g_category"),
+            func.grouping(ProductModel.supplier_id).label("g_supplier"),
+            func.grouping(ProductModel.status).label("g_status"),
+            func.grouping(stock_status).label("g_stock_status"),
+            ProductModel.category_id,
+            CategoryModel.name.label("category_name"),
+            ProductModel.supplier_id,
+            SupplierModel.name.label("supplier_name"),
+            ProductModel.status,
+            stock_status.label("stock_status"),
+            func.count(distinct(ProductModel.id)).label("count")
+        ).select_from(ProductModel).outerjoin(
+            CategoryModel, CategoryModel.id == ProductModel.category_id
+        ).outerjoin(
+            SupplierModel, SupplierModel.id == ProductModel.supplier_id
+        ).outerjoin(
+            ProductStockSummary, ProductStockSummary.product_id == ProductModel.id
+        )
+        
+        query = self._apply_filters(query, filters)
+        query = query.group_by(
+            func.grouping_sets(
+                tuple_(ProductModel.category_id, CategoryModel.name),
+                tuple_(ProductModel.supplier_id, SupplierModel.name),
+                tuple_(ProductModel.status),
+                tuple_(stock_status),
+                tuple_()
+            )
+        )
+        
+        facets = ProductFacets(total=0)
+        for row in query.all():
+            if row.g_category == 0:
+                facets.categories.append(FacetValue(
+                    value=str(row.category_id) if row.category_id else None,
+                    label=row.category_name,
+                    count=row.count
+                ))
+            elif row.g_supplier == 0:
+                facets.suppliers.append(FacetValue(
+                    value=str(row.supplier_id) if row.supplier_id else None,
+                    label=row.supplier_name,
+                    count=row.count
+                ))
+            elif row.g_status == 0:
+                facets.statuses.append(FacetValue(
+                    value=row.status.value if row.status else None,
+                    count=row.count
+                ))
+            elif row.g_stock_status == 0:
+                facets.stock_statuses.append(FacetValue(
+                    value=row.stock_status,
+                    count=row.count
+                ))
+            else:
+                facets.total = row.count
+        
+        for values in (facets.categories, facets.suppliers, facets.statuses, facets.stock_statuses):
+            values.sort(key=lambda x: (-x.count, x.label or x.value or ""))
+        
+        return facets
+    
+    def get_export_query(self, filters: Optional[ProductFilters] = None) -> Query:
+        """
+        Запрос выгрузки товаров: плоские колонки без загрузки моделей.
+        
+        Названия категории и поставщика берутся JOIN-ом в том же запросе,
+        фильтры - те же, что у списка товаров.
+        """
+        query = self.db.query(
+            ProductModel.sku,
+            ProductModel.name,
+            ProductModel.description,
+            ProductModel.unit_price,
+            func.coalesce(ProductModel.cost_price, 0).label("cost_price"),
+            ProductModel.unit_of_measure,
+            CategoryModel.name.label("category"),
+            SupplierModel.name.label("supplier"),
+            ProductModel.barcode,
+            # Значение статуса (active), а не имя элемента перечисления в БД
+            func.lower(cast(ProductModel.status, String)).label("status")
+        ).outerjoin(
+            CategoryModel, CategoryModel.id == ProductModel.category_id
+        ).outerjoin(
+            SupplierModel, SupplierModel.id == ProductModel.supplier_id
+        ).outerjoin(
+            ProductStockSummary, ProductStockSummary.product_id == ProductModel.id
+        )
+        
+        if filters:
+            query = self._apply_filters(query, filters)
+        return query.order_by(ProductModel.sku)
+    
+    def _apply_filters(self, query: Query, filters: ProductFilters) -> Query:
+        """
+        Применение фильтров списка товаров к запросу.
+        
+        Запрос должен содержать JOIN с product_stock_summary.
+        """
         if filters.search:
             search_term = f"%{filters.search}%"
             query = query.filter(
@@ -58,7 +212,14 @@ class ProductService:
             )
         
         if filters.category_id:
-            query = query.filter(ProductModel.category_id == filters.category_id)
+            if filters.include_descendants:
+                # Поддерево категории по замыканию иерархии - подзапрос в том же SQL
+                subtree = select(CategoryClosure.descendant_id).where(
+                    CategoryClosure.ancestor_id == filters.category_id
+                )
+                query = query.filter(ProductModel.category_id.in_(subtree))
+            else:
+                query = query.filter(ProductModel.category_id == filters.category_id)
         
         if filters.supplier_id:
             query = query.filter(ProductModel.supplier_id == filters.supplier_id)
@@ -73,41 +234,23 @@ class ProductService:
             query = query.filter(ProductModel.unit_price <= filters.max_price)
         
         if filters.tag_ids:
-            query = query.join(ProductTagRelation).filter(
+            query = query.join(
+                ProductTagRelation, ProductTagRelation.product_id == ProductModel.id
+            ).filter(
                 ProductTagRelation.tag_id.in_(filters.tag_ids)
             )
         
-        # Фильтры по остаткам
-        if filters.stock_status or filters.low_stock or filters.out_of_stock:
-            query = query.join(InventoryModel)
-            
-            if filters.stock_status:
-                query = query.filter(InventoryModel.stock_status == filters.stock_status)
-            
-            if filters.low_stock:
-                query = query.filter(
-                    InventoryModel.quantity <= InventoryModel.min_quantity
-                )
-            
-            if filters.out_of_stock:
-                query = query.filter(InventoryModel.quantity == 0)
+        # Фильтры по сводным остаткам (один товар - одна строка сводки)
+        if filters.stock_status:
+            query = query.filter(ProductStockSummary.stock_status == filters.stock_status.value)
         
-        # Подсчет общего количества
-        total = query.count()
-        
-        # Сортировка
-        if filters.sort_by:
-            sort_column = getattr(ProductModel, filters.sort_by, None)
-            if sort_column:
-                if filters.sort_order == "desc":
-                    query = query.order_by(desc(sort_column))
-                else:
-                    query = query.order_by(asc(sort_column))
+        if filters.low_stock:
+            query = query.filter(ProductStockSummary.stock_status == StockStatus.LOW_STOCK.value)
         
-        # Пагинация
-        products = query.offset(pagination.offset).limit(pagination.size).all()
+        if filters.out_of_stock:
+            query = query.filter(ProductStockSummary.stock_status == StockStatus.OUT_OF_STOCK.value)
         
-        return products, total
+        return query
     
     def get_product_by_id(self, product_id: UUID) -> Optional[ProductModel]:
         """Получение товара по ID."""
@@ -118,6 +261,21 @@ class ProductService:
             joinedload(ProductModel.inventory_records)
         ).filter(ProductModel.id == product_id).first()
     
+    def get_products_watermark(self) -> Tuple:
+        """
+        Watermark данных списка товаров для ETag.
+        
+        Версия каталога из data_versions: увеличивается триггерами при
+        фиксации любой транзакции, изменившей товары, остатки, категории,
+        поставщиков или теги, в том числе в обход сервисов.
+        """
+        return (get_data_version(self.db),)
+    
+    def get_product_watermark(self, product_id: UUID) -> Optional[Tuple]:
+        """Watermark карточки товара для ETag (None, если товар не найден)."""
+        exists = self.db.query(ProductModel.id).filter(ProductModel.id == product_id).first()
+        return (get_data_version(self.db),) if exists else None
+    
     def get_product_by_sku(self, sku: str) -> Optional[ProductModel]:
         """Получение товара по SKU."""
         return self.db.query(ProductModel).filter(ProductModel.sku == sku).first()
@@ -166,6 +324,7 @@ class ProductService:
         
         self.db.commit()
         self.db.refresh(db_product)
+        self._invalidate_cache(categories_changed=db_product.category_id is not None)
         
         # Логируем создание
         self._log_product_action(user_id, "CREATE", db_product.id, None, product_dict)
@@ -229,6 +388,7 @@ class ProductService:
         
         self.db.commit()
         self.db.refresh(product)
+        self._invalidate_cache(categories_changed="category_id" in update_data)
         
         # Логируем изменения
         new_values = {
@@ -275,6 +435,7 @@ class ProductService:
         # Удаляем товар
         self.db.delete(product)
         self.db.commit()
+        self._invalidate_cache(categories_changed=product.category_id is not None)
         
         # Логируем удаление
         self._log_product_action(user_id, "DELETE", product_id, old_values, None)
@@ -287,42 +448,247 @@ class ProductService:
         bulk_data: ProductBulkUpdate, 
         user_id: UUID
     ) -> List[ProductModel]:
-        """Массовое обновление товаров."""
-        products = self.db.query(ProductModel).filter(
-            ProductModel.id.in_(bulk_data.product_ids)
-        ).all()
+        """
+        Массовое обновление товаров.
+        
+        Все товары обновляются одним UPDATE ... WHERE id = ANY(:ids) RETURNING,
+        теги заменяются одним DELETE и одним INSERT ... SELECT, записи журнала
+        добавляются одной многострочной вставкой.
+        """
+        product_ids = list(dict.fromkeys(bulk_data.product_ids))
+        update_data = bulk_data.updates.dict(exclude_unset=True, exclude={'tag_ids'})
+        tag_ids = bulk_data.updates.tag_ids
+        
+        # Проверяем категорию и поставщика
+        if update_data.get("category_id"):
+            if not self.db.query(CategoryModel.id).filter(
+                CategoryModel.id == update_data["category_id"]
+            ).first():
+                raise HTTPException(
+                    status_code=status.HTTP_400_BAD_REQUEST,
+                    detail="Категория не найдена"
+                )
+        
+        if update_data.get("supplier_id"):
+            if not self.db.query(SupplierModel.id).filter(
+                SupplierModel.id == update_data["supplier_id"]
+            ).first():
+                raise HTTPException(
+                    status_code=status.HTTP_400_BAD_REQUEST,
+                    detail="Поставщик не найден"
+                )
+        
+        # Проверяем теги
+        if tag_ids:
+            tag_ids = list(dict.fromkeys(tag_ids))
+            existing_tags = self.db.query(func.count(ProductTagModel.id)).filter(
+                any_of(ProductTagModel.id, tag_ids)
+            ).scalar()
+            if existing_tags != len(tag_ids):
+                raise HTTPException(
+                    status_code=status.HTTP_400_BAD_REQUEST,
+                    detail="Некоторые теги не найдены"
+                )
         
-        if len(products) != len(bulk_data.product_ids):
+        # UPDATE products SET ... FROM products AS old: old видит значения до обновления
+        products = ProductModel.__table__
+        old = products.alias("old")
+        fields = list(update_data.keys())
+        stmt = update(products).where(
+            products.c.id == old.c.id,
+            any_of(products.c.id, product_ids)
+        ).values(
+            **update_data,
+            updated_at=func.current_timestamp()
+        ).returning(
+            products.c.id,
+            *[old.c[field].label(f"old_{field}") for field in fields],
+            *[products.c[field].label(f"new_{field}") for field in fields]
+        )
+        rows = self.db.execute(stmt).mappings().all()
+        
+        if len(rows) != len(product_ids):
+            self.db.rollback()
             raise HTTPException(
                 status_code=status.HTTP_400_BAD_REQUEST,
                 detail="Некоторые товары не найдены"
             )
         
-        updated_products = []
-        update_data = bulk_data.updates.dict(exclude_unset=True, exclude={'tag_ids'})
+        # Заменяем теги у всех товаров сразу
+        if tag_ids is not None:
+            self.db.execute(
+                delete(ProductTagRelation).where(
+                    any_of(ProductTagRelation.product_id, product_ids)
+                )
+            )
+            if tag_ids:
+                self.db.execute(
+                    insert(ProductTagRelation).from_select(
+                        ["product_id", "tag_id"],
+                        select(ProductModel.id, ProductTagModel.id).where(
+                            any_of(ProductModel.id, product_ids),
+                            any_of(ProductTagModel.id, tag_ids)
+                        )
+                    )
+                )
         
-        for product in products:
-            # Сохраняем старые значения
-            old_values = {field: getattr(product, field) for field in update_data.keys()}
-            
-            # Обновляем поля
-            for field, value in update_data.items():
-                setattr(product, field, value)
+        # Логируем изменения одной вставкой
+        self.db.execute(insert(UserLogModel), [
+            {
+                "user_id": user_id,
+                "action": "BULK_UPDATE",
+                "entity_type": "product",
+                "entity_id": row["id"],
+                "old_values": jsonable_encoder({field: row[f"old_{field}"] for field in fields}),
+                "new_values": jsonable_encoder({field: row[f"new_{field}"] for field in fields})
+            }
+            for row in rows
+        ])
+        
+        self.db.commit()
+        self._invalidate_cache(categories_changed="category_id" in update_data)
+        
+        # Загружаем обновленные товары одним запросом
+        updated_products = self.db.query(ProductModel).options(
+            joinedload(ProductModel.category),
+            joinedload(ProductModel.supplier),
+            joinedload(ProductModel.tags),
+            joinedload(ProductModel.inventory_records)
+        ).filter(any_of(ProductModel.id, product_ids)).all()
+        order = {product_id: index for index, product_id in enumerate(product_ids)}
+        updated_products.sort(key=lambda product: order[product.id])
+        
+        logger.info(f"Массово обновлено товаров: {len(updated_products)}")
+        return updated_products
+    
+    def bulk_create_products(
+        self, 
+        bulk_data: ProductBulkCreate, 
+        user_id: UUID
+    ) -> ProductBulkCreateResult:
+        """
+        Массовое создание товаров.
+        
+        Пакет проверяется набором запросов (существующие SKU, категории,
+        поставщики, теги) вместо проверок по каждой строке. Корректные строки
+        вставляются многострочными INSERT ... ON CONFLICT (sku) DO NOTHING
+        частями по BULK_INSERT_CHUNK_SIZE строк. Строки с ошибками не
+        прерывают создание остальных.
+        """
+        items = bulk_data.products
+        
+        # Набор проверок на весь пакет
+        skus = {item.sku for item in items}
+        existing_skus = {
+            sku for (sku,) in self.db.query(ProductModel.sku).filter(any_of(ProductModel.sku, skus))
+        }
+        category_ids = self._existing_ids(CategoryModel, {item.category_id for item in items})
+        supplier_ids = self._existing_ids(SupplierModel, {item.supplier_id for item in items})
+        tag_ids = self._existing_ids(
+            ProductTagModel, {tag_id for item in items for tag_id in item.tag_ids or []}
+        )
+        
+        results = []
+        rows = []
+        seen_skus = set()
+        for index, item in enumerate(items):
+            error = None
+            if item.sku in existing_skus:
+                error = f"Товар с артикулом {item.sku} уже существует"
+            elif item.sku in seen_skus:
+                error = f"Артикул {item.sku} повторяется в запросе"
+            elif item.category_id and item.category_id not in category_ids:
+                error = "Категория не найдена"
+            elif item.supplier_id and item.supplier_id not in supplier_ids:
+                error = "Поставщик не найден"
+            elif item.tag_ids and not set(item.tag_ids) <= tag_ids:
+                error = "Некоторые теги не найдены"
             
-            # Обновляем теги если указаны
-            if bulk_data.updates.tag_ids is not None:
-                self._update_product_tags(product.id, bulk_data.updates.tag_ids)
+            result = ProductBulkCreateRowResult(
+                index=index, sku=item.sku, success=error is None, error=error
+            )
+            results.append(result)
+            if error is None:
+                seen_skus.add(item.sku)
+                result.product_id = uuid4()
+                rows.append((result, item))
+        
+        # Один скомпилированный INSERT; SQLAlchemy отправляет его многострочными
+        # VALUES по BULK_INSERT_CHUNK_SIZE строк (insertmanyvalues)
+        products = ProductModel.__table__
+        stmt = pg_insert(products).on_conflict_do_nothing(
+            index_elements=["sku"]
+        ).returning(products.c.id)
+        created = []
+        for start in range(0, len(rows), BULK_INSERT_CHUNK_SIZE):
+            chunk = rows[start:start + BULK_INSERT_CHUNK_SIZE]
+            inserted_ids = set(self.db.execute(stmt, [
+                {"id": result.product_id, **item.dict(exclude={'tag_ids'})}
+                for result, item in chunk
+            ]).scalars())
             
-            updated_products.append(product)
+            # Строки, вставленные параллельно другим запросом
+            for result, item in chunk:
+                if result.product_id in inserted_ids:
+                    created.append((result, item))
+                else:
+                    result.success = False
+                    result.product_id = None
+                    result.error = f"Товар с артикулом {item.sku} уже существует"
+        
+        if created:
+            tag_rows = [
+                {"product_id": result.product_id, "tag_id": tag_id}
+                for result, item in created
+                for tag_id in dict.fromkeys(item.tag_ids or [])
+            ]
+            if tag_rows:
+                self.db.execute(insert(ProductTagRelation.__table__), tag_rows)
             
-            # Логируем изменения
-            new_values = {field: getattr(product, field) for field in update_data.keys()}
-            self._log_product_action(user_id, "BULK_UPDATE", product.id, old_values, new_values)
+            self.db.execute(insert(UserLogModel.__table__), [
+                {
+                    "user_id": user_id,
+                    "action": "CREATE",
+                    "entity_type": "product",
+                    "entity_id": result.product_id,
+                    "new_values": jsonable_encoder(item.dict(exclude={'tag_ids'}))
+                }
+                for result, item in created
+            ])
         
         self.db.commit()
+        if created:
+            self._invalidate_cache(
+                categories_changed=any(item.category_id for _, item in created)
+            )
         
-        logger.info(f"Массово обновлено товаров: {len(updated_products)}")
-        return updated_products
+        logger.info(f"Массово создано товаров: {len(created)} из {len(items)}")
+        return ProductBulkCreateResult(
+            total=len(items),
+            created=len(created),
+            failed=len(items) - len(created),
+            results=results
+        )
+    
+    def _existing_ids(self, model, ids: set) -> set:
+        """Множество существующих ID из переданных (одним запросом)."""
+        ids = {id_ for id_ in ids if id_}
+        if not ids:
+            return set()
+        return {id_ for (id_,) in self.db.query(model.id).filter(any_of(model.id, ids))}
+    
+    @staticmethod
+    def _invalidate_cache(categories_changed: bool = False) -> None:
+        """
+        Сброс кеша ответов по товарам.
+        
+        При изменении привязки товаров к категориям сбрасывается и кеш
+        категорий (количество товаров в дереве).
+        """
+        if categories_changed:
+            response_cache.invalidate("products", "categories")
+        else:
+            response_cache.invalidate("products")
     
     def _add_product_tags(self, product_id: UUID, tag_ids: List[UUID]) -> None:
         """Добавление тегов к товару."""
@@ -367,7 +733,7 @@ class ProductService:
             action=action,
             entity_type="product",
             entity_id=product_id,
-            old_values=old_values,
-            new_values=new_values
+            old_values=jsonable_encoder(old_values),
+            new_values=jsonable_encoder(new_values)
         )
         self.db.add(log_entry) 
\ No newline at end of file
@@ -0,0 +1,124 @@
+"""
+Справочники категорий и поставщиков для импорта и синхронизации.
+"""
+
+import logging
+from typing import Dict, Iterable, Optional
+from uuid import UUID
+
+from sqlalchemy import insert, select
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.orm import Session
+
+from app.core.database.bulk import any_of
+from app.database.models import Category as CategoryModel, Supplier as SupplierModel
+
+logger = logging.getLogger(__name__)
+
+
+class ReferenceResolver:
+    """
+    Сопоставление названий категорий и поставщиков с их ID.
+    
+    Справочники загружаются из БД один раз (по запросу на справочник), затем
+    названия разрешаются по словарям. Неизвестные названия собираются по всему
+    пакету и создаются одним многострочным INSERT.
+    """
+    
+    def __init__(
+        self,
+        db: Session,
+        category_description: str = "Автоматически создана при импорте"
+    ):
+        self.db = db
+        self.category_description = category_description
+        self._categories: Optional[Dict[str, UUID]] = None
+        self._suppliers: Optional[Dict[str, UUID]] = None
+    
+    @staticmethod
+    def _names(names: Iterable) -> list:
+        """Непустые названия без повторов с сохранением порядка."""
+        return list(dict.fromkeys(str(name).strip() for name in names if name))
+    
+    def _load(self) -> None:
+        if self._categories is None:
+            self._categories = dict(
+                self.db.execute(select(CategoryModel.name, CategoryModel.id)).all()
+            )
+        if self._suppliers is None:
+            # Название поставщика не уникально - берем первого по дате создания
+            self._suppliers = {}
+            for name, supplier_id in self.db.execute(
+                select(SupplierModel.name, SupplierModel.id).order_by(SupplierModel.created_at)
+            ):
+                self._suppliers.setdefault(name, supplier_id)
+    
+    def resolve(
+        self,
+        category_names: Iterable = (),
+        supplier_names: Iterable = ()
+    ) -> None:
+        """Создание отсутствующих категорий и поставщиков пакета."""
+        self._load()
+        
+        missing_categories = [
+            name for name in self._names(category_names) if name not in self._categories
+        ]
+        if missing_categories:
+            self._create_categories(missing_categories)
+        
+        missing_suppliers = [
+            name for name in self._names(supplier_names) if name not in self._suppliers
+        ]
+        if missing_suppliers:
+            self._create_suppliers(missing_suppliers)
+    
+    def _create_categories(self, names: list) -> None:
+        categories = CategoryModel.__table__
+        stmt = pg_insert(categories).on_conflict_do_nothing(
+            index_elements=["name"]
+        ).returning(categories.c.name, categories.c.id)
+        created = dict(self.db.execute(stmt, [
+            {"name": name, "description": self.category_description}
+            for name in names
+        ]).all())
+        self._categories.update(created)
+        
+        # Категории, созданные параллельно другим запросом
+        concurrent = [name for name in names if name not in created]
+        if concurrent:
+            self._categories.update(self.db.execute(
+                select(CategoryModel.name, CategoryModel.id).where(
+                    any_of(CategoryModel.name, concurrent)
+                )
+            ).all())
+        
+        # Кеш сбрасывает вызывающий код после фиксации транзакции
+        if created:
+            logger.info(f"Создано категорий: {len(created)}")
+    
+    def _create_suppliers(self, names: list) -> None:
+        suppliers = SupplierModel.__table__
+        stmt = insert(suppliers).returning(suppliers.c.name, suppliers.c.id)
+        self._suppliers.update(self.db.execute(stmt, [
+            {
+                "name": name,
+                "contact_person": "Автоимпорт",
+                "email": f"import@{name.lower().replace(' ', '')}.com"
+            }
+            for name in names
+        ]).all())
+        logger.info(f"Создано поставщиков: {len(names)}")
+    
+    def reset(self) -> None:
+        """Сброс словарей, например после отката транзакции."""
+        self._categories = None
+        self._suppliers = None
+    
+    def category_id(self, name) -> Optional[UUID]:
+        """ID категории по названию (после resolve)."""
+        return self._categories.get(str(name).strip()) if name else None
+    
+    def supplier_id(self, name) -> Optional[UUID]:
+        """ID поставщика по названию (после resolve)."""
+        return self._suppliers.get(str(name).strip()) if name else None
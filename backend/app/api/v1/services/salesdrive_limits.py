@@ -0,0 +1,245 @@
+"""
+Ограничение частоты запросов к SalesDrive API и защита от его сбоев.
+
+Маркерная корзина (token bucket): токены пополняются со скоростью rate в
+секунду до capacity, каждый запрос забирает один токен, поэтому после простоя
+допускается серия из capacity запросов без ожидания. Число одновременных
+запросов ограничено отдельно. Заголовки X-RateLimit-* ответа API уточняют
+остаток токенов и время сброса лимита.
+
+Автоматический выключатель (circuit breaker) после серии сбоев API на время
+перестает отправлять запросы, затем пропускает один пробный запрос. Метрики
+запросов собираются по каждому endpoint API.
+"""
+
+import asyncio
+import threading
+import time
+import weakref
+from contextlib import asynccontextmanager
+from email.utils import parsedate_to_datetime
+from collections import defaultdict
+from typing import AsyncIterator, Any, Dict, Mapping, Optional
+
+# Значения X-RateLimit-Reset больше этого - время Unix, а не секунды до сброса
+RESET_EPOCH_THRESHOLD = 10 ** 9
+
+
+def _header_number(headers: Mapping[str, str], name: str) -> Optional[float]:
+    try:
+        value = headers.get(name)
+        return float(value) if value is not None else None
+    except (TypeError, ValueError):
+        return None
+
+
+def retry_after_seconds(headers: Mapping[str, str], default: float) -> float:
+    """Значение Retry-After: секунды или HTTP дата."""
+    value = headers.get("Retry-After")
+    if value is None:
+        return default
+    seconds = _header_number(headers, "Retry-After")
+    if seconds is not None:
+        return max(0.0, seconds)
+    try:
+        return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+    except (TypeError, ValueError):
+        return default
+
+
+class TokenBucket:
+    """Ограничитель запросов: маркерная корзина и число одновременных запросов."""
+    
+    def __init__(self, rate: float, capacity: int = 1, max_concurrency: Optional[int] = None):
+        self.rate = rate
+        self.capacity = max(1, capacity)
+        self.max_concurrency = max_concurrency
+        self._tokens = float(self.capacity)
+        self._updated = time.monotonic()
+        self._paused_until = 0.0
+        self._lock = threading.Lock()
+        # Семафоры asyncio привязаны к циклу событий - по одному на цикл
+        self._semaphores: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, asyncio.Semaphore]" = (
+            weakref.WeakKeyDictionary()
+        )
+    
+    def _refill(self, now: float) -> None:
+        self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+    
+    def _try_acquire(self) -> float:
+        """Забрать токен; 0 - токен получен, иначе сколько секунд ждать."""
+        with self._lock:
+            now = time.monotonic()
+            self._refill(now)
+            if now < self._paused_until:
+                return self._paused_until - now
+            if self._tokens >= 1:
+                self._tokens -= 1
+                return 0.0
+            return (1 - self._tokens) / self.rate
+    
+    async def acquire(self) -> None:
+        """Ожидание токена на запрос."""
+        while True:
+            wait = self._try_acquire()
+            if not wait:
+                return
+            await asyncio.sleep(wait)
+    
+    @asynccontextmanager
+    async def concurrency(self) -> AsyncIterator[None]:
+        """Слот одновременного запроса (без ограничения, если max_concurrency не задан)."""
+        if not self.max_concurrency:
+            yield
+            return
+        loop = asyncio.get_running_loop()
+        semaphore = self._semaphores.get(loop)
+        if semaphore is None:
+            semaphore = self._semaphores[loop] = asyncio.Semaphore(self.max_concurrency)
+        async with semaphore:
+            yield
+    
+    def paused_for(self) -> float:
+        """Сколько секунд осталось до конца приостановки."""
+        with self._lock:
+            return max(0.0, self._paused_until - time.monotonic())
+    
+    def pause(self, seconds: float) -> None:
+        """Приостановка выдачи токенов (например, до сброса лимита API)."""
+        with self._lock:
+            self._paused_until = max(self._paused_until, time.monotonic() + seconds)
+    
+    def update_from_headers(self, headers: Mapping[str, str]) -> None:
+        """
+        Учет заголовков лимита из ответа API.
+        
+        X-RateLimit-Remaining ограничивает остаток токенов; при нулевом остатке
+        выдача приостанавливается до X-RateLimit-Reset (секунды до сброса или
+        время Unix).
+        """
+        remaining = _header_number(headers, "X-RateLimit-Remaining")
+        if remaining is None:
+            return
+        with self._lock:
+            self._refill(time.monotonic())
+            self._tokens = min(self._tokens, remaining)
+        
+        reset = _header_number(headers, "X-RateLimit-Reset")
+        if remaining < 1 and reset is not None:
+            if reset > RESET_EPOCH_THRESHOLD:
+                reset -= time.time()
+            if reset > 0:
+                self.pause(reset)
+
+
+class CircuitBreaker:
+    """
+    Автоматический выключатель запросов.
+    
+    closed - запросы проходят; после failure_threshold сбоев подряд
+    выключатель размыкается (open) и запросы сразу завершаются ошибкой.
+    Через reset_timeout секунд он переходит в half_open и пропускает один
+    пробный запрос: успех замыкает выключатель, сбой снова размыкает его.
+    """
+    
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half_open"
+    
+    def __init__(self, failure_threshold: int = 5, reset_timeout: float = 30.0):
+        self.failure_threshold = max(1, failure_threshold)
+        self.reset_timeout = reset_timeout
+        self._state = self.CLOSED
+        self._failures = 0
+        self._opened_at = 0.0
+        self._probing = False
+        self._lock = threading.Lock()
+    
+    @property
+    def state(self) -> str:
+        with self._lock:
+            if self._state == self.OPEN and time.monotonic() - self._opened_at >= self.reset_timeout:
+                return self.HALF_OPEN
+            return self._state
+    
+    def before_request(self) -> Optional[float]:
+        """Разрешение на запрос: None - запрос можно выполнять, иначе через сколько секунд повторить."""
+        with self._lock:
+            if self._state == self.CLOSED:
+                return None
+            retry_in = self._opened_at + self.reset_timeout - time.monotonic()
+            if self._state == self.OPEN and retry_in > 0:
+                return retry_in
+            # Пробный запрос один: остальные не отправляются до его результата
+            if self._probing:
+                return max(retry_in, 1.0)
+            self._state = self.HALF_OPEN
+            self._probing = True
+            return None
+    
+    def record_success(self) -> None:
+        with self._lock:
+            self._state = self.CLOSED
+            self._failures = 0
+            self._probing = False
+    
+    def record_failure(self) -> None:
+        with self._lock:
+            self._failures += 1
+            if self._state == self.HALF_OPEN or self._failures >= self.failure_threshold:
+                self._state = self.OPEN
+                self._opened_at = time.monotonic()
+            self._probing = False
+    
+    def release(self) -> None:
+        """Запрос не дошел до API: пробным может стать следующий запрос."""
+        with self._lock:
+            if self._state == self.HALF_OPEN:
+                self._state = self.OPEN
+            self._probing = False
+
+
+class RequestMetrics:
+    """Число запросов, ошибок и время ответа по endpoint API."""
+    
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._endpoints: Dict[str, Dict[str, Any]] = defaultdict(lambda: {
+            "requests": 0,
+            "errors": 0,
+            "total_seconds": 0.0,
+            "max_seconds": 0.0,
+            "status_codes": defaultdict(int)
+        })
+    
+    @staticmethod
+    def endpoint_key(method: str, path: str) -> str:
+        """Ключ endpoint без идентификаторов: GET /api/orders/{id}."""
+        parts = path.strip("/").split("/")
+        parts = parts[:2] + ["{id}"] * (len(parts) - 2)
+        return f"{method.upper()} /{'/'.join(parts)}"
+    
+    def record(self, endpoint: str, elapsed: float, status: Optional[int] = None, error: bool = False) -> None:
+        """Учет запроса; status None - ответ не получен."""
+        with self._lock:
+            stats = self._endpoints[endpoint]
+            stats["requests"] += 1
+            stats["errors"] += int(error)
+            stats["total_seconds"] += elapsed
+            stats["max_seconds"] = max(stats["max_seconds"], elapsed)
+            stats["status_codes"][str(status) if status is not None else "network_error"] += 1
+    
+    def snapshot(self) -> Dict[str, Dict[str, Any]]:
+        with self._lock:
+            return {
+                endpoint: {
+                    "requests": stats["requests"],
+                    "errors": stats["errors"],
+                    "error_rate": round(stats["errors"] / stats["requests"], 4),
+                    "avg_ms": round(stats["total_seconds"] / stats["requests"] * 1000, 1),
+                    "max_ms": round(stats["max_seconds"] * 1000, 1),
+                    "status_codes": dict(stats["status_codes"])
+                }
+                for endpoint, stats in self._endpoints.items()
+            }
@@ -0,0 +1,302 @@
+"""
+Загрузка заказов SalesDrive в orders, order_items и sales.
+
+Заказ определяется по ID в SalesDrive (orders.external_id), поэтому
+повторная загрузка той же страницы ничего не меняет. Каждая страница
+записывается пакетными запросами: новые заказы - одним INSERT, изменившиеся -
+одним UPDATE из временной таблицы, их позиции и продажи заменяются целиком. Дневная сводка
+sales_daily пересчитывается триггерами sales.
+"""
+
+import logging
+from datetime import datetime, timezone
+from typing import Any, Dict, Iterable, List, Optional, Set
+from uuid import UUID, uuid4
+
+from pydantic import ValidationError
+from sqlalchemy import delete, select
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.orm import Session
+
+from app.core.database.bulk import any_of, copy_rows
+from app.api.v1.schemas.import_data import ImportResult
+from app.api.v1.schemas.salesdrive import SalesDriveOrder, SalesDriveOrderStatus
+from app.database.models import (
+    Order as OrderModel, OrderItem as OrderItemModel, Sale as SaleModel,
+    Product as ProductModel, OrderStatus
+)
+
+logger = logging.getLogger(__name__)
+
+# Статусы SalesDrive -> статусы заказа
+ORDER_STATUS_MAP = {
+    SalesDriveOrderStatus.NEW: OrderStatus.PENDING,
+    SalesDriveOrderStatus.CONFIRMED: OrderStatus.CONFIRMED,
+    SalesDriveOrderStatus.PROCESSING: OrderStatus.CONFIRMED,
+    SalesDriveOrderStatus.SHIPPED: OrderStatus.SHIPPED,
+    SalesDriveOrderStatus.DELIVERED: OrderStatus.DELIVERED,
+    SalesDriveOrderStatus.CANCELLED: OrderStatus.CANCELLED,
+    SalesDriveOrderStatus.RETURNED: OrderStatus.CANCELLED,
+}
+
+# Заказы в этих статусах не считаются продажами
+NOT_SOLD_STATUSES = {SalesDriveOrderStatus.CANCELLED, SalesDriveOrderStatus.RETURNED}
+
+# Префикс номера заказа SalesDrive: номера не пересекаются с местными
+ORDER_NUMBER_PREFIX = "SD-"
+
+# Поля заказа, обновляемые при изменении заказа в SalesDrive
+ORDER_UPDATE_FIELDS = (
+    "customer_name", "customer_email", "customer_phone", "customer_address", "status",
+    "shipped_date", "delivered_date", "total_amount", "discount_amount", "tax_amount",
+    "notes", "external_updated_at"
+)
+
+# Колонки позиций заказов и продаж в порядке строк COPY
+ORDER_ITEM_COLUMNS = (
+    "id", "order_id", "product_id", "quantity", "unit_price", "discount_percent",
+    "total_amount", "created_at"
+)
+SALE_COLUMNS = (
+    "id", "product_id", "order_id", "quantity", "unit_price", "total_amount",
+    "discount_amount", "tax_amount", "sale_date", "customer_name", "customer_email",
+    "payment_method", "location", "created_by", "created_at", "updated_at"
+)
+
+# Склад продаж из SalesDrive
+SALE_LOCATION = "Основной склад"
+
+# Временная таблица изменившихся заказов с типами колонок orders
+ORDER_STAGE_DDL = f"""
+CREATE TEMP TABLE salesdrive_orders_stage ON COMMIT DROP AS
+SELECT id, {', '.join(ORDER_UPDATE_FIELDS)}
+FROM orders
+WITH NO DATA
+"""
+
+# Даты отгрузки и доставки сохраняются с первого перехода в статус
+ORDER_UPDATE_SQL = """
+UPDATE orders o SET
+    customer_name = s.customer_name,
+    customer_email = s.customer_email,
+    customer_phone = s.customer_phone,
+    customer_address = s.customer_address,
+    status = s.status,
+    shipped_date = COALESCE(o.shipped_date, s.shipped_date),
+    delivered_date = COALESCE(o.delivered_date, s.delivered_date),
+    total_amount = s.total_amount,
+    discount_amount = s.discount_amount,
+    tax_amount = s.tax_amount,
+    notes = s.notes,
+    external_updated_at = s.external_updated_at,
+    updated_at = CURRENT_TIMESTAMP
+FROM salesdrive_orders_stage s
+WHERE o.id = s.id
+"""
+
+# Сколько отсутствующих артикулов перечисляется в предупреждении
+MISSING_SKUS_IN_WARNING = 20
+
+
+def naive_utc(value: datetime) -> datetime:
+    """Время без часового пояса в UTC (как хранится в БД)."""
+    if value.tzinfo is not None:
+        return value.astimezone(timezone.utc).replace(tzinfo=None)
+    return value
+
+
+class OrderIngestor:
+    """
+    Запись страниц заказов SalesDrive.
+    
+    Заказ, не изменившийся в SalesDrive с прошлой загрузки (по updated_at),
+    пропускается. Позиции с неизвестным артикулом сохраняются без товара и
+    не попадают в продажи; такие артикулы собираются в missing_skus.
+    """
+    
+    def __init__(self, db: Session, user_id: Optional[UUID] = None):
+        self.db = db
+        self.user_id = user_id
+        self.missing_skus: Set[str] = set()
+    
+    def parse(self, raw_orders: Iterable[Dict[str, Any]], result: ImportResult) -> List[SalesDriveOrder]:
+        """Проверка заказов страницы; из повторов остается последняя версия."""
+        orders: Dict[str, SalesDriveOrder] = {}
+        for raw in raw_orders:
+            try:
+                order = SalesDriveOrder.model_validate(raw)
+            except ValidationError as e:
+                result.failed_items += 1
+                result.errors.append(f"Error processing order {raw.get('id')}: {e.errors()[0]['msg']}")
+                continue
+            previous = orders.get(order.id)
+            if previous is None or order.updated_at >= previous.updated_at:
+                orders[order.id] = order
+        return list(orders.values())
+    
+    def ingest(self, raw_orders: List[Dict[str, Any]], result: ImportResult) -> Set[str]:
+        """
+        Запись страницы заказов; возвращает ID заказов, которые не записаны.
+        
+        Ошибка проверки относится к своему заказу, ошибка записи - ко всем
+        заказам страницы (страница откатывается к точке сохранения).
+        """
+        orders = self.parse(raw_orders, result)
+        failed = {str(raw.get('id')) for raw in raw_orders} - {order.id for order in orders}
+        if not orders:
+            return failed
+        
+        existing = {
+            row.external_id: row
+            for row in self.db.execute(
+                select(OrderModel.external_id, OrderModel.id, OrderModel.external_updated_at).where(
+                    any_of(OrderModel.external_id, [order.id for order in orders])
+                )
+            )
+        }
+        
+        new_orders = []
+        changed_orders = []
+        for order in orders:
+            row = existing.get(order.id)
+            if row is None:
+                new_orders.append(order)
+            elif row.external_updated_at is None or naive_utc(order.updated_at) > row.external_updated_at:
+                changed_orders.append((row.id, order))
+        unchanged = len(orders) - len(new_orders) - len(changed_orders)
+        
+        try:
+            with self.db.begin_nested():
+                created = self._write(new_orders, changed_orders)
+        except Exception as e:
+            error = str(getattr(e, 'orig', None) or e)
+            result.failed_items += len(new_orders) + len(changed_orders)
+            result.errors.append(f"Error writing orders page: {error}")
+            logger.error(f"Error writing orders page: {e}")
+            return failed | {order.id for order in new_orders} | {order.id for _, order in changed_orders}
+        
+        # Заказы, созданные параллельной загрузкой, считаются без изменений
+        unchanged += len(new_orders) - created
+        result.created_items += created
+        result.updated_items += len(changed_orders)
+        result.processed_items += created + len(changed_orders) + unchanged
+        logger.debug(
+            f"Orders page: {created} created, {len(changed_orders)} updated, {unchanged} unchanged"
+        )
+        return failed
+    
+    def _write(self, new_orders: List[SalesDriveOrder], changed_orders: List[tuple]) -> int:
+        """Запись новых и изменившихся заказов; возвращает число созданных."""
+        orders = new_orders + [order for _, order in changed_orders]
+        products = self._product_ids(orders)
+        
+        order_ids: Dict[str, UUID] = {}
+        if new_orders:
+            orders_table = OrderModel.__table__
+            stmt = pg_insert(orders_table).on_conflict_do_nothing(
+                index_elements=[orders_table.c.external_id]
+            ).returning(orders_table.c.external_id, orders_table.c.id)
+            order_ids.update(self.db.execute(stmt, [
+                {"id": uuid4(), **self._order_values(order), "created_by": self.user_id}
+                for order in new_orders
+            ]).all())
+        created = len(order_ids)
+        
+        if changed_orders:
+            ids = [order_id for order_id, _ in changed_orders]
+            self._update_orders(changed_orders)
+            # Позиции и продажи изменившихся заказов заменяются целиком
+            sales_table = SaleModel.__table__
+            items_table = OrderItemModel.__table__
+            self.db.execute(delete(sales_table).where(any_of(sales_table.c.order_id, ids)))
+            self.db.execute(delete(items_table).where(any_of(items_table.c.order_id, ids)))
+            order_ids.update((order.id, order_id) for order_id, order in changed_orders)
+        
+        items = []
+        sales = []
+        now = datetime.utcnow()
+        for order in orders:
+            order_id = order_ids.get(order.id)
+            if order_id is None:
+                # Создан параллельной загрузкой
+                continue
+            sold = order.status not in NOT_SOLD_STATUSES
+            sale_date = naive_utc(order.created_at)
+            for item in order.items:
+                product_id = products.get(item.product_sku)
+                items.append((
+                    uuid4(), order_id, product_id, item.quantity, item.unit_price, 0,
+                    item.total_price, now
+                ))
+                if product_id is None:
+                    self.missing_skus.add(item.product_sku)
+                elif sold:
+                    sales.append((
+                        uuid4(), product_id, order_id, item.quantity, item.unit_price,
+                        item.total_price, item.discount or 0, 0, sale_date,
+                        order.customer_name, order.customer_email, order.payment_method,
+                        SALE_LOCATION, self.user_id, now, now
+                    ))
+        
+        # COPY: триггеры уровня оператора срабатывают один раз на страницу
+        connection = self.db.connection()
+        if items:
+            copy_rows(connection, "order_items", ORDER_ITEM_COLUMNS, items)
+        if sales:
+            copy_rows(connection, "sales", SALE_COLUMNS, sales)
+        return created
+    
+    def _product_ids(self, orders: List[SalesDriveOrder]) -> Dict[str, UUID]:
+        """ID товаров по артикулам позиций - одним запросом."""
+        skus = {item.product_sku for order in orders for item in order.items}
+        if not skus:
+            return {}
+        return dict(self.db.execute(
+            select(ProductModel.sku, ProductModel.id).where(any_of(ProductModel.sku, skus))
+        ).all())
+    
+    @staticmethod
+    def _order_values(order: SalesDriveOrder) -> Dict[str, Any]:
+        """Поля заказа из заказа SalesDrive."""
+        status = ORDER_STATUS_MAP[order.status]
+        updated_at = naive_utc(order.updated_at)
+        return {
+            "order_number": f"{ORDER_NUMBER_PREFIX}{order.number}",
+            "external_id": order.id,
+            "external_updated_at": updated_at,
+            "customer_name": order.customer_name,
+            "customer_email": order.customer_email,
+            "customer_phone": (order.customer_phone or None) and order.customer_phone[:20],
+            "customer_address": order.delivery_address,
+            "status": status,
+            "order_date": naive_utc(order.created_at),
+            "shipped_date": updated_at if status == OrderStatus.SHIPPED else None,
+            "delivered_date": updated_at if status == OrderStatus.DELIVERED else None,
+            "total_amount": order.total_amount,
+            "discount_amount": order.discount_amount or 0,
+            "tax_amount": order.tax_amount or 0,
+            "notes": order.notes,
+        }
+    
+    def _update_orders(self, changed_orders: List[tuple]) -> None:
+        """Обновление заказов через временную таблицу одним UPDATE ... FROM."""
+        rows = []
+        for order_id, order in changed_orders:
+            order_values = self._order_values(order)
+            order_values["status"] = order_values["status"].name
+            rows.append((order_id, *(order_values[name] for name in ORDER_UPDATE_FIELDS)))
+        
+        connection = self.db.connection()
+        connection.exec_driver_sql(ORDER_STAGE_DDL)
+        copy_rows(connection, "salesdrive_orders_stage", ("id",) + ORDER_UPDATE_FIELDS, rows)
+        connection.exec_driver_sql(ORDER_UPDATE_SQL)
+        connection.exec_driver_sql("DROP TABLE salesdrive_orders_stage")
+    
+    def missing_skus_warning(self) -> Optional[str]:
+        """Предупреждение о позициях с артикулами, которых нет в каталоге."""
+        if not self.missing_skus:
+            return None
+        skus = sorted(self.missing_skus)
+        listed = ", ".join(skus[:MISSING_SKUS_IN_WARNING])
+        more = f" и еще {len(skus) - MISSING_SKUS_IN_WARNING}" if len(skus) > MISSING_SKUS_IN_WARNING else ""
+        return f"Товары не найдены, позиции заказов сохранены без продаж: {listed}{more}"
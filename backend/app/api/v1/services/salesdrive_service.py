@@ -5,27 +5,52 @@
 import logging
 import asyncio
 import time
-from typing import List, Dict, Any, Optional, Tuple
+from collections import deque
+from typing import AsyncIterator, Awaitable, Callable, List, Dict, Any, Optional, Tuple
 from datetime import datetime, timedelta
-from uuid import UUID
+from decimal import Decimal
+from uuid import UUID, uuid4
 
 import httpx
+from sqlalchemy import func, select
+from sqlalchemy.dialects.postgresql import insert as pg_insert
 from sqlalchemy.orm import Session
 from fastapi import HTTPException, status
-from tenacity import retry, stop_after_attempt, wait_exponential, retry_if_exception_type
+from tenacity import retry, stop_after_attempt, wait_none, retry_if_exception
 
+from app.core.cache import response_cache
 from app.core.config import settings
+from app.core.database.bulk import any_of
 from app.api.v1.schemas.import_data import (
     SalesDriveProduct, SalesDriveConfig, ImportStatus, ImportResult,
     SyncStatus, ImportSource
 )
 from app.database.models import (
-    Product as ProductModel, Category as CategoryModel,
-    Supplier as SupplierModel, SyncHistory as SyncHistoryModel
+    Product as ProductModel, SyncHistory as SyncHistoryModel,
+    IntegrationConfig as IntegrationConfigModel, ProductStatus
 )
+from app.api.v1.services.reference_resolver import ReferenceResolver
+from app.api.v1.services.salesdrive_limits import (
+    CircuitBreaker, RequestMetrics, TokenBucket, retry_after_seconds
+)
+from app.api.v1.services.salesdrive_orders import OrderIngestor, naive_utc
 
 logger = logging.getLogger(__name__)
 
+# Запас при инкрементальной синхронизации: товары, измененные в ту же
+# секунду, что и отметка, не теряются (повторная обработка идемпотентна)
+WATERMARK_OVERLAP = timedelta(minutes=5)
+
+# Поля товара, которые синхронизация обновляет у существующих товаров
+SYNC_PRODUCT_FIELDS = ("name", "unit_price", "cost_price", "description")
+
+# Точность цен в products (DECIMAL(12, 2))
+PRICE_QUANTUM = Decimal("0.01")
+
+
+def _money(value) -> Optional[Decimal]:
+    return Decimal(str(value)).quantize(PRICE_QUANTUM) if value is not None else None
+
 
 class SalesDriveAPIError(Exception):
     """Базовое исключение для ошибок SalesDrive API."""
@@ -34,7 +59,18 @@ class SalesDriveAPIError(Exception):
 
 class SalesDriveRateLimitError(SalesDriveAPIError):
     """Исключение для превышения лимитов API."""
-    pass
+    
+    def __init__(self, message: str, retry_after: float = 0.0):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+class SalesDriveUnavailableError(SalesDriveAPIError):
+    """API недоступен: ошибка соединения, 5xx или запросы приостановлены после серии сбоев."""
+    
+    def __init__(self, message: str, retry_after: float = 0.0):
+        super().__init__(message)
+        self.retry_after = retry_after
 
 
 class SalesDriveAuthError(SalesDriveAPIError):
@@ -42,10 +78,98 @@ class SalesDriveAuthError(SalesDriveAPIError):
     pass
 
 
+# Общий HTTP клиент приложения и цикл событий, в котором он создан
+_http_client: Optional[httpx.AsyncClient] = None
+_http_client_loop: Optional[asyncio.AbstractEventLoop] = None
+
+
+def create_http_client(timeout: float = settings.SALESDRIVE_TIMEOUT) -> httpx.AsyncClient:
+    """HTTP клиент SalesDrive с пулом соединений и keep-alive."""
+    return httpx.AsyncClient(
+        timeout=httpx.Timeout(timeout),
+        limits=httpx.Limits(
+            max_connections=settings.SALESDRIVE_MAX_CONNECTIONS,
+            max_keepalive_connections=settings.SALESDRIVE_MAX_KEEPALIVE_CONNECTIONS,
+            keepalive_expiry=settings.SALESDRIVE_KEEPALIVE_EXPIRY
+        ),
+        http2=settings.SALESDRIVE_HTTP2
+    )
+
+
+async def start_salesdrive_client() -> None:
+    """Создание общего HTTP клиента (при запуске приложения)."""
+    global _http_client, _http_client_loop
+    if _http_client is None:
+        _http_client = create_http_client()
+        _http_client_loop = asyncio.get_running_loop()
+
+
+async def close_salesdrive_client() -> None:
+    """Закрытие общего HTTP клиента (при остановке приложения)."""
+    global _http_client, _http_client_loop
+    if _http_client is not None:
+        await _http_client.aclose()
+        _http_client = None
+        _http_client_loop = None
+
+
+def get_shared_http_client() -> Optional[httpx.AsyncClient]:
+    """
+    Общий HTTP клиент, если он создан в текущем цикле событий.
+    
+    Соединения httpx привязаны к циклу событий, поэтому в другом цикле
+    (например, в отдельном потоке) используется собственный клиент.
+    """
+    try:
+        loop = asyncio.get_running_loop()
+    except RuntimeError:
+        return None
+    return _http_client if loop is _http_client_loop else None
+
+
+# Лимит запросов к API общий для всех клиентов процесса
+rate_limiter = TokenBucket(
+    rate=1 / settings.SALESDRIVE_RATE_LIMIT_DELAY,
+    capacity=settings.SALESDRIVE_RATE_LIMIT_BURST,
+    max_concurrency=settings.SALESDRIVE_MAX_CONCURRENCY
+)
+
+# Выключатель и метрики запросов общие для всех клиентов процесса
+circuit_breaker = CircuitBreaker(
+    failure_threshold=settings.SALESDRIVE_CIRCUIT_FAILURE_THRESHOLD,
+    reset_timeout=settings.SALESDRIVE_CIRCUIT_RESET_SECONDS
+)
+api_metrics = RequestMetrics()
+
+
+def _should_retry(error: BaseException) -> bool:
+    """Повторяется только запрос, для которого пауза после 429 короткая."""
+    return (
+        isinstance(error, SalesDriveRateLimitError)
+        and error.retry_after <= settings.SALESDRIVE_MAX_COOLDOWN_WAIT
+    )
+
+
 class SalesDriveClient:
-    """Клиент для работы с SalesDrive API."""
+    """
+    Клиент для работы с SalesDrive API.
+    
+    http_client - общий клиент с пулом соединений; он не закрывается при
+    выходе из контекста. Без него создается собственный клиент.
+    limiter - общий ограничитель запросов; без него клиент выполняет не
+    больше одного запроса в rate_limit_delay секунд.
+    breaker и metrics - общие выключатель и метрики запросов; без них у
+    клиента собственные.
+    """
     
-    def __init__(self, config: SalesDriveConfig):
+    def __init__(
+        self,
+        config: SalesDriveConfig,
+        http_client: Optional[httpx.AsyncClient] = None,
+        limiter: Optional[TokenBucket] = None,
+        breaker: Optional[CircuitBreaker] = None,
+        metrics: Optional[RequestMetrics] = None
+    ):
         self.config = config
         self.base_url = config.api_url.rstrip('/')
         self.api_key = config.api_key
@@ -55,38 +179,51 @@ class SalesDriveClient:
         self.max_retries = 3
         self.rate_limit_delay = 1.0
         self.last_request_time = 0
-        
-        # HTTP клиент с настройками
-        self.client = httpx.AsyncClient(
-            timeout=httpx.Timeout(self.timeout),
-            headers={
-                'Authorization': f'Bearer {self.api_key}',
-                'Content-Type': 'application/json',
-                'Accept': 'application/json',
-                'User-Agent': 'InventorySystem/1.0'
-            }
+        self.limiter = limiter or TokenBucket(rate=1 / self.rate_limit_delay)
+        self.breaker = breaker or CircuitBreaker(
+            failure_threshold=settings.SALESDRIVE_CIRCUIT_FAILURE_THRESHOLD,
+            reset_timeout=settings.SALESDRIVE_CIRCUIT_RESET_SECONDS
         )
+        self.metrics = metrics or RequestMetrics()
+        
+        # Заголовки передаются с каждым запросом: общий клиент не знает ключа
+        self.headers = {
+            'Authorization': f'Bearer {self.api_key}',
+            'Content-Type': 'application/json',
+            'Accept': 'application/json',
+            'User-Agent': 'InventorySystem/1.0'
+        }
+        self._owns_client = http_client is None
+        self.client = http_client or create_http_client(self.timeout)
     
     async def __aenter__(self):
         return self
     
     async def __aexit__(self, exc_type, exc_val, exc_tb):
-        await self.client.aclose()
+        if self._owns_client:
+            await self.client.aclose()
     
     async def _rate_limit(self):
-        """Контроль частоты запросов."""
-        current_time = time.time()
-        time_since_last = current_time - self.last_request_time
-        
-        if time_since_last < self.rate_limit_delay:
-            await asyncio.sleep(self.rate_limit_delay - time_since_last)
+        """
+        Контроль частоты запросов.
         
+        После 429 выдача токенов приостановлена для всех запросов процесса;
+        если пауза дольше SALESDRIVE_MAX_COOLDOWN_WAIT, запрос сразу
+        завершается ошибкой, а не занимает задачу и соединение.
+        """
+        cooldown = self.limiter.paused_for()
+        if cooldown > settings.SALESDRIVE_MAX_COOLDOWN_WAIT:
+            raise SalesDriveRateLimitError(
+                f"Превышен лимит запросов, повтор через {cooldown:.0f} с", retry_after=cooldown
+            )
+        await self.limiter.acquire()
         self.last_request_time = time.time()
     
     @retry(
         stop=stop_after_attempt(3),
-        wait=wait_exponential(multiplier=1, min=4, max=10),
-        retry=retry_if_exception_type((httpx.RequestError, SalesDriveRateLimitError))
+        wait=wait_none(),
+        retry=retry_if_exception(_should_retry),
+        reraise=True
     )
     async def _make_request(
         self, 
@@ -95,42 +232,86 @@ class SalesDriveClient:
         params: Optional[Dict] = None,
         json_data: Optional[Dict] = None
     ) -> Dict[str, Any]:
-        """Выполнение HTTP запроса с retry механизмом."""
-        await self._rate_limit()
+        """
+        Выполнение HTTP запроса.
+        
+        Повторяется только запрос, получивший 429 с короткой паузой: ожидание
+        до сброса лимита выполняет ограничитель. После серии сбоев API
+        (ошибки соединения и 5xx) выключатель приостанавливает запросы, и они
+        сразу завершаются SalesDriveUnavailableError.
+        """
+        retry_in = self.breaker.before_request()
+        if retry_in is not None:
+            raise SalesDriveUnavailableError(
+                f"SalesDrive API недоступен, повтор через {retry_in:.0f} с", retry_after=retry_in
+            )
         
         url = f"{self.base_url}/{endpoint.lstrip('/')}"
+        metrics_key = RequestMetrics.endpoint_key(method, endpoint)
+        api_available = None
+        started = time.monotonic()
+        response = None
         
         try:
+            await self._rate_limit()
+            
             logger.info(f"SalesDrive API request: {method} {url}")
             
-            response = await self.client.request(
-                method=method,
-                url=url,
-                params=params,
-                json=json_data
-            )
+            started = time.monotonic()
+            async with self.limiter.concurrency():
+                response = await self.client.request(
+                    method=method,
+                    url=url,
+                    params=params,
+                    json=json_data,
+                    headers=self.headers,
+                    timeout=self.timeout
+                )
             
             # Логирование ответа
             logger.info(f"SalesDrive API response: {response.status_code}")
+            api_available = response.status_code < 500
             
             # Обработка ошибок
             if response.status_code == 401:
                 raise SalesDriveAuthError("Неверный API ключ")
             elif response.status_code == 429:
-                retry_after = int(response.headers.get('Retry-After', 60))
+                retry_after = retry_after_seconds(response.headers, default=60)
                 logger.warning(f"Rate limit exceeded, retry after {retry_after}s")
-                await asyncio.sleep(retry_after)
-                raise SalesDriveRateLimitError("Превышен лимит запросов")
+                self.limiter.pause(retry_after)
+                raise SalesDriveRateLimitError("Превышен лимит запросов", retry_after=retry_after)
             elif response.status_code >= 400:
                 error_text = response.text
                 logger.error(f"SalesDrive API error: {response.status_code} - {error_text}")
+                if response.status_code >= 500:
+                    raise SalesDriveUnavailableError(f"API error: {response.status_code} - {error_text}")
                 raise SalesDriveAPIError(f"API error: {response.status_code} - {error_text}")
             
+            self.limiter.update_from_headers(response.headers)
             return response.json()
             
         except httpx.RequestError as e:
             logger.error(f"Request error: {e}")
-            raise SalesDriveAPIError(f"Ошибка соединения: {e}")
+            api_available = False
+            raise SalesDriveUnavailableError(f"Ошибка соединения: {e}")
+        
+        finally:
+            if api_available is True:
+                self.breaker.record_success()
+            elif api_available is False:
+                self.breaker.record_failure()
+            else:
+                # Запрос не дошел до API (ожидание лимита, отмена задачи)
+                self.breaker.release()
+            
+            if response is not None or api_available is False:
+                status_code = response.status_code if response is not None else None
+                self.metrics.record(
+                    metrics_key,
+                    time.monotonic() - started,
+                    status=status_code,
+                    error=status_code is None or status_code >= 400
+                )
     
     async def get_products(
         self, 
@@ -205,115 +386,16 @@ class SalesDriveService:
             api_key=settings.SALESDRIVE_API_KEY,
             timeout=settings.SALESDRIVE_TIMEOUT
         )
-        
-        # Кеш для категорий и поставщиков
-        self._categories_cache = {}
-        self._suppliers_cache = {}
-        self._cache_ttl = 3600  # 1 час
-        self._cache_updated = 0
     
     async def _get_client(self) -> SalesDriveClient:
-        """Получение клиента API."""
-        return SalesDriveClient(self.config)
-    
-    async def _update_cache(self, client: SalesDriveClient):
-        """Обновление кеша категорий и поставщиков."""
-        current_time = time.time()
-        
-        if current_time - self._cache_updated < self._cache_ttl:
-            return
-        
-        try:
-            # Загружаем категории
-            categories_response = await client.get_categories()
-            self._categories_cache = {
-                cat['name']: cat for cat in categories_response.get('data', [])
-            }
-            
-            # Загружаем поставщиков
-            suppliers_response = await client.get_suppliers()
-            self._suppliers_cache = {
-                sup['name']: sup for sup in suppliers_response.get('data', [])
-            }
-            
-            self._cache_updated = current_time
-            logger.info("Cache updated successfully")
-            
-        except Exception as e:
-            logger.error(f"Failed to update cache: {e}")
-    
-    def _find_or_create_category(self, category_name: str) -> Optional[CategoryModel]:
-        """Поиск или создание категории."""
-        if not category_name:
-            return None
-        
-        # Ищем в базе
-        category = self.db.query(CategoryModel).filter(
-            CategoryModel.name == category_name
-        ).first()
-        
-        if not category:
-            # Создаем новую категорию
-            category = CategoryModel(
-                name=category_name,
-                description=f"Автоматически создана при импорте из SalesDrive"
-            )
-            self.db.add(category)
-            self.db.flush()
-            logger.info(f"Created new category: {category_name}")
-        
-        return category
-    
-    def _find_or_create_supplier(self, supplier_name: str) -> Optional[SupplierModel]:
-        """Поиск или создание поставщика."""
-        if not supplier_name:
-            return None
-        
-        # Ищем в базе
-        supplier = self.db.query(SupplierModel).filter(
-            SupplierModel.name == supplier_name
-        ).first()
-        
-        if not supplier:
-            # Создаем нового поставщика
-            supplier = SupplierModel(
-                name=supplier_name,
-                contact_person="Автоимпорт",
-                email=f"import@{supplier_name.lower().replace(' ', '')}.com"
-            )
-            self.db.add(supplier)
-            self.db.flush()
-            logger.info(f"Created new supplier: {supplier_name}")
-        
-        return supplier
-    
-    def _convert_salesdrive_product(self, sd_product: Dict[str, Any]) -> ProductModel:
-        """Конвертация товара из SalesDrive в модель базы данных."""
-        # Находим или создаем категорию
-        category = None
-        if sd_product.get('category'):
-            category = self._find_or_create_category(sd_product['category'])
-        
-        # Находим или создаем поставщика
-        supplier = None
-        if sd_product.get('supplier'):
-            supplier = self._find_or_create_supplier(sd_product['supplier'])
-        
-        # Создаем товар
-        product = ProductModel(
-            name=sd_product['name'],
-            sku=sd_product['sku'],
-            barcode=sd_product.get('barcode'),
-            description=sd_product.get('description'),
-            unit_price=sd_product['price'],
-            cost_price=sd_product.get('cost'),
-            unit_of_measure=sd_product.get('unit', 'шт'),
-            category_id=category.id if category else None,
-            supplier_id=supplier.id if supplier else None,
-            status='active' if sd_product.get('active', True) else 'inactive'
+        """Получение клиента API (на общем HTTP клиенте приложения, если он создан)."""
+        return SalesDriveClient(
+            self.config,
+            http_client=get_shared_http_client(),
+            limiter=rate_limiter,
+            breaker=circuit_breaker,
+            metrics=api_metrics
         )
-        
-        return product
     
     async def get_products(
         self, 
@@ -322,37 +404,75 @@ class SalesDriveService:
         updated_since: Optional[datetime] = None
     ) -> List[SalesDriveProduct]:
         """Получение товаров из SalesDrive."""
+        products = []
+        for item in await self._get_products_page(page, limit, updated_since):
+            try:
+                products.append(self._parse_product(item))
+            except Exception as e:
+                logger.error(f"Error parsing product {item.get('id')}: {e}")
+        
+        return products
+    
+    async def _get_products_page(
+        self,
+        page: int,
+        limit: int,
+        updated_since: Optional[datetime] = None
+    ) -> List[Dict[str, Any]]:
+        """Страница товаров в виде ответа API (без проверки полей)."""
         async with await self._get_client() as client:
-            await self._update_cache(client)
-            
             response = await client.get_products(
                 page=page, 
                 limit=limit, 
                 updated_since=updated_since
             )
-            
-            products = []
-            for item in response.get('data', []):
-                try:
-                    product = SalesDriveProduct(
-                        id=item['id'],
-                        name=item['name'],
-                        sku=item['sku'],
-                        barcode=item.get('barcode'),
-                        category=item.get('category'),
-                        supplier=item.get('supplier'),
-                        description=item.get('description'),
-                        price=float(item['price']),
-                        cost=float(item.get('cost', 0)),
-                        quantity=int(item.get('quantity', 0)),
-                        unit=item.get('unit', 'шт'),
-                        updated_at=datetime.fromisoformat(item['updated_at'])
-                    )
-                    products.append(product)
-                except Exception as e:
-                    logger.error(f"Error parsing product {item.get('id')}: {e}")
-            
-            return products
+            return response.get('data', [])
+    
+    @staticmethod
+    def _parse_product(item: Dict[str, Any]) -> SalesDriveProduct:
+        """Товар из ответа API или события webhook."""
+        return SalesDriveProduct(
+            id=item['id'],
+            name=item['name'],
+            sku=item['sku'],
+            barcode=item.get('barcode'),
+            category=item.get('category'),
+            supplier=item.get('supplier'),
+            description=item.get('description'),
+            price=float(item['price']),
+            cost=float(item.get('cost', 0)),
+            quantity=int(item.get('quantity', 0)),
+            unit=item.get('unit', 'шт'),
+            updated_at=datetime.fromisoformat(item['updated_at'])
+        )
+    
+    async def get_orders_by_id(self, order_ids: List[str], result: ImportResult) -> List[Dict[str, Any]]:
+        """
+        Текущие версии заказов по ID (запросы выполняются параллельно).
+        
+        Заказ, на который API ответил ошибкой 4xx (например, удаленный),
+        учитывается в result как ошибка и не попадает в список. Ошибки лимита,
+        авторизации и недоступности API пробрасываются: повторять нужно весь
+        запрос.
+        """
+        async with await self._get_client() as client:
+            responses = await asyncio.gather(
+                *(client.get_order(order_id) for order_id in order_ids),
+                return_exceptions=True
+            )
+        
+        orders = []
+        for order_id, response in zip(order_ids, responses):
+            if isinstance(response, (SalesDriveRateLimitError, SalesDriveAuthError, SalesDriveUnavailableError)):
+                raise response
+            if isinstance(response, SalesDriveAPIError):
+                result.failed_items += 1
+                result.errors.append(f"Error fetching order {order_id}: {response}")
+            elif isinstance(response, BaseException):
+                raise response
+            else:
+                orders.append(response.get('data', response))
+        return orders
     
     async def get_orders(
         self,
@@ -372,8 +492,202 @@ class SalesDriveService:
             
             return response.get('data', [])
     
-    async def sync_products(self, user_id: UUID) -> ImportResult:
-        """Синхронизация товаров из SalesDrive."""
+    async def _iter_pages(
+        self,
+        fetch_page: Callable[[int, int], Awaitable[List[Any]]],
+        page_size: int = settings.SALESDRIVE_PAGE_SIZE
+    ) -> AsyncIterator[List[Any]]:
+        """
+        Страницы API по порядку.
+        
+        После полной первой страницы следующие SALESDRIVE_MAX_CONCURRENCY
+        страниц загружаются одновременно, пока обрабатывается текущая;
+        неполная страница - последняя. Короткая выборка (инкрементальная
+        синхронизация) обходится одним запросом.
+        """
+        window = 1
+        pending = deque()
+        next_page = 1
+        try:
+            while True:
+                while len(pending) < window:
+                    pending.append(asyncio.ensure_future(fetch_page(next_page, page_size)))
+                    next_page += 1
+                
+                items = await pending.popleft()
+                if items:
+                    yield items
+                if len(items) < page_size:
+                    return
+                window = max(1, settings.SALESDRIVE_MAX_CONCURRENCY)
+        finally:
+            # Страницы после последней не нужны
+            for task in pending:
+                task.cancel()
+    
+    def _merge_products_page(
+        self,
+        products: List[SalesDriveProduct],
+        references: ReferenceResolver,
+        result: ImportResult
+    ) -> List[str]:
+        """
+        Запись страницы товаров SalesDrive; возвращает артикулы, которые не записаны.
+        
+        Существующие товары страницы выбираются одним запросом по
+        sku = ANY(...), изменения вычисляются в памяти: товары без изменений
+        не записываются, новые и измененные пишутся одним
+        INSERT ... ON CONFLICT (sku) DO UPDATE. Ошибка записи относится ко
+        всем товарам страницы.
+        """
+        page = {sd_product.sku: sd_product for sd_product in products}
+        existing_products = {
+            row.sku: row
+            for row in self.db.execute(
+                select(
+                    ProductModel.sku, ProductModel.id, ProductModel.name,
+                    ProductModel.unit_price, ProductModel.cost_price, ProductModel.description
+                ).where(any_of(ProductModel.sku, page))
+            )
+        }
+        
+        rows = []
+        failed = []
+        unchanged = 0
+        for sku, sd_product in page.items():
+            try:
+                existing = existing_products.get(sku)
+                row = {
+                    "id": existing.id if existing else uuid4(),
+                    "sku": sku,
+                    "name": sd_product.name,
+                    "barcode": sd_product.barcode,
+                    "description": sd_product.description,
+                    "unit_price": _money(sd_product.price),
+                    "cost_price": _money(sd_product.cost),
+                    "unit_of_measure": sd_product.unit or "шт",
+                    "status": ProductStatus.ACTIVE
+                }
+                if existing:
+                    # Пустые описание и себестоимость не затирают заполненные
+                    row["description"] = row["description"] or existing.description
+                    row["cost_price"] = row["cost_price"] or existing.cost_price
+                    if all(row[field] == getattr(existing, field) for field in SYNC_PRODUCT_FIELDS):
+                        unchanged += 1
+                        continue
+                rows.append(row)
+            except Exception as e:
+                failed.append(sku)
+                result.failed_items += 1
+                error_msg = f"Error processing product {sku}: {str(e)}"
+                result.errors.append(error_msg)
+                logger.error(error_msg)
+        
+        # Повторы артикула на странице: записывается последний
+        result.processed_items += len(products) - len(page) + unchanged
+        if not rows:
+            return failed
+        
+        products_table = ProductModel.__table__
+        stmt = pg_insert(products_table)
+        stmt = stmt.on_conflict_do_update(
+            index_elements=[products_table.c.sku],
+            set_={
+                **{field: stmt.excluded[field] for field in SYNC_PRODUCT_FIELDS},
+                "updated_at": func.current_timestamp()
+            }
+        )
+        new_products = [page[row["sku"]] for row in rows if row["sku"] not in existing_products]
+        try:
+            with self.db.begin_nested():
+                # Категории и поставщики новых товаров создаются в той же точке
+                # сохранения, что и товары (категория существующего товара
+                # при синхронизации не меняется)
+                references.resolve(
+                    (sd_product.category for sd_product in new_products),
+                    (sd_product.supplier for sd_product in new_products)
+                )
+                for row in rows:
+                    sd_product = page[row["sku"]]
+                    row["category_id"] = references.category_id(sd_product.category)
+                    row["supplier_id"] = references.supplier_id(sd_product.supplier)
+                self.db.execute(stmt, rows)
+        except Exception as e:
+            # Справочники, созданные в точке сохранения, откатились вместе с
+            # ней, а словари еще содержат их ID - загружаем словари заново
+            references.reset()
+            error = str(getattr(e, 'orig', None) or e)
+            result.failed_items += len(rows)
+            result.errors.append(f"Error writing products page: {error}")
+            logger.error(f"Error writing products page: {e}")
+            return failed + [row["sku"] for row in rows]
+        
+        updated = sum(1 for row in rows if row["sku"] in existing_products)
+        result.updated_items += updated
+        result.created_items += len(rows) - updated
+        result.processed_items += len(rows)
+        logger.debug(f"Products page: {len(rows) - updated} created, {updated} updated, {unchanged} unchanged")
+        return failed
+    
+    def apply_product_updates(self, items: List[Dict[str, Any]], result: ImportResult) -> List[str]:
+        """
+        Запись товаров из событий webhook так же, как страницы синхронизации.
+        
+        Возвращает ключи (артикул или ID) товаров, которые не записаны.
+        Транзакцию фиксирует и кеш ответов сбрасывает вызывающий код.
+        """
+        products = []
+        failed = []
+        for item in items:
+            try:
+                products.append(self._parse_product(item))
+            except Exception as e:
+                failed.append(str(item.get('sku') or item.get('id')))
+                result.failed_items += 1
+                result.errors.append(f"Error parsing product {item.get('sku') or item.get('id')}: {e}")
+        if not products:
+            return failed
+        
+        references = ReferenceResolver(
+            self.db,
+            category_description="Автоматически создана при импорте из SalesDrive"
+        )
+        failed.extend(self._merge_products_page(products, references, result))
+        return failed
+    
+    def _sync_state(self, entity: str) -> IntegrationConfigModel:
+        """
+        Состояние синхронизации сущности в integration_config.
+        
+        last_sync - отметка: наибольший updated_at полученных записей;
+        config_data["full_sync_at"] - время последней полной синхронизации.
+        """
+        service_name = f"salesdrive_{entity}"
+        state = self.db.query(IntegrationConfigModel).filter(
+            IntegrationConfigModel.service_name == service_name
+        ).first()
+        if state is None:
+            state = IntegrationConfigModel(service_name=service_name, config_data={})
+            self.db.add(state)
+        return state
+    
+    @staticmethod
+    def _needs_full_sync(state: IntegrationConfigModel, now: datetime) -> bool:
+        """Полная сверка: первая синхронизация или истек SALESDRIVE_FULL_SYNC_INTERVAL_HOURS."""
+        full_sync_at = (state.config_data or {}).get("full_sync_at")
+        if state.last_sync is None or not full_sync_at:
+            return True
+        interval = timedelta(hours=settings.SALESDRIVE_FULL_SYNC_INTERVAL_HOURS)
+        return now - datetime.fromisoformat(full_sync_at) >= interval
+    
+    async def sync_products(self, user_id: UUID, full: bool = False) -> ImportResult:
+        """
+        Синхронизация товаров из SalesDrive.
+        
+        Запрашиваются только товары, измененные после отметки прошлой
+        синхронизации. Полностью каталог загружается при full, при первой
+        синхронизации и раз в SALESDRIVE_FULL_SYNC_INTERVAL_HOURS.
+        """
         start_time = datetime.utcnow()
         result = ImportResult(
             total_items=0,
@@ -395,62 +709,61 @@ class SalesDriveService:
         self.db.add(import_log)
         self.db.commit()
         
+        references = ReferenceResolver(
+            self.db,
+            category_description="Автоматически создана при импорте из SalesDrive"
+        )
+        
+        sync_state = self._sync_state("products")
+        full = full or self._needs_full_sync(sync_state, start_time)
+        updated_since = None if full else sync_state.last_sync - WATERMARK_OVERLAP
+        watermark = sync_state.last_sync
+        logger.info(f"Products sync: {'full' if full else f'changes since {updated_since}'}")
+        
+        # Страницы передаются без разбора: неполной (последней) считается
+        # страница, которую вернул API, а не оставшаяся после разбора
+        async def fetch_page(page: int, limit: int) -> List[Dict[str, Any]]:
+            logger.info(f"Syncing products page {page}")
+            return await self._get_products_page(page, limit, updated_since)
+        
         try:
-            page = 1
-            has_more = True
-            
-            while has_more:
-                logger.info(f"Syncing products page {page}")
-                
-                # Получаем товары из SalesDrive
-                products = await self.get_products(page=page, limit=100)
-                
-                if not products:
-                    has_more = False
-                    break
-                
-                result.total_items += len(products)
-                
-                for sd_product in products:
+            async for items in self._iter_pages(fetch_page):
+                result.total_items += len(items)
+                products = []
+                for item in items:
                     try:
-                        # Ищем существующий товар по SKU
-                        existing_product = self.db.query(ProductModel).filter(
-                            ProductModel.sku == sd_product.sku
-                        ).first()
-                        
-                        if existing_product:
-                            # Обновляем существующий товар
-                            existing_product.name = sd_product.name
-                            existing_product.unit_price = sd_product.price
-                            existing_product.cost_price = sd_product.cost or existing_product.cost_price
-                            existing_product.description = sd_product.description or existing_product.description
-                            
-                            result.updated_items += 1
-                            logger.debug(f"Updated product: {sd_product.sku}")
-                        else:
-                            # Создаем новый товар
-                            new_product = self._convert_salesdrive_product(sd_product.dict())
-                            self.db.add(new_product)
-                            
-                            result.created_items += 1
-                            logger.debug(f"Created product: {sd_product.sku}")
-                        
-                        result.processed_items += 1
-                        
+                        products.append(self._parse_product(item))
                     except Exception as e:
+                        # Ошибка разбора не дает сдвинуть отметку синхронизации
                         result.failed_items += 1
-                        error_msg = f"Error processing product {sd_product.sku}: {str(e)}"
+                        error_msg = f"Error parsing product {item.get('sku') or item.get('id')}: {e}"
                         result.errors.append(error_msg)
                         logger.error(error_msg)
+                if not products:
+                    continue
                 
-                # Сохраняем изменения после каждой страницы
-                self.db.commit()
+                for sd_product in products:
+                    updated_at = naive_utc(sd_product.updated_at)
+                    if watermark is None or updated_at > watermark:
+                        watermark = updated_at
                 
-                page += 1
+                self._merge_products_page(products, references, result)
                 
-                # Проверяем, есть ли еще страницы
-                if len(products) < 100:
-                    has_more = False
+                # Сохраняем изменения после каждой страницы
+                self.db.commit()
+            
+            if result.created_items or result.updated_items:
+                response_cache.invalidate("products", "categories")
+            
+            # Отметка сдвигается только без ошибок: иначе следующая
+            # синхронизация пропустила бы не обработанные товары
+            if not result.failed_items:
+                sync_state.last_sync = watermark
+                if full:
+                    sync_state.config_data = {
+                        **(sync_state.config_data or {}),
+                        "full_sync_at": start_time.isoformat()
+                    }
             
             # Обновляем статус синхронизации
             import_log.status = SyncStatus.SUCCESS
@@ -487,7 +800,12 @@ class SalesDriveService:
         date_from: Optional[datetime] = None,
         date_to: Optional[datetime] = None
     ) -> ImportResult:
-        """Синхронизация заказов из SalesDrive."""
+        """
+        Синхронизация заказов из SalesDrive.
+        
+        Заказы записываются в orders, order_items и sales постранично
+        (OrderIngestor); повторная синхронизация периода идемпотентна.
+        """
         if not date_from:
             date_from = datetime.utcnow() - timedelta(days=7)
         if not date_to:
@@ -504,46 +822,32 @@ class SalesDriveService:
             warnings=[]
         )
         
+        ingestor = OrderIngestor(self.db, user_id)
+        
+        async def fetch_page(page: int, limit: int) -> List[Dict[str, Any]]:
+            logger.info(f"Syncing orders page {page}")
+            return await self.get_orders(
+                date_from=date_from,
+                date_to=date_to,
+                page=page,
+                limit=limit
+            )
+        
         try:
-            page = 1
-            has_more = True
-            
-            while has_more:
-                logger.info(f"Syncing orders page {page}")
-                
-                # Получаем заказы из SalesDrive
-                orders = await self.get_orders(
-                    date_from=date_from,
-                    date_to=date_to,
-                    page=page,
-                    limit=100
-                )
-                
-                if not orders:
-                    has_more = False
-                    break
-                
+            async for orders in self._iter_pages(fetch_page):
                 result.total_items += len(orders)
+                ingestor.ingest(orders, result)
                 
-                for order in orders:
-                    try:
-                        # Здесь можно добавить логику обработки заказов
-                        # Например, создание записей в таблице заказов
-                        result.processed_items += 1
-                        result.created_items += 1
-                        
-                    except Exception as e:
-                        result.failed_items += 1
-                        error_msg = f"Error processing order {order.get('id')}: {str(e)}"
-                        result.errors.append(error_msg)
-                        logger.error(error_msg)
-                
-                page += 1
-                
-                if len(orders) < 100:
-                    has_more = False
+                # Сохраняем изменения после каждой страницы
+                self.db.commit()
+            
+            warning = ingestor.missing_skus_warning()
+            if warning:
+                result.warnings.append(warning)
             
-            logger.info(f"Orders sync completed: {result.processed_items} processed")
+            logger.info(f"Orders sync completed: {result.processed_items} processed, "
+                       f"{result.created_items} created, {result.updated_items} updated, "
+                       f"{result.failed_items} failed")
             
         except Exception as e:
             result.errors.append(f"Orders sync failed: {str(e)}")
@@ -0,0 +1,419 @@
+"""
+Очередь webhook событий SalesDrive.
+
+Endpoint проверяет подпись, сохраняет событие в salesdrive_webhook_events и
+сразу отвечает; повторная доставка того же event_id отбрасывается уникальным
+индексом. Обработчик захватывает события пакетами через
+SELECT ... FOR UPDATE SKIP LOCKED и статус RUNNING, поэтому несколько
+процессов не мешают друг другу. События одного товара или заказа схлопываются до последнего, пакет
+записывается теми же массовыми запросами, что и синхронизация.
+"""
+
+import asyncio
+import hashlib
+import hmac
+import logging
+import threading
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional, Tuple
+
+from pydantic import ValidationError
+from sqlalchemy import and_, delete, func, or_, select, update
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.orm import Session
+
+from app.core.cache import response_cache
+from app.core.config import settings
+from app.core.database.connection import SessionLocal
+from app.core.database.bulk import any_of
+from app.database.models import SalesDriveWebhookEvent as WebhookEventModel, SyncStatus
+from app.api.v1.schemas.import_data import ImportResult
+from app.api.v1.schemas.salesdrive import SalesDriveOrder, SalesDriveWebhookEvent
+from app.api.v1.services.salesdrive_orders import OrderIngestor, naive_utc
+from app.api.v1.services.salesdrive_service import (
+    SalesDriveRateLimitError, SalesDriveService, SalesDriveUnavailableError
+)
+
+logger = logging.getLogger(__name__)
+
+# Заголовок с подписью: HMAC-SHA256 тела запроса в hex (допускается префикс sha256=)
+SIGNATURE_HEADER = "X-SalesDrive-Signature"
+
+# События, после которых товар или заказ записывается заново
+PRODUCT_EVENTS = {"product.created", "product.updated"}
+ORDER_EVENTS = {"order.created", "order.updated", "order.status_changed"}
+
+# Сколько сообщений об ошибках сохраняется в событии
+WEBHOOK_MAX_ERRORS = 10
+
+# Пауза перед повтором события после ошибки (удваивается с каждой попыткой)
+WEBHOOK_RETRY_BACKOFF = timedelta(seconds=30)
+
+# Захваченное событие без результата дольше этого снова доступно обработчикам
+WEBHOOK_CLAIM_TIMEOUT = timedelta(minutes=10)
+
+# Пробуждение обработчика при новом событии (в цикле событий приложения)
+_wakeup: Optional[asyncio.Event] = None
+
+
+def verify_signature(body: bytes, signature: Optional[str]) -> bool:
+    """Проверка подписи тела запроса ключом SALESDRIVE_WEBHOOK_SECRET."""
+    if not settings.SALESDRIVE_WEBHOOK_SECRET or not signature:
+        return False
+    if signature.startswith("sha256="):
+        signature = signature[len("sha256="):]
+    expected = hmac.new(
+        settings.SALESDRIVE_WEBHOOK_SECRET.encode(), body, hashlib.sha256
+    ).hexdigest()
+    return hmac.compare_digest(expected, signature.strip().lower())
+
+
+def enqueue_event(db: Session, event: SalesDriveWebhookEvent) -> bool:
+    """Сохранение события в очереди; False - событие уже было получено."""
+    table = WebhookEventModel.__table__
+    inserted = db.execute(
+        pg_insert(table).values(
+            event_id=event.event_id,
+            event_type=event.event_type,
+            event_time=naive_utc(event.timestamp),
+            object_key=object_key(event.event_type, event.data),
+            payload=event.data,
+            status=SyncStatus.IDLE,
+            attempts=0
+        ).on_conflict_do_nothing(index_elements=[table.c.event_id])
+    ).rowcount
+    db.commit()
+    
+    if inserted and _wakeup is not None:
+        _wakeup.set()
+    return inserted == 1
+
+
+def _latest(events: Dict[str, Tuple], key: Optional[str], event) -> None:
+    """Событие объекта заменяет более раннее событие того же объекта."""
+    if not key:
+        return
+    event_time = event.event_time or datetime.min
+    previous = events.get(key)
+    if previous is None or event_time >= previous[0]:
+        events[key] = (event_time, event.payload)
+
+
+def object_key(event_type: str, payload: dict) -> Optional[str]:
+    """
+    Товар (артикул или ID) или заказ (ID), к которому относится событие.
+    
+    Сохраняется в object_key при получении события: по нему с индексом
+    выбираются примененные события того же объекта.
+    """
+    if event_type in PRODUCT_EVENTS:
+        key = payload.get("sku") or payload.get("id")
+    elif event_type in ORDER_EVENTS:
+        key = payload.get("id")
+    else:
+        return None
+    return str(key) if key else None
+
+
+def _drop_stale(db: Session, events: Dict[str, Tuple], event_types) -> None:
+    """
+    Отбрасывание событий старше уже примененных.
+    
+    SalesDrive не гарантирует порядок доставки: событие, пришедшее после более
+    позднего по времени события того же объекта, не должно откатывать данные.
+    Примененными считаются только успешно обработанные события.
+    """
+    applied = dict(db.execute(
+        select(WebhookEventModel.object_key, func.max(WebhookEventModel.event_time))
+        .where(
+            any_of(WebhookEventModel.object_key, list(events)),
+            WebhookEventModel.status == SyncStatus.SUCCESS,
+            any_of(WebhookEventModel.event_type, list(event_types))
+        )
+        .group_by(WebhookEventModel.object_key)
+    ).all())
+    for key, newest in applied.items():
+        if newest is not None and events[key][0] < newest:
+            del events[key]
+
+
+def _claim_events(db: Session, limit: int) -> List:
+    """
+    Захват пакета событий.
+    
+    События переводятся в RUNNING и транзакция сразу фиксируется: блокировки
+    строк не удерживаются на время запросов к API. Событие, захваченное
+    обработчиком, который завершился аварийно, возвращается в обработку через
+    WEBHOOK_CLAIM_TIMEOUT.
+    """
+    now = datetime.utcnow()
+    events = db.query(
+        WebhookEventModel.id, WebhookEventModel.event_type, WebhookEventModel.event_time,
+        WebhookEventModel.object_key, WebhookEventModel.payload, WebhookEventModel.attempts
+    ).filter(or_(
+        and_(
+            WebhookEventModel.status == SyncStatus.IDLE,
+            or_(WebhookEventModel.next_attempt_at.is_(None), WebhookEventModel.next_attempt_at <= now)
+        ),
+        and_(
+            WebhookEventModel.status == SyncStatus.RUNNING,
+            WebhookEventModel.updated_at < now - WEBHOOK_CLAIM_TIMEOUT
+        )
+    )).order_by(WebhookEventModel.created_at).limit(limit).with_for_update(skip_locked=True).all()
+    
+    if events:
+        db.execute(
+            update(WebhookEventModel)
+            .where(WebhookEventModel.id.in_([event.id for event in events]))
+            .values(status=SyncStatus.RUNNING)
+        )
+    db.commit()
+    return events
+
+
+class _ClaimHeartbeat:
+    """
+    Продление захвата событий по таймеру.
+    
+    Работает в отдельном потоке и со своей сессией, пока обработчик ждет API
+    (лимит запросов может задержать запросы надолго): updated_at захваченных
+    событий обновляется, и другие процессы не забирают их по
+    WEBHOOK_CLAIM_TIMEOUT.
+    """
+    
+    def __init__(self, event_ids: List, interval: float = WEBHOOK_CLAIM_TIMEOUT.total_seconds() / 3):
+        self.event_ids = event_ids
+        self.interval = interval
+        self._stopped = threading.Event()
+        self._thread = threading.Thread(
+            target=self._run,
+            name="salesdrive-webhook-heartbeat",
+            daemon=True
+        )
+    
+    def __enter__(self) -> "_ClaimHeartbeat":
+        self._thread.start()
+        return self
+    
+    def __exit__(self, exc_type, exc_val, exc_tb) -> None:
+        self._stopped.set()
+        self._thread.join()
+    
+    def _run(self) -> None:
+        while not self._stopped.wait(self.interval):
+            db = SessionLocal()
+            try:
+                db.execute(
+                    update(WebhookEventModel)
+                    .where(
+                        any_of(WebhookEventModel.id, self.event_ids),
+                        WebhookEventModel.status == SyncStatus.RUNNING
+                    )
+                    .values(updated_at=func.current_timestamp())
+                )
+                db.commit()
+            except Exception as e:
+                logger.warning(f"Не удалось продлить захват webhook событий: {e}")
+            finally:
+                db.close()
+
+
+def process_webhook_batch(db: Session, limit: int = settings.SALESDRIVE_WEBHOOK_BATCH_SIZE) -> int:
+    """
+    Обработка пакета событий из очереди; возвращает число захваченных событий.
+    
+    Результат определяется для каждого товара и заказа отдельно: товары и
+    заказы пишутся в разных точках сохранения, ошибка одного заказа не
+    отменяет запись товаров. Событие объекта, который не удалось записать,
+    возвращается в очередь с растущей паузой и после
+    SALESDRIVE_WEBHOOK_MAX_ATTEMPTS попыток получает статус ошибки. Если API
+    недоступен или превышен лимит запросов, события заказов, которые нужно
+    запросить из API, откладываются до конца паузы без траты попытки.
+    """
+    events = _claim_events(db, limit)
+    if not events:
+        return 0
+    
+    products: Dict[str, Tuple] = {}
+    orders: Dict[str, Tuple] = {}
+    for event in events:
+        if event.event_type in PRODUCT_EVENTS:
+            _latest(products, event.object_key, event)
+        elif event.event_type in ORDER_EVENTS:
+            _latest(orders, event.object_key, event)
+        else:
+            logger.debug(f"SalesDrive webhook {event.event_type} ignored")
+    
+    if products:
+        _drop_stale(db, products, PRODUCT_EVENTS)
+    if orders:
+        _drop_stale(db, orders, ORDER_EVENTS)
+    # Запросы к API выполняются вне транзакции
+    db.commit()
+    
+    result = ImportResult(
+        total_items=len(events),
+        processed_items=0,
+        created_items=0,
+        updated_items=0,
+        failed_items=0
+    )
+    service = SalesDriveService(db)
+    failed_products = set()
+    failed_orders = set()
+    deferred_orders = set()
+    defer_seconds = 0.0
+    
+    # Событие без полного заказа (например, только смена статуса) -
+    # текущая версия заказа запрашивается из API
+    full_orders = []
+    refetch = []
+    for order_id, (_, payload) in orders.items():
+        try:
+            SalesDriveOrder.model_validate(payload)
+            full_orders.append(payload)
+        except ValidationError:
+            refetch.append(order_id)
+    if refetch:
+        try:
+            with _ClaimHeartbeat([event.id for event in events]):
+                fetched = asyncio.run(service.get_orders_by_id(refetch, result))
+            full_orders.extend(fetched)
+            failed_orders.update(set(refetch) - {str(order.get("id")) for order in fetched})
+        except (SalesDriveRateLimitError, SalesDriveUnavailableError) as e:
+            deferred_orders.update(refetch)
+            defer_seconds = max(e.retry_after, settings.SALESDRIVE_WEBHOOK_POLL_SECONDS)
+            result.errors.append(f"Error fetching orders: {e}")
+            logger.warning(f"SalesDrive unavailable, {len(refetch)} order events deferred for {defer_seconds:.0f}s: {e}")
+        except Exception as e:
+            failed_orders.update(refetch)
+            result.failed_items += len(refetch)
+            result.errors.append(f"Error fetching orders: {e}")
+            logger.error(f"Error fetching SalesDrive orders: {e}")
+    
+    if products:
+        try:
+            with db.begin_nested():
+                failed_products.update(
+                    service.apply_product_updates([payload for _, payload in products.values()], result)
+                )
+        except Exception as e:
+            failed_products.update(products)
+            result.failed_items += len(products)
+            result.errors.append(f"Error writing products: {str(getattr(e, 'orig', None) or e)}")
+            logger.error(f"Error applying SalesDrive product events: {e}")
+    
+    if full_orders:
+        ingestor = OrderIngestor(db)
+        try:
+            with db.begin_nested():
+                failed_orders.update(ingestor.ingest(full_orders, result))
+        except Exception as e:
+            failed_orders.update(str(order.get("id")) for order in full_orders)
+            result.failed_items += len(full_orders)
+            result.errors.append(f"Error writing orders: {str(getattr(e, 'orig', None) or e)}")
+            logger.error(f"Error applying SalesDrive order events: {e}")
+        warning = ingestor.missing_skus_warning()
+        if warning:
+            logger.warning(warning)
+    
+    now = datetime.utcnow()
+    error = "; ".join(result.errors[:WEBHOOK_MAX_ERRORS]) or None
+    rows = []
+    for event in events:
+        key = event.object_key
+        row = {
+            "id": event.id,
+            "status": SyncStatus.SUCCESS,
+            "attempts": event.attempts + 1,
+            "error_message": None,
+            "next_attempt_at": None,
+            "processed_at": now
+        }
+        if event.event_type in ORDER_EVENTS and key in deferred_orders:
+            row.update(
+                status=SyncStatus.IDLE,
+                attempts=event.attempts,
+                error_message=error,
+                next_attempt_at=now + timedelta(seconds=defer_seconds),
+                processed_at=None
+            )
+        elif (
+            (event.event_type in PRODUCT_EVENTS and key in failed_products)
+            or (event.event_type in ORDER_EVENTS and key in failed_orders)
+        ):
+            exhausted = event.attempts + 1 >= settings.SALESDRIVE_WEBHOOK_MAX_ATTEMPTS
+            row.update(
+                status=SyncStatus.ERROR if exhausted else SyncStatus.IDLE,
+                error_message=error,
+                next_attempt_at=None if exhausted else now + WEBHOOK_RETRY_BACKOFF * 2 ** event.attempts,
+                processed_at=now if exhausted else None
+            )
+        rows.append(row)
+    db.execute(update(WebhookEventModel), rows)
+    db.commit()
+    if result.created_items or result.updated_items:
+        response_cache.invalidate("products", "categories")
+    
+    logger.info(f"SalesDrive webhook events applied: {len(events)} events, "
+               f"{result.created_items} created, {result.updated_items} updated, "
+               f"{result.failed_items} failed, {len(deferred_orders)} orders deferred")
+    return len(events)
+
+
+def purge_webhook_events(db: Session) -> int:
+    """Удаление обработанных событий старше SALESDRIVE_WEBHOOK_RETENTION_DAYS."""
+    purged = db.execute(
+        delete(WebhookEventModel).where(
+            WebhookEventModel.status.in_([SyncStatus.SUCCESS, SyncStatus.ERROR]),
+            WebhookEventModel.updated_at < datetime.utcnow() - timedelta(
+                days=settings.SALESDRIVE_WEBHOOK_RETENTION_DAYS
+            )
+        )
+    ).rowcount
+    db.commit()
+    return purged
+
+
+def drain_webhook_events() -> int:
+    """Обработка очереди до опустошения; возвращает число событий."""
+    db = SessionLocal()
+    try:
+        processed = 0
+        while True:
+            count = process_webhook_batch(db)
+            if not count:
+                return processed
+            processed += count
+    finally:
+        db.close()
+
+
+async def watch_webhook_events() -> None:
+    """
+    Обработка очереди webhook событий.
+    
+    Новое событие будит обработчик сразу; без событий очередь проверяется
+    раз в SALESDRIVE_WEBHOOK_POLL_SECONDS (события других процессов и
+    возвращенные в очередь после ошибки).
+    """
+    global _wakeup
+    _wakeup = asyncio.Event()
+    last_purge = datetime.min
+    while True:
+        _wakeup.clear()
+        try:
+            await asyncio.to_thread(drain_webhook_events)
+            if datetime.utcnow() - last_purge > timedelta(hours=1):
+                last_purge = datetime.utcnow()
+                db = SessionLocal()
+                try:
+                    await asyncio.to_thread(purge_webhook_events, db)
+                finally:
+                    db.close()
+        except Exception as e:
+            logger.error(f"Ошибка обработки webhook событий SalesDrive: {e}")
+        try:
+            await asyncio.wait_for(_wakeup.wait(), timeout=settings.SALESDRIVE_WEBHOOK_POLL_SECONDS)
+        except asyncio.TimeoutError:
+            pass
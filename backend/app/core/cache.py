@@ -0,0 +1,230 @@
+"""
+Кеширование ответов API с поддержкой ETag.
+
+Тела ответов хранятся в Redis; если Redis недоступен, используется локальный
+кеш процесса. ETag строится из версий пространств имен (увеличиваются при
+записи через сервисы), watermark-а данных из БД (версия data_versions,
+которую увеличивают триггеры при фиксации транзакций) и адреса запроса,
+поэтому одинаковый ETag всегда означает одинаковое тело ответа.
+"""
+
+import hashlib
+import json
+import logging
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Optional, Sequence, Tuple
+
+import redis
+from fastapi import Request, Response
+from fastapi.encoders import jsonable_encoder
+from sqlalchemy.orm import Session
+
+from app.core.config import settings
+from app.database.models import DataVersion
+
+logger = logging.getLogger(__name__)
+
+# Через сколько секунд повторять попытку подключения к Redis после ошибки
+REDIS_RETRY_INTERVAL = 30
+
+# Версия данных каталога: товары, остатки, категории, поставщики, теги
+CATALOG_DATA_VERSION = "catalog"
+
+
+class LocalCache:
+    """Локальный LRU-кеш процесса с TTL."""
+    
+    def __init__(self, max_items: int = 1000):
+        self.max_items = max_items
+        self._items: "OrderedDict[str, Tuple[float, Any]]" = OrderedDict()
+        self._lock = threading.Lock()
+    
+    def get(self, key: str) -> Optional[Any]:
+        with self._lock:
+            item = self._items.get(key)
+            if item is None:
+                return None
+            expires_at, value = item
+            if expires_at < time.monotonic():
+                del self._items[key]
+                return None
+            self._items.move_to_end(key)
+            return value
+    
+    def set(self, key: str, value: Any, ttl: int) -> None:
+        with self._lock:
+            self._items[key] = (time.monotonic() + ttl, value)
+            self._items.move_to_end(key)
+            while len(self._items) > self.max_items:
+                self._items.popitem(last=False)
+    
+    def incr(self, key: str) -> int:
+        with self._lock:
+            _, value = self._items.get(key, (0, 0))
+            value += 1
+            # Версии не должны вытесняться и истекать
+            self._items[key] = (float("inf"), value)
+            return value
+    
+    def clear(self) -> None:
+        with self._lock:
+            self._items.clear()
+
+
+class ResponseCache:
+    """Кеш ответов API: Redis с откатом на локальный кеш."""
+    
+    def __init__(self, redis_url: str, prefix: str, ttl: int, local_max_items: int = 1000):
+        self.redis_url = redis_url
+        self.prefix = prefix
+        self.ttl = ttl
+        self.local = LocalCache(local_max_items)
+        self._redis: Optional[redis.Redis] = None
+        self._redis_retry_at = 0.0
+    
+    def _get_redis(self) -> Optional[redis.Redis]:
+        """Получение клиента Redis (None, если Redis недавно был недоступен)."""
+        if self._redis is not None:
+            return self._redis
+        if time.monotonic() < self._redis_retry_at:
+            return None
+        try:
+            client = redis.Redis.from_url(
+                self.redis_url,
+                socket_timeout=0.5,
+                socket_connect_timeout=0.5
+            )
+            client.ping()
+            self._redis = client
+            logger.info("Кеш ответов использует Redis")
+        except redis.RedisError as e:
+            self._mark_redis_unavailable(e)
+        return self._redis
+    
+    def _mark_redis_unavailable(self, error: Exception) -> None:
+        logger.warning(f"Redis недоступен, используется локальный кеш: {error}")
+        self._redis = None
+        self._redis_retry_at = time.monotonic() + REDIS_RETRY_INTERVAL
+    
+    def _key(self, *parts: str) -> str:
+        return self.prefix + ":".join(parts)
+    
+    def get(self, key: str) -> Optional[bytes]:
+        """Получение значения по ключу."""
+        full_key = self._key(key)
+        client = self._get_redis()
+        if client is not None:
+            try:
+                return client.get(full_key)
+            except redis.RedisError as e:
+                self._mark_redis_unavailable(e)
+        return self.local.get(full_key)
+    
+    def set(self, key: str, value: bytes, ttl: Optional[int] = None) -> None:
+        """Сохранение значения."""
+        full_key = self._key(key)
+        ttl = ttl or self.ttl
+        client = self._get_redis()
+        if client is not None:
+            try:
+                client.set(full_key, value, ex=ttl)
+                return
+            except redis.RedisError as e:
+                self._mark_redis_unavailable(e)
+        self.local.set(full_key, value, ttl)
+    
+    def get_version(self, namespace: str) -> int:
+        """Текущая версия пространства имен."""
+        full_key = self._key("version", namespace)
+        client = self._get_redis()
+        if client is not None:
+            try:
+                return int(client.get(full_key) or 0)
+            except redis.RedisError as e:
+                self._mark_redis_unavailable(e)
+        return self.local.get(full_key) or 0
+    
+    def invalidate(self, *namespaces: str) -> None:
+        """
+        Инвалидация пространств имен.
+        
+        Увеличивает версию, поэтому все ETag и закешированные ответы этого
+        пространства имен становятся неактуальными.
+        """
+        for namespace in namespaces:
+            full_key = self._key("version", namespace)
+            client = self._get_redis()
+            if client is not None:
+                try:
+                    client.incr(full_key)
+                    continue
+                except redis.RedisError as e:
+                    self._mark_redis_unavailable(e)
+            self.local.incr(full_key)
+    
+    def make_etag(self, namespaces: Sequence[str], watermark: Any, request: Request) -> str:
+        """Построение сильного ETag для запроса."""
+        versions = {namespace: self.get_version(namespace) for namespace in namespaces}
+        query = sorted(request.query_params.multi_items())
+        payload = json.dumps(
+            [versions, jsonable_encoder(watermark), request.url.path, query],
+            sort_keys=True,
+            default=str
+        )
+        return '"' + hashlib.sha1(payload.encode("utf-8")).hexdigest() + '"'
+
+
+def get_data_version(db: Session, name: str = CATALOG_DATA_VERSION) -> int:
+    """
+    Версия данных из БД для watermark-а ETag.
+    
+    Триггеры увеличивают ее при фиксации транзакции, поэтому она учитывает
+    записи в обход сервисов и не отстает от долгих транзакций. Версия
+    читается до построения ответа: тело всегда не старее версии в ETag.
+    """
+    version = db.query(DataVersion.version).filter(DataVersion.name == name).scalar()
+    return version or 0
+
+
+def _etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    """Проверка заголовка If-None-Match."""
+    if not if_none_match:
+        return False
+    candidates = [value.strip() for value in if_none_match.split(",")]
+    return "*" in candidates or etag in candidates
+
+
+def cached_response(
+    request: Request,
+    namespaces: Sequence[str],
+    watermark: Any,
+    build: Callable[[], Any]
+) -> Response:
+    """
+    Ответ с ETag и серверным кешем.
+    
+    Если клиент прислал совпадающий If-None-Match, возвращается 304 без
+    обращения к build(). Иначе тело берется из кеша или строится заново.
+    """
+    etag = response_cache.make_etag(namespaces, watermark, request)
+    headers: Dict[str, str] = {"ETag": etag, "Cache-Control": "private, no-cache"}
+    
+    if _etag_matches(request.headers.get("if-none-match"), etag):
+        return Response(status_code=304, headers=headers)
+    
+    body = response_cache.get(f"response:{etag}")
+    if body is None:
+        body = json.dumps(jsonable_encoder(build()), ensure_ascii=False).encode("utf-8")
+        response_cache.set(f"response:{etag}", body)
+    
+    return Response(content=body, media_type="application/json", headers=headers)
+
+
+response_cache = ResponseCache(
+    redis_url=settings.REDIS_URL,
+    prefix=settings.CACHE_PREFIX,
+    ttl=settings.CACHE_TTL,
+    local_max_items=settings.CACHE_LOCAL_MAX_ITEMS
+)
@@ -50,10 +50,25 @@ class Settings(BaseSettings):
     SALESDRIVE_API_KEY: str = "test_api_key_placeholder"
     SALESDRIVE_TIMEOUT: int = 30
     SALESDRIVE_MAX_RETRIES: int = 3
-    SALESDRIVE_RATE_LIMIT_DELAY: float = 1.0
-    SALESDRIVE_WEBHOOK_SECRET: str = ""
+    SALESDRIVE_RATE_LIMIT_DELAY: float = 1.0  # Средний интервал между запросами, секунд
+    SALESDRIVE_RATE_LIMIT_BURST: int = 10  # Запросов подряд без ожидания после простоя
+    SALESDRIVE_MAX_CONCURRENCY: int = 4  # Одновременных запросов (и загружаемых страниц)
+    SALESDRIVE_PAGE_SIZE: int = 1000  # Максимальный размер страницы API
+    SALESDRIVE_MAX_COOLDOWN_WAIT: float = 10.0  # Дольше после 429 запрос не ждет, а сразу завершается ошибкой
+    SALESDRIVE_CIRCUIT_FAILURE_THRESHOLD: int = 5  # Сбоев API подряд до приостановки запросов
+    SALESDRIVE_CIRCUIT_RESET_SECONDS: float = 30.0  # Пауза до пробного запроса
+    SALESDRIVE_WEBHOOK_SECRET: str = ""  # Ключ подписи webhook; без него события не принимаются
+    SALESDRIVE_WEBHOOK_BATCH_SIZE: int = 500  # Событий, применяемых за один проход
+    SALESDRIVE_WEBHOOK_POLL_SECONDS: int = 5  # Проверка очереди без новых событий
+    SALESDRIVE_WEBHOOK_MAX_ATTEMPTS: int = 5  # Попыток обработки события до ошибки
+    SALESDRIVE_WEBHOOK_RETENTION_DAYS: int = 7  # Хранение обработанных событий (и их event_id)
     SALESDRIVE_AUTO_SYNC_ENABLED: bool = False
     SALESDRIVE_SYNC_INTERVAL_MINUTES: int = 60
+    SALESDRIVE_FULL_SYNC_INTERVAL_HOURS: int = 24  # Полная сверка каталога между инкрементальными
+    SALESDRIVE_MAX_CONNECTIONS: int = 20  # Соединений в пуле общего HTTP клиента
+    SALESDRIVE_MAX_KEEPALIVE_CONNECTIONS: int = 10
+    SALESDRIVE_KEEPALIVE_EXPIRY: float = 30.0  # Секунд простоя до закрытия соединения
+    SALESDRIVE_HTTP2: bool = False
     
     # Логирование
     LOG_LEVEL: str = "INFO"
@@ -66,10 +81,17 @@ class Settings(BaseSettings):
     # Файлы
     UPLOAD_DIR: str = "uploads"
     MAX_FILE_SIZE: int = 10485760  # 10MB
+    IMPORT_BATCH_SIZE: int = 5000  # Строк в одном пакете импорта
+    IMPORT_PREVIEW_BATCH_SIZE: int = 50000  # Строк в одном пакете проверки (dry-run)
+    IMPORT_JOB_WORKERS: int = 1  # Параллельно выполняемых задач импорта
+    IMPORT_JOB_STALE_SECONDS: int = 300  # Задача без обновлений считается прерванной
+    IMPORT_PARSE_WORKERS: Optional[int] = None  # Процессов разбора файлов (None - по числу ядер)
+    IMPORT_PARSE_CHUNK_SIZE: int = 4194304  # Размер части CSV для параллельного разбора, 4MB
     
     # Кеширование
     CACHE_TTL: int = 3600  # 1 час
     CACHE_PREFIX: str = "inventory:"
+    CACHE_LOCAL_MAX_ITEMS: int = 1000  # Размер локального кеша, если Redis недоступен
     
     # Email
     EMAIL_SMTP_HOST: Optional[str] = None
@@ -0,0 +1,51 @@
+"""
+Вспомогательные функции для массовых операций с базой данных.
+"""
+
+import csv
+import io
+from typing import Any, Iterable, Sequence
+
+from sqlalchemy import any_, cast, literal
+from sqlalchemy.engine import Connection
+from sqlalchemy.dialects.postgresql import ARRAY
+from sqlalchemy.sql.elements import ColumnElement
+
+
+def any_of(column: ColumnElement, values: Iterable) -> ColumnElement:
+    """
+    Условие column = ANY(:values).
+    
+    Передает список одним параметром-массивом вместо IN (...) с отдельным
+    параметром на каждое значение, поэтому размер SQL не зависит от размера
+    списка.
+    """
+    array_type = ARRAY(column.type)
+    return column == any_(cast(literal(list(values), array_type), array_type))
+
+
+def copy_rows(
+    connection: Connection,
+    table: str,
+    columns: Sequence[str],
+    rows: Iterable[Sequence[Any]]
+) -> None:
+    """
+    Загрузка строк в таблицу через COPY FROM STDIN.
+    
+    Строки передаются одним потоком без разбора SQL на каждую строку, что
+    на порядок быстрее INSERT для десятков тысяч строк. None и пустые строки
+    загружаются как NULL.
+    """
+    buffer = io.StringIO()
+    csv.writer(buffer).writerows(rows)
+    buffer.seek(0)
+    
+    cursor = connection.connection.cursor()
+    try:
+        cursor.copy_expert(
+            f"COPY {table} ({', '.join(columns)}) FROM STDIN WITH (FORMAT csv)",
+            buffer
+        )
+    finally:
+        cursor.close()
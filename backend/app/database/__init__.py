@@ -20,22 +20,29 @@ from .models import (
     # Модели
     User,
     Category,
+    CategoryClosure,
     ProductTag,
     ProductTagRelation,
     Supplier,
     Product,
     Inventory,
+    ProductStockSummary,
     InventoryMovement,
     Order,
     OrderItem,
     Sale,
+    SalesDaily,
     ForecastTemplate,
     SalesForecast,
     UserLog,
     Alert,
     SyncHistory,
+    ImportJob,
+    SalesDriveWebhookEvent,
     IntegrationConfig,
+    DataVersion,
 )
+from . import triggers  # noqa: F401  регистрация триггеров для create_all
 
 __all__ = [
     # Базовые классы
@@ -54,19 +61,25 @@ __all__ = [
     # Модели
     "User",
     "Category",
+    "CategoryClosure",
     "ProductTag",
     "ProductTagRelation", 
     "Supplier",
     "Product",
     "Inventory",
+    "ProductStockSummary",
     "InventoryMovement",
     "Order",
     "OrderItem",
     "Sale",
+    "SalesDaily",
     "ForecastTemplate",
     "SalesForecast",
     "UserLog",
     "Alert",
     "SyncHistory",
+    "ImportJob",
+    "SalesDriveWebhookEvent",
     "IntegrationConfig",
+    "DataVersion",
 ] 
\ No newline at end of file
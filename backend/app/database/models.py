@@ -8,7 +8,7 @@ from decimal import Decimal
 from typing import Optional, List
 
 from sqlalchemy import (
-    Column, String, Integer, Boolean, DateTime, Text, 
+    Column, String, Integer, BigInteger, Boolean, DateTime, Text, 
     DECIMAL, ForeignKey, UniqueConstraint, Index,
     Enum as SQLEnum, JSON, Date
 )
@@ -125,6 +125,32 @@ class Category(Base, TimestampMixin):
         return f"<Category(name='{self.name}')>"
 
 
+class CategoryClosure(Base):
+    """
+    Замыкание иерархии категорий: все пары (предок, потомок) с расстоянием.
+
+    Каждая категория является своим предком с depth = 0. Поддерживается
+    триггерами базы данных (app/database/triggers.py); из приложения только
+    читается.
+    """
+    __tablename__ = "category_closure"
+
+    ancestor_id = Column(
+        UUID(as_uuid=True), ForeignKey("categories.id", ondelete="CASCADE"), primary_key=True
+    )
+    descendant_id = Column(
+        UUID(as_uuid=True), ForeignKey("categories.id", ondelete="CASCADE"), primary_key=True
+    )
+    depth = Column(Integer, nullable=False)
+
+    __table_args__ = (
+        Index('idx_category_closure_descendant', 'descendant_id', 'depth'),
+    )
+
+    def __repr__(self):
+        return f"<CategoryClosure(ancestor_id='{self.ancestor_id}', descendant_id='{self.descendant_id}')>"
+
+
 class ProductTag(Base, TimestampMixin):
     """Модель тега товара."""
     __tablename__ = "product_tags"
@@ -196,6 +222,7 @@ class Product(Base, TimestampMixin):
     forecasts = relationship("SalesForecast", back_populates="product")
     alerts = relationship("Alert", back_populates="product")
     tags = relationship("ProductTag", secondary="product_tag_relations")
+    stock_summary = relationship("ProductStockSummary", uselist=False, viewonly=True)
 
     def __repr__(self):
         return f"<Product(sku='{self.sku}', name='{self.name}')>"
@@ -236,6 +263,34 @@ class Inventory(Base, TimestampMixin):
         return f"<Inventory(product_id='{self.product_id}', quantity={self.quantity})>"
 
 
+class ProductStockSummary(Base):
+    """
+    Сводные остатки товара по всем локациям.
+
+    Поддерживается триггерами базы данных (app/database/triggers.py) при любых
+    изменениях inventory; из приложения только читается.
+    """
+    __tablename__ = "product_stock_summary"
+
+    product_id = Column(
+        UUID(as_uuid=True), ForeignKey("products.id", ondelete="CASCADE"), primary_key=True
+    )
+    total_quantity = Column(Integer, nullable=False, default=0)
+    reserved_quantity = Column(Integer, nullable=False, default=0)
+    min_quantity = Column(Integer, nullable=False, default=0)
+    locations_count = Column(Integer, nullable=False, default=0)
+    stock_status = Column(String(20), nullable=False, default="out_of_stock")
+    updated_at = Column(DateTime, default=func.current_timestamp())
+
+    __table_args__ = (
+        Index('idx_stock_summary_status_quantity', 'stock_status', 'total_quantity'),
+        Index('idx_stock_summary_quantity', 'total_quantity'),
+    )
+
+    def __repr__(self):
+        return f"<ProductStockSummary(product_id='{self.product_id}', total={self.total_quantity})>"
+
+
 class InventoryMovement(Base):
     """Модель движения товаров."""
     __tablename__ = "inventory_movements"
@@ -283,6 +338,9 @@ class Order(Base, TimestampMixin):
     tax_amount = Column(DECIMAL(12, 2), default=0)
     notes = Column(Text)
     created_by = Column(UUID(as_uuid=True), ForeignKey("users.id"))
+    # Заказ внешней системы (SalesDrive): ID и время последнего изменения там
+    external_id = Column(String(100), unique=True)
+    external_updated_at = Column(DateTime)
 
     # Связи
     created_by_user = relationship("User", back_populates="created_orders")
@@ -363,6 +421,32 @@ class Sale(Base, TimestampMixin):
         return f"<Sale(product_id='{self.product_id}', quantity={self.quantity}, amount={self.total_amount})>"
 
 
+class SalesDaily(Base):
+    """
+    Продажи товара за день.
+
+    Поддерживается триггерами базы данных (app/database/triggers.py) при любых
+    изменениях sales; из приложения только читается.
+    """
+    __tablename__ = "sales_daily"
+
+    product_id = Column(
+        UUID(as_uuid=True), ForeignKey("products.id", ondelete="CASCADE"), primary_key=True
+    )
+    sale_date = Column(Date, primary_key=True)
+    quantity = Column(Integer, nullable=False, default=0)
+    total_amount = Column(DECIMAL(14, 2), nullable=False, default=0)
+    sales_count = Column(Integer, nullable=False, default=0)
+    updated_at = Column(DateTime, default=func.current_timestamp())
+
+    __table_args__ = (
+        Index('idx_sales_daily_date', 'sale_date'),
+    )
+
+    def __repr__(self):
+        return f"<SalesDaily(product_id='{self.product_id}', date={self.sale_date}, quantity={self.quantity})>"
+
+
 class SalesForecast(Base):
     """Модель прогноза продаж."""
     __tablename__ = "sales_forecasts"
@@ -455,6 +539,70 @@ class SyncHistory(Base):
         return f"<SyncHistory(type='{self.sync_type}', status='{self.status}')>"
 
 
+class ImportJob(Base, TimestampMixin):
+    """
+    Модель фоновой задачи импорта.
+
+    Файл хранится в UPLOAD_DIR до завершения задачи. rows_committed -
+    контрольная точка: количество строк файла, записанных вместе с пакетами;
+    после перезапуска задача продолжается с этой строки.
+    """
+    __tablename__ = "import_jobs"
+
+    id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
+    source = Column(String(20), nullable=False)
+    file_name = Column(String(255), nullable=False)
+    file_path = Column(Text, nullable=False)
+    file_format = Column(String(20), nullable=False)
+    file_size = Column(BigInteger, default=0)
+    update_existing = Column(Boolean, default=False)
+    status = Column(SQLEnum(SyncStatus), nullable=False, default=SyncStatus.IDLE)
+    progress = Column(Integer, default=0)
+    rows_committed = Column(Integer, default=0)
+    result = Column(JSONB)
+    error_message = Column(Text)
+    started_at = Column(DateTime)
+    completed_at = Column(DateTime)
+    created_by = Column(UUID(as_uuid=True), ForeignKey("users.id"))
+
+    __table_args__ = (
+        Index('idx_import_jobs_status', 'status', 'updated_at'),
+    )
+
+    def __repr__(self):
+        return f"<ImportJob(file='{self.file_name}', status='{self.status}')>"
+
+
+class SalesDriveWebhookEvent(Base, TimestampMixin):
+    """
+    Событие webhook SalesDrive в очереди обработки.
+
+    event_id уникален: повторная доставка события не добавляет строку.
+    Обработанные события хранятся SALESDRIVE_WEBHOOK_RETENTION_DAYS дней.
+    """
+    __tablename__ = "salesdrive_webhook_events"
+
+    id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
+    event_id = Column(String(100), unique=True, nullable=False)
+    event_type = Column(String(50), nullable=False)
+    event_time = Column(DateTime)
+    object_key = Column(String(255))  # Артикул или ID товара, ID заказа
+    payload = Column(JSONB, nullable=False)
+    status = Column(SQLEnum(SyncStatus), nullable=False, default=SyncStatus.IDLE)
+    attempts = Column(Integer, nullable=False, default=0)
+    error_message = Column(Text)
+    next_attempt_at = Column(DateTime)  # Не обрабатывать раньше (повтор после ошибки)
+    processed_at = Column(DateTime)
+
+    __table_args__ = (
+        Index('idx_webhook_events_status', 'status', 'created_at'),
+        Index('idx_webhook_events_object', 'object_key', 'event_time'),
+    )
+
+    def __repr__(self):
+        return f"<SalesDriveWebhookEvent(event_id='{self.event_id}', type='{self.event_type}', status='{self.status}')>"
+
+
 class IntegrationConfig(Base, TimestampMixin):
     """Модель конфигурации интеграций."""
     __tablename__ = "integration_config"
@@ -469,6 +617,23 @@ class IntegrationConfig(Base, TimestampMixin):
         return f"<IntegrationConfig(service='{self.service_name}', enabled={self.is_enabled})>"
 
 
+class DataVersion(Base):
+    """
+    Версия данных для кеша ответов.
+    
+    Увеличивается триггерами базы данных (app/database/triggers.py) при
+    фиксации каждой транзакции, изменившей таблицы каталога; из приложения
+    только читается.
+    """
+    __tablename__ = "data_versions"
+
+    name = Column(String(50), primary_key=True)
+    version = Column(BigInteger, nullable=False, default=0)
+
+    def __repr__(self):
+        return f"<DataVersion(name='{self.name}', version={self.version})>"
+
+
 # Индексы для оптимизации (совместимые с SQLAlchemy 2.0)
 Index('idx_products_name_search', Product.name)
 Index('idx_inventory_low_stock', Inventory.quantity, Inventory.min_quantity)
@@ -0,0 +1,70 @@
+-- Замыкание иерархии категорий (category_closure).
+-- Вставка категории добавляет пути от всех предков родителя, смена родителя
+-- переносит все поддерево: удаляются пути от прежних предков и добавляются
+-- пути от новых.
+--
+-- Устанавливается миграцией 005_category_closure.sql и после create_all
+-- (app/database/triggers.py); повторное выполнение безопасно.
+
+CREATE OR REPLACE FUNCTION rebuild_category_closure()
+RETURNS void AS $$
+BEGIN
+    DELETE FROM category_closure;
+    INSERT INTO category_closure (ancestor_id, descendant_id, depth)
+    WITH RECURSIVE tree AS (
+        SELECT id AS ancestor_id, id AS descendant_id, 0 AS depth
+        FROM categories
+        UNION ALL
+        SELECT tree.ancestor_id, c.id, tree.depth + 1
+        FROM tree
+        JOIN categories c ON c.parent_id = tree.descendant_id
+    )
+    SELECT ancestor_id, descendant_id, depth FROM tree;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE OR REPLACE FUNCTION category_closure_insert()
+RETURNS TRIGGER AS $$
+BEGIN
+    INSERT INTO category_closure (ancestor_id, descendant_id, depth)
+    SELECT ancestor_id, NEW.id, depth + 1
+    FROM category_closure
+    WHERE descendant_id = NEW.parent_id
+    UNION ALL
+    SELECT NEW.id, NEW.id, 0;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE OR REPLACE FUNCTION category_closure_move()
+RETURNS TRIGGER AS $$
+BEGIN
+    -- Пути от прежних предков ко всем узлам поддерева
+    DELETE FROM category_closure c
+    USING category_closure sub, category_closure sup
+    WHERE sub.ancestor_id = NEW.id
+      AND sup.descendant_id = NEW.id
+      AND sup.depth > 0
+      AND c.ancestor_id = sup.ancestor_id
+      AND c.descendant_id = sub.descendant_id;
+    -- Пути от новых предков ко всем узлам поддерева
+    INSERT INTO category_closure (ancestor_id, descendant_id, depth)
+    SELECT sup.ancestor_id, sub.descendant_id, sup.depth + sub.depth + 1
+    FROM category_closure sup
+    JOIN category_closure sub ON sub.ancestor_id = NEW.id
+    WHERE sup.descendant_id = NEW.parent_id;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS categories_closure_insert ON categories;
+CREATE TRIGGER categories_closure_insert
+    AFTER INSERT ON categories
+    FOR EACH ROW EXECUTE FUNCTION category_closure_insert();
+
+DROP TRIGGER IF EXISTS categories_closure_move ON categories;
+CREATE TRIGGER categories_closure_move
+    AFTER UPDATE OF parent_id ON categories
+    FOR EACH ROW
+    WHEN (OLD.parent_id IS DISTINCT FROM NEW.parent_id)
+    EXECUTE FUNCTION category_closure_move();
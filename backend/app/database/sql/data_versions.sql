@@ -0,0 +1,59 @@
+-- Версии данных для кеша ответов (data_versions).
+-- Любое изменение таблиц каталога увеличивает версию "catalog" при фиксации
+-- транзакции: триггеры отложенные, поэтому новая версия становится видна
+-- одновременно с данными, в порядке фиксации, а не начала транзакций.
+-- Учитываются и записи в обход сервисов (SQL, триггеры, удаления).
+-- Блокировка строки версии держится только на время фиксации.
+--
+-- Устанавливается миграцией 009_data_versions.sql и после create_all
+-- (app/database/triggers.py); повторное выполнение безопасно.
+
+CREATE OR REPLACE FUNCTION bump_data_version()
+RETURNS TRIGGER AS $$
+BEGIN
+    -- Одно увеличение на транзакцию, остальные события пропускаются
+    IF current_setting('app.data_version_bumped', true) = 'on' THEN
+        RETURN NULL;
+    END IF;
+    PERFORM set_config('app.data_version_bumped', 'on', true);
+    INSERT INTO data_versions (name, version) VALUES ('catalog', 1)
+    ON CONFLICT (name) DO UPDATE SET version = data_versions.version + 1;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS products_data_version ON products;
+CREATE CONSTRAINT TRIGGER products_data_version
+    AFTER INSERT OR UPDATE OR DELETE ON products
+    DEFERRABLE INITIALLY DEFERRED
+    FOR EACH ROW EXECUTE FUNCTION bump_data_version();
+
+DROP TRIGGER IF EXISTS inventory_data_version ON inventory;
+CREATE CONSTRAINT TRIGGER inventory_data_version
+    AFTER INSERT OR UPDATE OR DELETE ON inventory
+    DEFERRABLE INITIALLY DEFERRED
+    FOR EACH ROW EXECUTE FUNCTION bump_data_version();
+
+DROP TRIGGER IF EXISTS categories_data_version ON categories;
+CREATE CONSTRAINT TRIGGER categories_data_version
+    AFTER INSERT OR UPDATE OR DELETE ON categories
+    DEFERRABLE INITIALLY DEFERRED
+    FOR EACH ROW EXECUTE FUNCTION bump_data_version();
+
+DROP TRIGGER IF EXISTS suppliers_data_version ON suppliers;
+CREATE CONSTRAINT TRIGGER suppliers_data_version
+    AFTER INSERT OR UPDATE OR DELETE ON suppliers
+    DEFERRABLE INITIALLY DEFERRED
+    FOR EACH ROW EXECUTE FUNCTION bump_data_version();
+
+DROP TRIGGER IF EXISTS product_tags_data_version ON product_tags;
+CREATE CONSTRAINT TRIGGER product_tags_data_version
+    AFTER INSERT OR UPDATE OR DELETE ON product_tags
+    DEFERRABLE INITIALLY DEFERRED
+    FOR EACH ROW EXECUTE FUNCTION bump_data_version();
+
+DROP TRIGGER IF EXISTS product_tag_relations_data_version ON product_tag_relations;
+CREATE CONSTRAINT TRIGGER product_tag_relations_data_version
+    AFTER INSERT OR UPDATE OR DELETE ON product_tag_relations
+    DEFERRABLE INITIALLY DEFERRED
+    FOR EACH ROW EXECUTE FUNCTION bump_data_version();
@@ -0,0 +1,95 @@
+-- Сводные остатки товаров (product_stock_summary).
+-- Триггеры уровня оператора с transition tables: массовое изменение inventory
+-- пересчитывает каждый затронутый товар один раз одним запросом.
+--
+-- Устанавливается миграцией 004_product_stock_summary.sql и после create_all
+-- (app/database/triggers.py); повторное выполнение безопасно.
+
+CREATE OR REPLACE FUNCTION refresh_product_stock_summary(p_product_ids UUID[])
+RETURNS void AS $$
+BEGIN
+    -- Блокируем строки сводки, чтобы параллельные транзакции пересчитывали
+    -- товар по очереди и видели изменения друг друга
+    PERFORM 1 FROM (
+        SELECT product_id FROM product_stock_summary
+        WHERE product_id = ANY(p_product_ids)
+        ORDER BY product_id
+        FOR UPDATE
+    ) locked;
+    INSERT INTO product_stock_summary (
+        product_id, total_quantity, reserved_quantity, min_quantity,
+        locations_count, stock_status, updated_at
+    )
+    SELECT
+        p.id,
+        COALESCE(SUM(i.quantity), 0),
+        COALESCE(SUM(i.reserved_quantity), 0),
+        COALESCE(MIN(i.min_quantity), 0),
+        COUNT(i.product_id),
+        CASE
+            WHEN COALESCE(SUM(i.quantity), 0) <= 0 THEN 'out_of_stock'
+            WHEN SUM(i.quantity) <= MIN(i.min_quantity) THEN 'low_stock'
+            ELSE 'in_stock'
+        END,
+        CURRENT_TIMESTAMP
+    FROM products p
+    LEFT JOIN inventory i ON i.product_id = p.id
+    WHERE p.id = ANY(p_product_ids)
+    GROUP BY p.id
+    ON CONFLICT (product_id) DO UPDATE SET
+        total_quantity = EXCLUDED.total_quantity,
+        reserved_quantity = EXCLUDED.reserved_quantity,
+        min_quantity = EXCLUDED.min_quantity,
+        locations_count = EXCLUDED.locations_count,
+        stock_status = EXCLUDED.stock_status,
+        updated_at = EXCLUDED.updated_at;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE OR REPLACE FUNCTION sync_product_stock_summary()
+RETURNS TRIGGER AS $$
+BEGIN
+    IF TG_OP = 'INSERT' THEN
+        PERFORM refresh_product_stock_summary(ARRAY(SELECT DISTINCT product_id FROM new_rows));
+    ELSIF TG_OP = 'DELETE' THEN
+        PERFORM refresh_product_stock_summary(ARRAY(SELECT DISTINCT product_id FROM old_rows));
+    ELSE
+        PERFORM refresh_product_stock_summary(ARRAY(
+            SELECT product_id FROM new_rows UNION SELECT product_id FROM old_rows
+        ));
+    END IF;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE OR REPLACE FUNCTION create_product_stock_summary()
+RETURNS TRIGGER AS $$
+BEGIN
+    PERFORM refresh_product_stock_summary(ARRAY(SELECT id FROM new_rows));
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS inventory_stock_summary_insert ON inventory;
+CREATE TRIGGER inventory_stock_summary_insert
+    AFTER INSERT ON inventory
+    REFERENCING NEW TABLE AS new_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION sync_product_stock_summary();
+
+DROP TRIGGER IF EXISTS inventory_stock_summary_update ON inventory;
+CREATE TRIGGER inventory_stock_summary_update
+    AFTER UPDATE ON inventory
+    REFERENCING OLD TABLE AS old_rows NEW TABLE AS new_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION sync_product_stock_summary();
+
+DROP TRIGGER IF EXISTS inventory_stock_summary_delete ON inventory;
+CREATE TRIGGER inventory_stock_summary_delete
+    AFTER DELETE ON inventory
+    REFERENCING OLD TABLE AS old_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION sync_product_stock_summary();
+
+DROP TRIGGER IF EXISTS products_stock_summary_insert ON products;
+CREATE TRIGGER products_stock_summary_insert
+    AFTER INSERT ON products
+    REFERENCING NEW TABLE AS new_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION create_product_stock_summary();
@@ -0,0 +1,96 @@
+-- Продажи товаров по дням (sales_daily).
+-- Триггеры уровня оператора: массовая вставка продаж пересчитывает каждую
+-- затронутую пару (товар, день) один раз по строкам sales этого дня.
+--
+-- Устанавливается миграцией 007_salesdrive_orders.sql и после create_all
+-- (app/database/triggers.py); повторное выполнение безопасно.
+
+CREATE OR REPLACE FUNCTION refresh_sales_daily(p_product_ids UUID[], p_dates DATE[])
+RETURNS void AS $$
+BEGIN
+    -- Блокируем строки сводки, чтобы параллельные транзакции пересчитывали
+    -- день товара по очереди и видели изменения друг друга
+    PERFORM 1 FROM (
+        SELECT d.product_id FROM sales_daily d
+        JOIN unnest(p_product_ids, p_dates) AS k(product_id, sale_date)
+            ON d.product_id = k.product_id AND d.sale_date = k.sale_date
+        ORDER BY d.product_id, d.sale_date
+        FOR UPDATE OF d
+    ) locked;
+    
+    -- Дни, в которых продаж не осталось
+    DELETE FROM sales_daily d
+    USING unnest(p_product_ids, p_dates) AS k(product_id, sale_date)
+    WHERE d.product_id = k.product_id AND d.sale_date = k.sale_date
+        AND NOT EXISTS (
+            SELECT 1 FROM sales s
+            WHERE s.product_id = k.product_id
+                AND s.sale_date >= k.sale_date AND s.sale_date < k.sale_date + 1
+        );
+    
+    INSERT INTO sales_daily (product_id, sale_date, quantity, total_amount, sales_count, updated_at)
+    SELECT s.product_id, k.sale_date, SUM(s.quantity), SUM(s.total_amount), COUNT(*), CURRENT_TIMESTAMP
+    FROM (
+        SELECT DISTINCT product_id, sale_date
+        FROM unnest(p_product_ids, p_dates) AS keys(product_id, sale_date)
+    ) k
+    JOIN sales s ON s.product_id = k.product_id
+        AND s.sale_date >= k.sale_date AND s.sale_date < k.sale_date + 1
+    GROUP BY s.product_id, k.sale_date
+    ON CONFLICT (product_id, sale_date) DO UPDATE SET
+        quantity = EXCLUDED.quantity,
+        total_amount = EXCLUDED.total_amount,
+        sales_count = EXCLUDED.sales_count,
+        updated_at = EXCLUDED.updated_at;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE OR REPLACE FUNCTION sync_sales_daily()
+RETURNS TRIGGER AS $$
+DECLARE
+    v_product_ids UUID[];
+    v_dates DATE[];
+BEGIN
+    -- Оба массива упорядочены одинаково: элементы с одним индексом - пара
+    IF TG_OP = 'INSERT' THEN
+        SELECT array_agg(product_id ORDER BY product_id, sale_date),
+               array_agg(sale_date ORDER BY product_id, sale_date)
+        INTO v_product_ids, v_dates
+        FROM (SELECT DISTINCT product_id, sale_date::date AS sale_date FROM new_rows) k;
+    ELSIF TG_OP = 'DELETE' THEN
+        SELECT array_agg(product_id ORDER BY product_id, sale_date),
+               array_agg(sale_date ORDER BY product_id, sale_date)
+        INTO v_product_ids, v_dates
+        FROM (SELECT DISTINCT product_id, sale_date::date AS sale_date FROM old_rows) k;
+    ELSE
+        SELECT array_agg(product_id ORDER BY product_id, sale_date),
+               array_agg(sale_date ORDER BY product_id, sale_date)
+        INTO v_product_ids, v_dates
+        FROM (
+            SELECT product_id, sale_date::date AS sale_date FROM new_rows
+            UNION
+            SELECT product_id, sale_date::date FROM old_rows
+        ) k;
+    END IF;
+    PERFORM refresh_sales_daily(v_product_ids, v_dates);
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS sales_daily_insert ON sales;
+CREATE TRIGGER sales_daily_insert
+    AFTER INSERT ON sales
+    REFERENCING NEW TABLE AS new_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION sync_sales_daily();
+
+DROP TRIGGER IF EXISTS sales_daily_update ON sales;
+CREATE TRIGGER sales_daily_update
+    AFTER UPDATE ON sales
+    REFERENCING OLD TABLE AS old_rows NEW TABLE AS new_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION sync_sales_daily();
+
+DROP TRIGGER IF EXISTS sales_daily_delete ON sales;
+CREATE TRIGGER sales_daily_delete
+    AFTER DELETE ON sales
+    REFERENCING OLD TABLE AS old_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION sync_sales_daily();
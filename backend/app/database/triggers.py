@@ -0,0 +1,77 @@
+"""
+Триггеры и функции базы данных, которые не описываются моделями.
+
+DDL хранится в app/database/sql и устанавливается после
+Base.metadata.create_all. Базы, созданные SQL-миграциями, получают те же
+файлы через \\ir в миграциях database/migrations
+(004_product_stock_summary.sql, 005_category_closure.sql,
+007_salesdrive_orders.sql, 009_data_versions.sql).
+"""
+
+from pathlib import Path
+
+from sqlalchemy import event
+
+from .models import Base, ProductStockSummary, CategoryClosure, SalesDaily, DataVersion
+
+
+# Файлы с DDL функций и триггеров (общие с SQL-миграциями)
+SQL_DIR = Path(__file__).parent / "sql"
+
+
+def load_sql(name: str) -> str:
+    """Чтение DDL из app/database/sql."""
+    return (SQL_DIR / name).read_text(encoding="utf-8")
+
+
+# Сводные остатки товаров (product_stock_summary)
+PRODUCT_STOCK_SUMMARY_DDL = load_sql("product_stock_summary.sql")
+
+PRODUCT_STOCK_SUMMARY_BACKFILL = """
+SELECT refresh_product_stock_summary(ARRAY(SELECT id FROM products));
+"""
+
+
+# Замыкание иерархии категорий (category_closure)
+CATEGORY_CLOSURE_DDL = load_sql("category_closure.sql")
+
+CATEGORY_CLOSURE_BACKFILL = """
+SELECT rebuild_category_closure();
+"""
+
+
+# Продажи товаров по дням (sales_daily)
+SALES_DAILY_DDL = load_sql("sales_daily.sql")
+
+SALES_DAILY_BACKFILL = """
+SELECT refresh_sales_daily(
+    array_agg(product_id ORDER BY product_id, sale_date),
+    array_agg(sale_date ORDER BY product_id, sale_date)
+)
+FROM (SELECT DISTINCT product_id, sale_date::date AS sale_date FROM sales) k;
+"""
+
+
+# Версии данных для кеша ответов (data_versions); заполнять нечего -
+# строка версии создается первым изменением
+DATA_VERSIONS_DDL = load_sql("data_versions.sql")
+
+
+# Таблица, DDL функций и триггеров, заполнение при создании таблицы
+DATABASE_OBJECTS = [
+    (ProductStockSummary.__table__, PRODUCT_STOCK_SUMMARY_DDL, PRODUCT_STOCK_SUMMARY_BACKFILL),
+    (CategoryClosure.__table__, CATEGORY_CLOSURE_DDL, CATEGORY_CLOSURE_BACKFILL),
+    (SalesDaily.__table__, SALES_DAILY_DDL, SALES_DAILY_BACKFILL),
+    (DataVersion.__table__, DATA_VERSIONS_DDL, None),
+]
+
+
+@event.listens_for(Base.metadata, "after_create")
+def install_triggers(target, connection, tables=(), **kw):
+    """Установка триггеров после create_all (идемпотентно)."""
+    for table, ddl, backfill in DATABASE_OBJECTS:
+        connection.exec_driver_sql(ddl)
+        
+        # Таблица только что создана - заполняем по текущим данным
+        if backfill and table in tables:
+            connection.exec_driver_sql(backfill)
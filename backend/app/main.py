@@ -2,7 +2,9 @@
 Главный модуль FastAPI приложения для системы управления товарными остатками.
 """
 
+import asyncio
 import logging
+from contextlib import asynccontextmanager
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.middleware.trustedhost import TrustedHostMiddleware
@@ -10,6 +12,9 @@ from fastapi.middleware.trustedhost import TrustedHostMiddleware
 from app.core.config import settings
 from app.api.v1.router import api_router
 from app.core.database.init_db import init_database
+from app.api.v1.services.import_job_service import watch_import_jobs, shutdown_import_jobs
+from app.api.v1.services.salesdrive_service import start_salesdrive_client, close_salesdrive_client
+from app.api.v1.services.salesdrive_webhooks import watch_webhook_events
 # from app.api.middleware.logging import LoggingMiddleware
 # from app.api.middleware.error_handler import ErrorHandlerMiddleware
 
@@ -29,6 +34,21 @@ try:
 except Exception as e:
     logger.error(f"Ошибка инициализации базы данных: {e}")
 
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """Запуск и остановка фоновых задач приложения."""
+    # Возобновление прерванных задач импорта
+    import_jobs_watcher = asyncio.create_task(watch_import_jobs())
+    # Общий HTTP клиент SalesDrive с пулом соединений
+    await start_salesdrive_client()
+    # Обработка очереди webhook событий SalesDrive
+    webhook_watcher = asyncio.create_task(watch_webhook_events())
+    yield
+    import_jobs_watcher.cancel()
+    webhook_watcher.cancel()
+    shutdown_import_jobs()
+    await close_salesdrive_client()
+
 # Создание экземпляра приложения
 app = FastAPI(
     title=settings.APP_NAME,
@@ -36,7 +56,8 @@ app = FastAPI(
     description="Система управления товарными остатками с интеграцией SalesDrive API",
     openapi_url=f"{settings.API_V1_STR}/openapi.json",
     docs_url="/docs",
-    redoc_url="/redoc"
+    redoc_url="/redoc",
+    lifespan=lifespan
 )
 
 # Настройка CORS
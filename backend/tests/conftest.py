@@ -0,0 +1,107 @@
+"""
+Общие фикстуры тестов.
+
+Тесты с базой данных выполняются на PostgreSQL из переменной окружения
+TEST_DATABASE_URL: схема создается через create_all вместе с триггерами
+(app/database/triggers.py). Без переменной такие тесты пропускаются.
+"""
+
+import os
+
+import pytest
+from sqlalchemy import create_engine, text
+from sqlalchemy.orm import sessionmaker
+
+from app.database.models import Base, User, UserRole
+
+
+@pytest.fixture(scope="session")
+def db_engine():
+    """Движок тестовой базы данных со свежей схемой."""
+    url = os.getenv("TEST_DATABASE_URL")
+    if not url:
+        pytest.skip("Нет TEST_DATABASE_URL для тестов с базой данных")
+    
+    engine = create_engine(url)
+    Base.metadata.drop_all(engine)
+    Base.metadata.create_all(engine)
+    yield engine
+    Base.metadata.drop_all(engine)
+    engine.dispose()
+
+
+@pytest.fixture
+def db_session_factory(db_engine):
+    """Фабрика сессий; после теста все таблицы очищаются."""
+    factory = sessionmaker(bind=db_engine, autocommit=False, autoflush=False)
+    yield factory
+    
+    tables = ", ".join(table.name for table in Base.metadata.sorted_tables)
+    with db_engine.begin() as conn:
+        conn.execute(text(f"TRUNCATE {tables} CASCADE"))
+
+
+@pytest.fixture
+def db(db_session_factory):
+    """Сессия тестовой базы данных."""
+    session = db_session_factory()
+    yield session
+    session.rollback()
+    session.close()
+
+
+def make_user(db, username: str, role: UserRole = UserRole.ADMIN) -> User:
+    """Пользователь тестовой базы (отсоединен от сессии)."""
+    user = User(
+        username=username,
+        email=f"{username}@test.local",
+        hashed_password="-",
+        role=role,
+        is_active=True
+    )
+    db.add(user)
+    db.commit()
+    db.refresh(user)
+    db.expunge(user)
+    return user
+
+
+@pytest.fixture
+def api_client(db_session_factory, monkeypatch):
+    """
+    Клиент API на тестовой базе.
+    
+    Запросы выполняются от имени client.user (по умолчанию администратор).
+    Кеш ответов - локальный и пустой.
+    """
+    from fastapi.testclient import TestClient
+    
+    from app.main import app
+    from app.api.v1.dependencies import get_current_user
+    from app.core.cache import response_cache
+    from app.core.database.connection import get_db
+    
+    monkeypatch.setattr(response_cache, "_redis", None)
+    monkeypatch.setattr(response_cache, "_redis_retry_at", float("inf"))
+    response_cache.local.clear()
+    
+    def override_get_db():
+        session = db_session_factory()
+        try:
+            yield session
+        finally:
+            session.close()
+    
+    session = db_session_factory()
+    try:
+        admin = make_user(session, "admin")
+    finally:
+        session.close()
+    
+    client = TestClient(app)
+    client.user = admin
+    app.dependency_overrides[get_db] = override_get_db
+    app.dependency_overrides[get_current_user] = lambda: client.user
+    yield client
+    app.dependency_overrides.clear()
+    response_cache.local.clear()
@@ -0,0 +1,160 @@
+"""
+Тесты триггеров базы данных (app/database/sql).
+"""
+
+from datetime import datetime
+from decimal import Decimal
+
+from app.database.models import (
+    Product, Inventory, ProductStockSummary, Category, CategoryClosure,
+    Sale, SalesDaily
+)
+
+
+def _product(db, sku: str) -> Product:
+    product = Product(name=f"Товар {sku}", sku=sku, unit_price=Decimal("10.00"))
+    db.add(product)
+    db.flush()
+    return product
+
+
+class TestProductStockSummary:
+    """Сводные остатки товаров (product_stock_summary)."""
+    
+    def _summary(self, db, product_id) -> ProductStockSummary:
+        db.expire_all()
+        return db.get(ProductStockSummary, product_id)
+    
+    def test_new_product_has_empty_summary(self, db):
+        """Новый товар сразу получает строку сводки без остатков."""
+        product = _product(db, "SUM001")
+        
+        summary = self._summary(db, product.id)
+        
+        assert summary.total_quantity == 0
+        assert summary.locations_count == 0
+        assert summary.stock_status == "out_of_stock"
+    
+    def test_summary_follows_inventory(self, db):
+        """Вставка, изменение и удаление остатков пересчитывают сводку."""
+        product = _product(db, "SUM002")
+        main = Inventory(product_id=product.id, location="A", quantity=5, min_quantity=5)
+        extra = Inventory(product_id=product.id, location="B", quantity=3, min_quantity=4)
+        db.add_all([main, extra])
+        db.flush()
+        
+        summary = self._summary(db, product.id)
+        assert summary.total_quantity == 8
+        assert summary.min_quantity == 4
+        assert summary.locations_count == 2
+        assert summary.stock_status == "in_stock"
+        
+        main.quantity = 0
+        db.flush()
+        summary = self._summary(db, product.id)
+        assert summary.total_quantity == 3
+        assert summary.stock_status == "low_stock"
+        
+        db.delete(extra)
+        db.flush()
+        summary = self._summary(db, product.id)
+        assert summary.total_quantity == 0
+        assert summary.locations_count == 1
+        assert summary.stock_status == "out_of_stock"
+
+
+class TestCategoryClosure:
+    """Замыкание иерархии категорий (category_closure)."""
+    
+    def _category(self, db, name: str, parent: Category = None) -> Category:
+        category = Category(name=name, parent_id=parent.id if parent else None)
+        db.add(category)
+        db.flush()
+        return category
+    
+    def _ancestors(self, db, category: Category) -> dict:
+        rows = db.query(CategoryClosure).filter(
+            CategoryClosure.descendant_id == category.id
+        ).all()
+        return {row.ancestor_id: row.depth for row in rows}
+    
+    def test_insert_adds_paths_from_all_ancestors(self, db):
+        """Новая категория получает пути от себя и от всех предков."""
+        root = self._category(db, "Корень")
+        child = self._category(db, "Раздел", root)
+        leaf = self._category(db, "Подраздел", child)
+        
+        assert self._ancestors(db, leaf) == {leaf.id: 0, child.id: 1, root.id: 2}
+    
+    def test_move_carries_subtree(self, db):
+        """Смена родителя переносит все поддерево к новым предкам."""
+        old_root = self._category(db, "Старый корень")
+        new_root = self._category(db, "Новый корень")
+        child = self._category(db, "Раздел", old_root)
+        leaf = self._category(db, "Подраздел", child)
+        
+        child.parent_id = new_root.id
+        db.flush()
+        
+        assert self._ancestors(db, child) == {child.id: 0, new_root.id: 1}
+        assert self._ancestors(db, leaf) == {leaf.id: 0, child.id: 1, new_root.id: 2}
+        
+        # Перенос в корень удаляет все внешние пути
+        child.parent_id = None
+        db.flush()
+        
+        assert self._ancestors(db, leaf) == {leaf.id: 0, child.id: 1}
+
+
+class TestSalesDaily:
+    """Продажи товаров по дням (sales_daily)."""
+    
+    def _daily(self, db, product_id) -> dict:
+        db.expire_all()
+        rows = db.query(SalesDaily).filter(SalesDaily.product_id == product_id).all()
+        return {
+            row.sale_date.isoformat(): (row.quantity, row.total_amount, row.sales_count)
+            for row in rows
+        }
+    
+    def _sale(self, product: Product, quantity: int, sale_date: datetime) -> Sale:
+        return Sale(
+            product_id=product.id,
+            quantity=quantity,
+            unit_price=Decimal("10.00"),
+            total_amount=Decimal("10.00") * quantity,
+            sale_date=sale_date
+        )
+    
+    def test_daily_totals_follow_sales(self, db):
+        """Вставка, изменение и удаление продаж пересчитывают дни."""
+        product = _product(db, "DAY001")
+        morning = self._sale(product, 2, datetime(2026, 3, 1, 9, 0))
+        evening = self._sale(product, 3, datetime(2026, 3, 1, 21, 30))
+        next_day = self._sale(product, 1, datetime(2026, 3, 2, 0, 0))
+        db.add_all([morning, evening, next_day])
+        db.flush()
+        
+        assert self._daily(db, product.id) == {
+            "2026-03-01": (5, Decimal("50.00"), 2),
+            "2026-03-02": (1, Decimal("10.00"), 1),
+        }
+        
+        # Перенос продажи на другой день пересчитывает оба дня
+        evening.sale_date = datetime(2026, 3, 2, 12, 0)
+        evening.quantity = 4
+        evening.total_amount = Decimal("40.00")
+        db.flush()
+        
+        assert self._daily(db, product.id) == {
+            "2026-03-01": (2, Decimal("20.00"), 1),
+            "2026-03-02": (5, Decimal("50.00"), 2),
+        }
+        
+        # День без продаж удаляется из сводки
+        db.delete(morning)
+        db.flush()
+        
+        assert self._daily(db, product.id) == {
+            "2026-03-02": (5, Decimal("50.00"), 2),
+        }
@@ -0,0 +1,85 @@
+"""
+Тесты потоковой выгрузки (app/api/v1/services/export_service.py).
+"""
+
+import csv
+import io
+from decimal import Decimal
+
+import pyarrow as pa
+import pyarrow.parquet as pq
+import pytest
+
+from app.api.v1.services import export_service
+from app.database.models import Inventory, Product
+
+
+EXPORTS_URL = "/api/v1/exports"
+
+
+@pytest.fixture
+def export_sessions(db_session_factory, monkeypatch):
+    """Сессии, открытые генераторами выгрузки, и число их закрытий."""
+    sessions = []
+    closed = []
+    
+    def session_factory():
+        session = db_session_factory()
+        close = session.close
+        
+        def tracked_close():
+            closed.append(session)
+            close()
+        
+        session.close = tracked_close
+        sessions.append(session)
+        return session
+    
+    monkeypatch.setattr(export_service, "SessionLocal", session_factory)
+    return sessions, closed
+
+
+@pytest.fixture
+def products(db):
+    for index in range(3):
+        product = Product(name=f"Товар {index}", sku=f"EXP{index}", unit_price=Decimal("12.50"))
+        db.add(product)
+        db.flush()
+        db.add(Inventory(product_id=product.id, location="A", quantity=index))
+    db.commit()
+
+
+class TestStreamingSession:
+    """Генераторы выгрузки читают строки в собственной сессии."""
+    
+    def test_csv(self, api_client, products, export_sessions):
+        sessions, closed = export_sessions
+        
+        response = api_client.get(f"{EXPORTS_URL}/products")
+        
+        assert response.status_code == 200
+        rows = list(csv.DictReader(io.StringIO(response.content.decode("utf-8-sig"))))
+        assert [row["sku"] for row in rows] == ["EXP0", "EXP1", "EXP2"]
+        assert len(sessions) == 1
+        assert closed == sessions
+    
+    def test_parquet(self, api_client, products, export_sessions):
+        sessions, closed = export_sessions
+        
+        response = api_client.get(f"{EXPORTS_URL}/inventory", params={"format": "parquet"})
+        
+        assert response.status_code == 200
+        table = pq.read_table(pa.BufferReader(response.content))
+        assert table.column("quantity").to_pylist() == [0, 1, 2]
+        assert closed == sessions
+    
+    def test_workbook(self, api_client, products, export_sessions):
+        """Все листы книги читаются в одной сессии."""
+        sessions, closed = export_sessions
+        
+        response = api_client.get(f"{EXPORTS_URL}/workbook")
+        
+        assert response.status_code == 200
+        assert response.content[:2] == b"PK"
+        assert len(sessions) == 1
+        assert closed == sessions
@@ -0,0 +1,118 @@
+"""
+Тесты фоновых задач импорта (app/api/v1/services/import_job_service.py).
+"""
+
+import os
+
+from sqlalchemy import text
+
+from app.api.v1.services import import_job_service
+from app.core.config import settings
+from app.database.models import ImportJob, SyncStatus, UserRole
+
+from conftest import make_user
+
+
+IMPORTS_URL = "/api/v1/imports"
+
+
+def _create_job(db_session_factory, user_id, status=SyncStatus.IDLE, age_seconds: int = 0):
+    """Задача импорта, последний раз обновленная age_seconds назад."""
+    db = db_session_factory()
+    try:
+        job = ImportJob(
+            source="csv",
+            file_name="products.csv",
+            file_path="/nonexistent/products.csv",
+            file_format="csv",
+            status=status,
+            created_by=user_id
+        )
+        db.add(job)
+        db.flush()
+        db.execute(
+            text("UPDATE import_jobs SET updated_at = now() - make_interval(secs => :age) WHERE id = :id"),
+            {"age": age_seconds, "id": job.id}
+        )
+        db.commit()
+        return job.id
+    finally:
+        db.close()
+
+
+class _RecordingExecutor:
+    """Пул, который только запоминает поставленные задачи."""
+    
+    def __init__(self):
+        self.submitted = []
+    
+    def submit(self, fn, job_id):
+        self.submitted.append(job_id)
+
+
+class TestGetImport:
+    """Доступ к статусу задачи."""
+    
+    def test_owner_and_admin_see_job(self, api_client, db_session_factory):
+        job_id = _create_job(db_session_factory, api_client.user.id)
+        
+        assert api_client.get(f"{IMPORTS_URL}/{job_id}").status_code == 200
+    
+    def test_foreign_job_not_found(self, api_client, db_session_factory):
+        """Менеджер не видит чужую задачу, администратор видит."""
+        admin = api_client.user
+        job_id = _create_job(db_session_factory, admin.id)
+        
+        session = db_session_factory()
+        try:
+            api_client.user = make_user(session, "manager", UserRole.MANAGER)
+        finally:
+            session.close()
+        assert api_client.get(f"{IMPORTS_URL}/{job_id}").status_code == 404
+        
+        api_client.user = admin
+        assert api_client.get(f"{IMPORTS_URL}/{job_id}").status_code == 200
+
+
+class TestCreateImport:
+    """Загрузка файла задачи."""
+    
+    def test_file_too_large(self, api_client, monkeypatch, tmp_path):
+        """Файл больше MAX_FILE_SIZE отклоняется, копия на диске удаляется."""
+        monkeypatch.setattr(settings, "UPLOAD_DIR", str(tmp_path))
+        monkeypatch.setattr(settings, "MAX_FILE_SIZE", 10)
+        
+        response = api_client.post(
+            f"{IMPORTS_URL}/products",
+            files={"file": ("products.csv", b"sku,name\n" * 10, "text/csv")}
+        )
+        
+        assert response.status_code == 413
+        assert os.listdir(tmp_path / "imports") == []
+
+
+class TestResumeImportJobs:
+    """Возобновление ожидающих и прерванных задач."""
+    
+    def test_only_stale_jobs_resumed_once(self, api_client, db_session_factory, monkeypatch):
+        user_id = api_client.user.id
+        stale = settings.IMPORT_JOB_STALE_SECONDS + 60
+        fresh_idle = _create_job(db_session_factory, user_id)
+        stale_idle = _create_job(db_session_factory, user_id, age_seconds=stale)
+        fresh_running = _create_job(db_session_factory, user_id, SyncStatus.RUNNING)
+        stale_running = _create_job(db_session_factory, user_id, SyncStatus.RUNNING, stale)
+        _create_job(db_session_factory, user_id, SyncStatus.SUCCESS, stale)
+        
+        executor = _RecordingExecutor()
+        monkeypatch.setattr(import_job_service, "SessionLocal", db_session_factory)
+        monkeypatch.setattr(import_job_service, "_executor", executor)
+        monkeypatch.setattr(import_job_service, "_queued_jobs", set())
+        
+        assert import_job_service.resume_import_jobs() == 2
+        assert set(executor.submitted) == {stale_idle, stale_running}
+        assert fresh_idle not in executor.submitted
+        assert fresh_running not in executor.submitted
+        
+        # Задачи еще в очереди процесса - повторно не ставятся
+        assert import_job_service.resume_import_jobs() == 0
+        assert len(executor.submitted) == 2
@@ -0,0 +1,135 @@
+"""
+Тесты параллельного разбора CSV (app/api/v1/services/import_parallel.py).
+"""
+
+import io
+
+import pytest
+
+from app.api.v1.services import import_parallel
+from app.api.v1.services.import_parallel import (
+    ParallelFileReader, _parse_csv_range, _record_end, shutdown_parse_pool
+)
+from app.api.v1.services.import_readers import iter_file_rows
+from app.core.config import settings
+
+
+# Описания с переводами строк и экранированными кавычками внутри кавычек
+CSV = "".join(
+    [
+        "Остатки на складе\n",
+        "\n",
+        "sku;name;description\n",
+    ] + [
+        f'SKU{index};Товар {index};"Строка 1\nСтрока 2 ""в кавычках"";\n{index}"\n'
+        if index % 3 == 0 else f"SKU{index};Товар {index};Без описания\n"
+        for index in range(60)
+    ]
+).encode("utf-8")
+
+
+@pytest.fixture
+def csv_path(tmp_path):
+    path = tmp_path / "products.csv"
+    path.write_bytes(CSV)
+    return str(path)
+
+
+@pytest.fixture
+def small_chunks(monkeypatch):
+    """Части и порции чтения меньше одной записи."""
+    monkeypatch.setattr(settings, "IMPORT_PARSE_CHUNK_SIZE", 50)
+    monkeypatch.setattr(import_parallel, "READ_CHUNK_SIZE", 7)
+
+
+def _sequential_rows(path: str):
+    with open(path, "rb") as stream:
+        return list(iter_file_rows(stream, "csv"))
+
+
+class TestRecordEnd:
+    """Граница записи с учетом кавычек."""
+    
+    def test_newline_inside_quotes_skipped(self, small_chunks):
+        data = b'a;"x\ny"\nb;z\n'
+        
+        # target внутри кавычек - граница после закрывающей кавычки
+        assert _record_end(io.BytesIO(data), 0, 3, len(data)) == data.index(b"\nb") + 1
+    
+    def test_escaped_quote_keeps_parity(self, small_chunks):
+        data = b'a;"x ""q""\ny"\nb;z\n'
+        
+        assert _record_end(io.BytesIO(data), 0, 5, len(data)) == data.index(b"\nb") + 1
+    
+    def test_target_past_end(self):
+        data = b"a;b\n"
+        
+        assert _record_end(io.BytesIO(data), 0, 10, len(data)) == len(data)
+    
+    def test_last_record_without_newline(self, small_chunks):
+        data = b'a;b\nc;"d\ne'
+        
+        assert _record_end(io.BytesIO(data), 4, 5, len(data)) == len(data)
+
+
+class TestCsvRanges:
+    """Деление CSV на части."""
+    
+    def test_ranges_cover_file(self, csv_path, small_chunks):
+        reader = ParallelFileReader(csv_path, "csv")
+        tasks = list(reader._csv_tasks())
+        
+        assert len(tasks) > 5
+        starts = [args[2] for _, args, _ in tasks]
+        ends = [args[3] for _, args, _ in tasks]
+        assert starts[1:] == ends[:-1]
+        assert ends[-1] == len(CSV) == tasks[-1][2]
+        
+        # Каждая часть начинается с новой записи
+        header = tasks[0][1][1]
+        assert header.endswith(b"sku;name;description\n")
+        assert all(CSV[start:start + 3] == b"SKU" for start in starts)
+    
+    def test_parts_match_sequential_read(self, csv_path, small_chunks):
+        reader = ParallelFileReader(csv_path, "csv")
+        
+        rows = [
+            row
+            for function, args, _ in reader._csv_tasks()
+            for row in function(*args)
+        ]
+        
+        assert rows == _sequential_rows(csv_path)
+        assert len(rows) == 60
+        assert rows[3]["description"] == 'Строка 1\nСтрока 2 "в кавычках";\n3'
+    
+    def test_utf16_not_split(self, tmp_path, small_chunks):
+        """UTF-16 читается последовательно."""
+        path = tmp_path / "products.csv"
+        path.write_bytes(CSV.decode("utf-8").encode("utf-16"))
+        
+        assert ParallelFileReader(str(path), "csv")._csv_tasks() is None
+
+
+class TestParallelFileReader:
+    """Чтение в пуле процессов."""
+    
+    def test_rows_in_file_order(self, csv_path, monkeypatch):
+        monkeypatch.setattr(settings, "IMPORT_PARSE_WORKERS", 2)
+        monkeypatch.setattr(settings, "IMPORT_PARSE_CHUNK_SIZE", 200)
+        reader = ParallelFileReader(csv_path, "csv")
+        try:
+            rows = list(reader)
+        finally:
+            shutdown_parse_pool()
+        
+        assert rows == _sequential_rows(csv_path)
+        assert reader.position == len(CSV)
+    
+    def test_parse_error_in_part(self, tmp_path):
+        """Ошибка разбора части передается из процесса пула как ImportParseError."""
+        path = tmp_path / "broken.csv"
+        path.write_bytes(b"sku;name\nA;\xff\xfe\n")
+        
+        with pytest.raises(import_parallel.ImportParseError):
+            _parse_csv_range(str(path), b"sku;name\n", 9, 14, import_parallel.CsvFormat("utf-8", ";"))
@@ -0,0 +1,87 @@
+"""
+Тесты определения формата CSV (app/api/v1/services/import_readers.py).
+"""
+
+import codecs
+import io
+
+import pytest
+
+from app.api.v1.services.import_readers import (
+    DIALECT_SAMPLE_SIZE, CsvFormat, detect_encoding, iter_csv_rows, sniff_csv
+)
+
+
+ROWS = (
+    "Артикул;Наименование;Цена\n"
+    "A001;Молоко пастеризованное;89,90\n"
+    "A002;Хлеб ржаной;45,00\n"
+    "A003;Сыр твердый, 45%;520,00\n"
+)
+
+
+class TestEncoding:
+    """Определение кодировки."""
+    
+    @pytest.mark.parametrize("bom, encoding", [
+        (codecs.BOM_UTF8, "utf-8-sig"),
+        (codecs.BOM_UTF16_LE, "utf-16"),
+    ])
+    def test_bom(self, bom, encoding):
+        assert detect_encoding(bom + b"sku,name\n") == encoding
+    
+    def test_utf8(self):
+        assert detect_encoding(ROWS.encode("utf-8")) == "utf-8"
+    
+    def test_utf8_cut_in_middle_of_char(self):
+        """Образец, обрезанный посередине символа, остается UTF-8."""
+        assert detect_encoding(ROWS.encode("utf-8")[:-2]) == "utf-8"
+    
+    @pytest.mark.parametrize("encoding", ["cp1251", "koi8-r"])
+    def test_cyrillic_single_byte(self, encoding):
+        assert detect_encoding(ROWS.encode(encoding)) == encoding
+    
+    def test_western_european(self):
+        """Отдельные акцентированные буквы в латинских словах - latin1."""
+        sample = "sku,name\nA1,Café crème\nA2,Über größe\n".encode("latin1")
+        assert detect_encoding(sample) == "latin1"
+
+
+class TestSniffCsv:
+    """Разделитель и строка заголовка."""
+    
+    def test_semicolon_with_commas_in_values(self):
+        """Запятые внутри значений не перебивают точку с запятой."""
+        assert sniff_csv(ROWS.encode("cp1251")) == CsvFormat("cp1251", ";", 0)
+    
+    def test_comma(self):
+        sample = b'sku,name,price\nA1,"Milk; 1l",10\nA2,Bread,5\n'
+        assert sniff_csv(sample) == CsvFormat("utf-8", ",", 0)
+    
+    def test_bom_with_tabs(self):
+        sample = codecs.BOM_UTF8 + ROWS.replace(";", "\t").encode("utf-8")
+        assert sniff_csv(sample) == CsvFormat("utf-8-sig", "\t", 0)
+    
+    def test_header_offset(self):
+        """Строки отчета перед заголовком пропускаются."""
+        sample = ("Остатки на складе\nПериод: январь\n\n" + ROWS).encode("cp1251")
+        assert sniff_csv(sample) == CsvFormat("cp1251", ";", 3)
+    
+    def test_truncated_last_line_ignored(self):
+        """Обрезанная последняя строка длинного образца не влияет на результат."""
+        line = "A001;Молоко пастеризованное;89,90\n"
+        rows = line * (DIALECT_SAMPLE_SIZE // len(line.encode("utf-8")) + 10)
+        sample = ("Артикул;Наименование;Цена\n" + rows).encode("utf-8")
+        assert sniff_csv(sample[:DIALECT_SAMPLE_SIZE + 100]) == CsvFormat("utf-8", ";", 0)
+
+
+class TestIterCsvRows:
+    """Чтение строк по определенному формату."""
+    
+    def test_report_in_cp1251(self):
+        stream = io.BytesIO(("Остатки на складе\n\n" + ROWS).encode("cp1251"))
+        
+        rows = list(iter_csv_rows(stream))
+        
+        assert [row["Артикул"] for row in rows] == ["A001", "A002", "A003"]
+        assert rows[2]["Наименование"] == "Сыр твердый, 45%"
@@ -0,0 +1,113 @@
+"""
+Тесты импорта товаров из файла (app/api/v1/services/import_service.py).
+"""
+
+import io
+from decimal import Decimal
+
+import pytest
+
+from app.api.v1.schemas.import_data import ImportResult
+from app.api.v1.services.import_service import ImportService
+from app.core.config import settings
+from app.database.models import Product
+
+from conftest import make_user
+
+
+# Строки 1-5: существующий товар, новый товар дважды (в разных пакетах
+# предварительного просмотра) и строка без названия
+CSV = (
+    "sku,name,unit_price\n"
+    "EXIST,Существующий,10\n"
+    "NEW1,Первая строка,20\n"
+    "NEW1,Последняя строка,30\n"
+    "BAD,,40\n"
+    "NEW2,Новый,50\n"
+).encode("utf-8")
+
+
+@pytest.fixture
+def existing_product(db):
+    db.add(Product(name="Было", sku="EXIST", unit_price=Decimal("1.00")))
+    db.commit()
+
+
+def _result() -> ImportResult:
+    return ImportResult(
+        total_items=0,
+        processed_items=0,
+        created_items=0,
+        updated_items=0,
+        failed_items=0
+    )
+
+
+class TestPreview:
+    """Предварительный просмотр (dry-run)."""
+    
+    @pytest.fixture(autouse=True)
+    def small_batches(self, monkeypatch):
+        monkeypatch.setattr(settings, "IMPORT_PREVIEW_BATCH_SIZE", 2)
+    
+    def test_update_existing(self, db, existing_product):
+        """Существующий товар и повтор артикула - обновления, а не ошибки."""
+        preview = ImportService(db).preview_products_stream(io.BytesIO(CSV), "csv", True)
+        
+        assert preview.total_rows == 5
+        assert preview.invalid_rows == 1
+        assert preview.valid_rows == 4
+        assert [error.row for error in preview.validation_errors] == [4]
+        assert preview.update_rows == 2
+        assert preview.skipped_rows == 0
+        assert [(notice.row, notice.value) for notice in preview.notices] == [
+            (1, "EXIST"), (3, "NEW1")
+        ]
+        assert "последняя строка" in preview.notices[1].error
+    
+    def test_without_update_existing(self, db, existing_product):
+        """Без update_existing такие строки пропускаются."""
+        preview = ImportService(db).preview_products_stream(io.BytesIO(CSV), "csv", False)
+        
+        assert preview.invalid_rows == 1
+        assert preview.update_rows == 0
+        assert preview.skipped_rows == 2
+        assert [notice.row for notice in preview.notices] == [1, 3]
+
+
+class TestImportRows:
+    """Запись строк файла."""
+    
+    def _import(self, db, update_existing: bool) -> ImportResult:
+        user = make_user(db, "importer")
+        result = _result()
+        rows = [
+            {"sku": "EXIST", "name": "Существующий", "unit_price": "10"},
+            {"sku": "NEW1", "name": "Первая строка", "unit_price": "20"},
+            {"sku": "NEW1", "name": "Последняя строка", "unit_price": "30"},
+        ]
+        ImportService(db).import_products_rows(rows, user.id, result, update_existing=update_existing)
+        return result
+    
+    def _names(self, db) -> dict:
+        db.expire_all()
+        return {product.sku: product.name for product in db.query(Product)}
+    
+    def test_duplicate_in_batch_last_wins(self, db, existing_product):
+        """С update_existing повтор артикула в пакете записывает последнюю строку."""
+        result = self._import(db, update_existing=True)
+        
+        assert result.failed_items == 0
+        assert result.processed_items == 3
+        assert result.created_items == 1
+        assert result.updated_items == 1
+        assert self._names(db) == {"EXIST": "Существующий", "NEW1": "Последняя строка"}
+    
+    def test_duplicate_in_batch_first_wins(self, db, existing_product):
+        """Без update_existing повтор и существующий товар пропускаются."""
+        result = self._import(db, update_existing=False)
+        
+        assert result.failed_items == 0
+        assert result.created_items == 1
+        assert len(result.warnings) == 2
+        assert self._names(db) == {"EXIST": "Было", "NEW1": "Первая строка"}
@@ -0,0 +1,157 @@
+"""
+Тесты ETag и кеша ответов (app/core/cache.py).
+"""
+
+from decimal import Decimal
+
+from sqlalchemy import text
+
+from app.database.models import Product, Inventory, Supplier, Category
+
+
+PRODUCTS_URL = "/api/v1/products"
+TREE_URL = "/api/v1/categories/tree"
+
+
+def _seed(db_session_factory, sku: str = "ETAG001"):
+    """Товар с поставщиком, категорией и остатком."""
+    db = db_session_factory()
+    try:
+        supplier = Supplier(name=f"Поставщик {sku}")
+        category = Category(name=f"Категория {sku}")
+        db.add_all([supplier, category])
+        db.flush()
+        product = Product(
+            name="Товар",
+            sku=sku,
+            unit_price=Decimal("10.00"),
+            supplier_id=supplier.id,
+            category_id=category.id
+        )
+        db.add(product)
+        db.flush()
+        db.add(Inventory(product_id=product.id, location="A", quantity=5))
+        db.commit()
+        return product.id
+    finally:
+        db.close()
+
+
+def _execute(db_session_factory, sql: str) -> None:
+    """Запись в обход сервисов отдельной транзакцией."""
+    db = db_session_factory()
+    try:
+        db.execute(text(sql))
+        db.commit()
+    finally:
+        db.close()
+
+
+def _quantities(body) -> dict:
+    return {item["sku"]: item["total_quantity"] for item in body["items"]}
+
+
+class TestConditionalGet:
+    """Условные запросы с If-None-Match."""
+    
+    def test_matching_etag_returns_304(self, api_client, db_session_factory):
+        """Повторный запрос с тем же ETag получает 304 без тела."""
+        _seed(db_session_factory)
+        
+        first = api_client.get(PRODUCTS_URL)
+        assert first.status_code == 200
+        etag = first.headers["ETag"]
+        
+        second = api_client.get(PRODUCTS_URL, headers={"If-None-Match": etag})
+        assert second.status_code == 304
+        assert second.headers["ETag"] == etag
+        assert second.content == b""
+    
+    def test_etag_depends_on_query(self, api_client, db_session_factory):
+        """ETag одной страницы не подходит для другой."""
+        _seed(db_session_factory)
+        
+        etag = api_client.get(PRODUCTS_URL).headers["ETag"]
+        other = api_client.get(f"{PRODUCTS_URL}?size=5", headers={"If-None-Match": etag})
+        
+        assert other.status_code == 200
+        assert other.headers["ETag"] != etag
+    
+    def test_category_tree_returns_304(self, api_client, db_session_factory):
+        """Дерево категорий тоже отвечает 304 на совпадающий ETag."""
+        _seed(db_session_factory)
+        
+        etag = api_client.get(TREE_URL).headers["ETag"]
+        response = api_client.get(TREE_URL, headers={"If-None-Match": etag})
+        
+        assert response.status_code == 304
+
+
+class TestInvalidation:
+    """Смена ETag при изменении данных."""
+    
+    def _refetch(self, api_client, url: str, etag: str):
+        response = api_client.get(url, headers={"If-None-Match": etag})
+        assert response.status_code == 200
+        assert response.headers["ETag"] != etag
+        return response.json()
+    
+    def test_write_bypassing_services(self, api_client, db_session_factory):
+        """Изменение поставщика SQL-запросом меняет ETag списка."""
+        _seed(db_session_factory)
+        etag = api_client.get(PRODUCTS_URL).headers["ETag"]
+        
+        _execute(db_session_factory, "UPDATE suppliers SET name = 'Новый поставщик'")
+        
+        body = self._refetch(api_client, PRODUCTS_URL, etag)
+        assert body["items"][0]["supplier"]["name"] == "Новый поставщик"
+    
+    def test_hard_delete(self, api_client, db_session_factory):
+        """Удаление остатков в обход сервисов меняет ETag списка."""
+        _seed(db_session_factory)
+        etag = api_client.get(PRODUCTS_URL).headers["ETag"]
+        
+        _execute(db_session_factory, "DELETE FROM inventory")
+        
+        body = self._refetch(api_client, PRODUCTS_URL, etag)
+        assert body["items"][0]["total_quantity"] == 0
+    
+    def test_product_count_changes_tree(self, api_client, db_session_factory):
+        """Перенос товара в другую категорию меняет ETag дерева."""
+        _seed(db_session_factory)
+        etag = api_client.get(TREE_URL).headers["ETag"]
+        
+        _execute(db_session_factory, "UPDATE products SET category_id = NULL")
+        
+        tree = self._refetch(api_client, TREE_URL, etag)
+        assert tree[0]["products_count"] == 0
+    
+    def test_long_transaction_committed_later(self, api_client, db_session_factory):
+        """
+        Транзакция, начатая раньше, но зафиксированная позже другой, тоже
+        меняет ETag.
+        """
+        product_id = _seed(db_session_factory, "ETAG001")
+        _seed(db_session_factory, "ETAG002")
+        long_tx = db_session_factory()
+        try:
+            long_tx.execute(
+                text("UPDATE inventory SET quantity = 42 WHERE product_id = :id"),
+                {"id": product_id}
+            )
+            
+            # Более поздняя запись в ту же таблицу фиксируется первой
+            _execute(
+                db_session_factory,
+                f"UPDATE inventory SET quantity = 2 WHERE product_id <> '{product_id}'"
+            )
+            response = api_client.get(PRODUCTS_URL)
+            etag = response.headers["ETag"]
+            assert _quantities(response.json()) == {"ETAG001": 5, "ETAG002": 2}
+            
+            long_tx.commit()
+        finally:
+            long_tx.close()
+        
+        body = self._refetch(api_client, PRODUCTS_URL, etag)
+        assert _quantities(body) == {"ETAG001": 42, "ETAG002": 2}
@@ -0,0 +1,223 @@
+"""
+Тесты ограничения запросов к SalesDrive API (app/api/v1/services/salesdrive_limits.py).
+"""
+
+import asyncio
+from email.utils import formatdate
+
+import pytest
+
+from app.api.v1.services import salesdrive_limits
+from app.api.v1.services.salesdrive_limits import (
+    CircuitBreaker, RequestMetrics, TokenBucket, retry_after_seconds
+)
+
+
+class FakeClock:
+    """Часы, которые двигает тест (time.monotonic и time.time)."""
+    
+    def __init__(self):
+        self.now = 1000.0
+    
+    def monotonic(self) -> float:
+        return self.now
+    
+    def time(self) -> float:
+        return 1_700_000_000.0 + self.now
+    
+    def advance(self, seconds: float) -> None:
+        self.now += seconds
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = FakeClock()
+    monkeypatch.setattr(salesdrive_limits, "time", clock)
+    return clock
+
+
+class TestRetryAfter:
+    """Разбор заголовка Retry-After."""
+    
+    def test_seconds(self):
+        assert retry_after_seconds({"Retry-After": "12"}, default=60) == 12
+    
+    def test_negative_seconds(self):
+        assert retry_after_seconds({"Retry-After": "-5"}, default=60) == 0
+    
+    def test_http_date(self, clock):
+        value = formatdate(clock.time() + 30, usegmt=True)
+        assert retry_after_seconds({"Retry-After": value}, default=60) == pytest.approx(30, abs=1)
+    
+    def test_date_in_past(self, clock):
+        value = formatdate(clock.time() - 30, usegmt=True)
+        assert retry_after_seconds({"Retry-After": value}, default=60) == 0
+    
+    @pytest.mark.parametrize("headers", [{}, {"Retry-After": "завтра"}])
+    def test_missing_or_invalid(self, headers):
+        assert retry_after_seconds(headers, default=60) == 60
+
+
+class TestTokenBucket:
+    """Маркерная корзина."""
+    
+    def test_burst_then_rate(self, clock):
+        """После простоя проходит capacity запросов, дальше - по rate в секунду."""
+        bucket = TokenBucket(rate=2, capacity=3)
+        
+        assert [bucket._try_acquire() for _ in range(3)] == [0, 0, 0]
+        assert bucket._try_acquire() == pytest.approx(0.5)
+        
+        clock.advance(0.5)
+        assert bucket._try_acquire() == 0
+    
+    def test_refill_capped_by_capacity(self, clock):
+        bucket = TokenBucket(rate=10, capacity=2)
+        bucket._try_acquire()
+        bucket._try_acquire()
+        
+        clock.advance(60)
+        assert [bucket._try_acquire() for _ in range(2)] == [0, 0]
+        assert bucket._try_acquire() > 0
+    
+    def test_pause(self, clock):
+        bucket = TokenBucket(rate=10, capacity=5)
+        bucket.pause(4)
+        
+        assert bucket.paused_for() == 4
+        assert bucket._try_acquire() == 4
+        
+        # Более короткая пауза не сокращает текущую
+        bucket.pause(1)
+        assert bucket.paused_for() == 4
+        
+        clock.advance(4)
+        assert bucket._try_acquire() == 0
+    
+    def test_remaining_header_limits_tokens(self, clock):
+        bucket = TokenBucket(rate=1, capacity=10)
+        
+        bucket.update_from_headers({"X-RateLimit-Remaining": "2"})
+        
+        assert [bucket._try_acquire() for _ in range(2)] == [0, 0]
+        assert bucket._try_acquire() > 0
+    
+    @pytest.mark.parametrize("reset", ["15", str(int(1_700_000_000 + 1000 + 15))])
+    def test_exhausted_limit_pauses_until_reset(self, clock, reset):
+        """X-RateLimit-Reset - секунды до сброса или время Unix."""
+        bucket = TokenBucket(rate=1, capacity=10)
+        
+        bucket.update_from_headers({"X-RateLimit-Remaining": "0", "X-RateLimit-Reset": reset})
+        
+        assert bucket.paused_for() == pytest.approx(15)
+    
+    def test_without_headers_unchanged(self, clock):
+        bucket = TokenBucket(rate=1, capacity=3)
+        
+        bucket.update_from_headers({"X-RateLimit-Reset": "15"})
+        
+        assert bucket.paused_for() == 0
+        assert [bucket._try_acquire() for _ in range(3)] == [0, 0, 0]
+    
+    def test_concurrency_limit(self):
+        bucket = TokenBucket(rate=1000, capacity=1000, max_concurrency=2)
+        active = 0
+        peak = 0
+        
+        async def request():
+            nonlocal active, peak
+            await bucket.acquire()
+            async with bucket.concurrency():
+                active += 1
+                peak = max(peak, active)
+                await asyncio.sleep(0.01)
+                active -= 1
+        
+        async def run():
+            await asyncio.gather(*(request() for _ in range(6)))
+        
+        asyncio.run(run())
+        assert peak == 2
+
+
+class TestCircuitBreaker:
+    """Переходы состояний выключателя."""
+    
+    def test_opens_after_threshold(self, clock):
+        breaker = CircuitBreaker(failure_threshold=3, reset_timeout=30)
+        
+        for _ in range(2):
+            assert breaker.before_request() is None
+            breaker.record_failure()
+        assert breaker.state == CircuitBreaker.CLOSED
+        
+        breaker.record_failure()
+        assert breaker.state == CircuitBreaker.OPEN
+        assert breaker.before_request() == 30
+    
+    def test_success_resets_failures(self, clock):
+        breaker = CircuitBreaker(failure_threshold=2)
+        
+        breaker.record_failure()
+        breaker.record_success()
+        breaker.record_failure()
+        
+        assert breaker.state == CircuitBreaker.CLOSED
+    
+    def test_half_open_single_probe(self, clock):
+        """После reset_timeout пропускается один пробный запрос."""
+        breaker = CircuitBreaker(failure_threshold=1, reset_timeout=30)
+        breaker.record_failure()
+        
+        clock.advance(30)
+        assert breaker.state == CircuitBreaker.HALF_OPEN
+        assert breaker.before_request() is None
+        assert breaker.before_request() == 1.0
+        
+        breaker.record_success()
+        assert breaker.state == CircuitBreaker.CLOSED
+        assert breaker.before_request() is None
+    
+    def test_failed_probe_reopens(self, clock):
+        breaker = CircuitBreaker(failure_threshold=5, reset_timeout=30)
+        for _ in range(5):
+            breaker.record_failure()
+        
+        clock.advance(30)
+        assert breaker.before_request() is None
+        breaker.record_failure()
+        
+        assert breaker.state == CircuitBreaker.OPEN
+        assert breaker.before_request() == 30
+    
+    def test_released_probe(self, clock):
+        """Пробный запрос, не дошедший до API, уступает место следующему."""
+        breaker = CircuitBreaker(failure_threshold=1, reset_timeout=30)
+        breaker.record_failure()
+        clock.advance(30)
+        
+        assert breaker.before_request() is None
+        breaker.release()
+        
+        assert breaker.before_request() is None
+        assert breaker.before_request() == 1.0
+
+
+class TestRequestMetrics:
+    """Метрики запросов по endpoint."""
+    
+    def test_endpoint_key_hides_ids(self):
+        assert RequestMetrics.endpoint_key("get", "/api/orders/123/items") == "GET /api/orders/{id}/{id}"
+    
+    def test_snapshot(self):
+        metrics = RequestMetrics()
+        metrics.record("GET /api/products", 0.1, 200)
+        metrics.record("GET /api/products", 0.3, None, error=True)
+        
+        stats = metrics.snapshot()["GET /api/products"]
+        
+        assert stats["requests"] == 2
+        assert stats["error_rate"] == 0.5
+        assert stats["avg_ms"] == 200.0
+        assert stats["max_ms"] == 300.0
+        assert stats["status_codes"] == {"200": 1, "network_error": 1}
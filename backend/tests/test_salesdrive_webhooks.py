@@ -0,0 +1,171 @@
+"""
+Тесты очереди webhook событий SalesDrive (app/api/v1/services/salesdrive_webhooks.py).
+"""
+
+import time
+from datetime import datetime, timedelta
+from types import SimpleNamespace
+
+import pytest
+from sqlalchemy import text
+
+from app.api.v1.schemas.salesdrive import SalesDriveWebhookEvent
+from app.api.v1.services import salesdrive_webhooks
+from app.api.v1.services.salesdrive_webhooks import (
+    PRODUCT_EVENTS, WEBHOOK_RETRY_BACKOFF, _drop_stale, _latest, enqueue_event, process_webhook_batch
+)
+from app.core.cache import response_cache
+from app.database.models import Product, SalesDriveWebhookEvent as WebhookEventModel, SyncStatus
+
+
+T0 = datetime(2026, 1, 1, 12, 0)
+
+
+def _product(sku: str, name: str, **fields) -> dict:
+    payload = {
+        "id": sku,
+        "sku": sku,
+        "name": name,
+        "price": "10.00",
+        "updated_at": T0.isoformat()
+    }
+    payload.update(fields)
+    return payload
+
+
+def _enqueue(db, event_id: str, payload: dict, minutes: int = 0, event_type: str = "product.updated"):
+    enqueue_event(db, SalesDriveWebhookEvent(
+        event_type=event_type,
+        event_id=event_id,
+        timestamp=T0 + timedelta(minutes=minutes),
+        data=payload
+    ))
+
+
+def _event(db, event_id: str) -> WebhookEventModel:
+    db.expire_all()
+    return db.query(WebhookEventModel).filter(WebhookEventModel.event_id == event_id).one()
+
+
+@pytest.fixture(autouse=True)
+def local_cache(monkeypatch):
+    """Кеш ответов без Redis."""
+    monkeypatch.setattr(response_cache, "_redis", None)
+    monkeypatch.setattr(response_cache, "_redis_retry_at", float("inf"))
+
+
+class TestLatest:
+    """Схлопывание событий одного объекта."""
+    
+    def test_later_event_wins(self):
+        events = {}
+        _latest(events, "A", SimpleNamespace(event_time=T0 + timedelta(minutes=1), payload="new"))
+        _latest(events, "A", SimpleNamespace(event_time=T0, payload="old"))
+        
+        assert events == {"A": (T0 + timedelta(minutes=1), "new")}
+    
+    def test_same_time_later_delivery_wins(self):
+        events = {}
+        _latest(events, "A", SimpleNamespace(event_time=T0, payload="first"))
+        _latest(events, "A", SimpleNamespace(event_time=T0, payload="second"))
+        
+        assert events["A"][1] == "second"
+    
+    def test_event_without_key_ignored(self):
+        events = {}
+        _latest(events, None, SimpleNamespace(event_time=T0, payload="x"))
+        
+        assert events == {}
+
+
+class TestDropStale:
+    """Отбрасывание событий старше примененных."""
+    
+    def test_older_than_applied_dropped(self, db):
+        _enqueue(db, "applied", _product("A", "Новое"), minutes=10)
+        db.query(WebhookEventModel).update({"status": SyncStatus.SUCCESS})
+        db.commit()
+        
+        events = {"A": (T0 + timedelta(minutes=5), {}), "B": (T0, {})}
+        _drop_stale(db, events, PRODUCT_EVENTS)
+        
+        assert list(events) == ["B"]
+    
+    def test_pending_events_not_applied(self, db):
+        """Незавершенные события не считаются примененными."""
+        _enqueue(db, "pending", _product("A", "Новое"), minutes=10)
+        
+        events = {"A": (T0, {})}
+        _drop_stale(db, events, PRODUCT_EVENTS)
+        
+        assert list(events) == ["A"]
+
+
+class TestProcessBatch:
+    """Обработка пакета событий."""
+    
+    def test_out_of_order_delivery(self, db):
+        """Событие, доставленное после более позднего, не откатывает товар."""
+        _enqueue(db, "e2", _product("A", "Новое"), minutes=10)
+        assert process_webhook_batch(db) == 1
+        
+        _enqueue(db, "e1", _product("A", "Старое"), minutes=5)
+        assert process_webhook_batch(db) == 1
+        
+        db.expire_all()
+        assert db.query(Product.name).filter(Product.sku == "A").scalar() == "Новое"
+        assert _event(db, "e1").status == SyncStatus.SUCCESS
+    
+    def test_failed_object_backs_off(self, db):
+        """Ошибка одного товара возвращает в очередь только его события."""
+        _enqueue(db, "good", _product("A", "Товар"))
+        bad = _product("B", "Без цены")
+        del bad["price"]
+        _enqueue(db, "bad", bad)
+        
+        before = datetime.utcnow()
+        assert process_webhook_batch(db) == 2
+        
+        assert _event(db, "good").status == SyncStatus.SUCCESS
+        failed = _event(db, "bad")
+        assert failed.status == SyncStatus.IDLE
+        assert failed.attempts == 1
+        assert failed.processed_at is None
+        assert failed.next_attempt_at >= before + WEBHOOK_RETRY_BACKOFF
+        
+        # До конца паузы событие не захватывается
+        assert process_webhook_batch(db) == 0
+    
+    def test_attempts_exhausted(self, db, monkeypatch):
+        monkeypatch.setattr(salesdrive_webhooks.settings, "SALESDRIVE_WEBHOOK_MAX_ATTEMPTS", 1)
+        bad = _product("B", "Без цены")
+        del bad["price"]
+        _enqueue(db, "bad", bad)
+        
+        process_webhook_batch(db)
+        
+        failed = _event(db, "bad")
+        assert failed.status == SyncStatus.ERROR
+        assert failed.next_attempt_at is None
+        assert failed.error_message
+
+
+class TestClaimHeartbeat:
+    """Продление захвата во время запросов к API."""
+    
+    def test_claim_extended(self, db, db_session_factory, monkeypatch):
+        monkeypatch.setattr(salesdrive_webhooks, "SessionLocal", db_session_factory)
+        _enqueue(db, "claimed", {"id": "1"}, event_type="order.status_changed")
+        event = _event(db, "claimed")
+        db.execute(text(
+            "UPDATE salesdrive_webhook_events "
+            "SET status = 'RUNNING', updated_at = now() - interval '1 hour'"
+        ))
+        db.commit()
+        stale_at = _event(db, "claimed").updated_at
+        
+        heartbeat = salesdrive_webhooks._ClaimHeartbeat([event.id], interval=0.05)
+        with heartbeat:
+            time.sleep(0.3)
+        
+        assert _event(db, "claimed").updated_at > stale_at + timedelta(minutes=30)
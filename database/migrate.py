@@ -142,6 +142,26 @@ class DatabaseMigrator:
         
         return migrations
     
+    def read_sql(self, file_path):
+        """
+        Чтение SQL файла миграции.
+        
+        Строка "\\ir <путь>" (как в psql) заменяется содержимым файла; путь
+        указывается относительно файла миграции. Так миграции подключают DDL
+        функций и триггеров из backend/app/database/sql, который приложение
+        устанавливает и после create_all.
+        """
+        file_path = Path(file_path)
+        lines = []
+        with open(file_path, 'r', encoding='utf-8') as f:
+            for line in f:
+                if line.startswith('\\ir '):
+                    included = file_path.parent / line[4:].strip()
+                    lines.append(self.read_sql(included).rstrip('\n') + '\n')
+                else:
+                    lines.append(line)
+        return ''.join(lines)
+    
     def apply_migration(self, version, file_path):
         """Применение миграции."""
         try:
@@ -150,10 +170,7 @@ class DatabaseMigrator:
             
             print(f"Применение миграции: {version}")
             
-            with open(file_path, 'r', encoding='utf-8') as f:
-                sql = f.read()
-            
-            cursor.execute(sql)
+            cursor.execute(self.read_sql(file_path))
             cursor.execute(
                 "INSERT INTO schema_migrations (version) VALUES (%s)",
                 (version,)
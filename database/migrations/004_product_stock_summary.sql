@@ -0,0 +1,23 @@
+-- Миграция 004: Сводные остатки товаров
+-- Дата: 2026-10-19
+-- Описание: Таблица product_stock_summary, поддерживаемая триггерами на inventory и products
+
+-- Сводные остатки товара по всем локациям
+CREATE TABLE product_stock_summary (
+    product_id UUID PRIMARY KEY REFERENCES products(id) ON DELETE CASCADE,
+    total_quantity INTEGER NOT NULL DEFAULT 0,
+    reserved_quantity INTEGER NOT NULL DEFAULT 0,
+    min_quantity INTEGER NOT NULL DEFAULT 0,
+    locations_count INTEGER NOT NULL DEFAULT 0,
+    stock_status VARCHAR(20) NOT NULL DEFAULT 'out_of_stock',
+    updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+);
+
+CREATE INDEX idx_stock_summary_status_quantity ON product_stock_summary(stock_status, total_quantity);
+CREATE INDEX idx_stock_summary_quantity ON product_stock_summary(total_quantity);
+
+-- Функции и триггеры пересчета (тот же файл устанавливается после create_all)
+\ir ../../backend/app/database/sql/product_stock_summary.sql
+
+-- Заполнение по текущим остаткам
+SELECT refresh_product_stock_summary(ARRAY(SELECT id FROM products));
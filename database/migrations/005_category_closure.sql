@@ -0,0 +1,19 @@
+-- Миграция 005: Замыкание иерархии категорий
+-- Дата: 2026-10-19
+-- Описание: Таблица category_closure, поддерживаемая триггерами на categories
+
+-- Все пары (предок, потомок) с расстоянием; категория - свой предок с depth = 0
+CREATE TABLE category_closure (
+    ancestor_id UUID NOT NULL REFERENCES categories(id) ON DELETE CASCADE,
+    descendant_id UUID NOT NULL REFERENCES categories(id) ON DELETE CASCADE,
+    depth INTEGER NOT NULL,
+    PRIMARY KEY (ancestor_id, descendant_id)
+);
+
+CREATE INDEX idx_category_closure_descendant ON category_closure(descendant_id, depth);
+
+-- Функции и триггеры (тот же файл устанавливается после create_all)
+\ir ../../backend/app/database/sql/category_closure.sql
+
+-- Заполнение по текущей иерархии
+SELECT rebuild_category_closure();
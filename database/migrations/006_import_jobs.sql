@@ -0,0 +1,28 @@
+-- Миграция 006: Фоновые задачи импорта
+-- Дата: 2026-10-19
+-- Описание: Таблица import_jobs с прогрессом и контрольной точкой пакетного импорта
+
+CREATE TABLE import_jobs (
+    id UUID PRIMARY KEY DEFAULT uuid_generate_v4(),
+    source VARCHAR(20) NOT NULL,
+    file_name VARCHAR(255) NOT NULL,
+    file_path TEXT NOT NULL,
+    file_format VARCHAR(20) NOT NULL,
+    file_size BIGINT DEFAULT 0,
+    update_existing BOOLEAN DEFAULT FALSE,
+    status sync_status NOT NULL DEFAULT 'idle',
+    progress INTEGER DEFAULT 0,
+    rows_committed INTEGER DEFAULT 0,
+    result JSONB,
+    error_message TEXT,
+    started_at TIMESTAMP,
+    completed_at TIMESTAMP,
+    created_by UUID REFERENCES users(id),
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+);
+
+CREATE INDEX idx_import_jobs_status ON import_jobs(status, updated_at);
+
+CREATE TRIGGER update_import_jobs_updated_at BEFORE UPDATE ON import_jobs
+    FOR EACH ROW EXECUTE FUNCTION update_updated_at_column();
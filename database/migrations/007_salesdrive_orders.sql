@@ -0,0 +1,101 @@
+-- Миграция 007: Заказы SalesDrive и дневная сводка продаж
+-- Дата: 2026-10-19
+-- Описание: Внешний ID заказов, таблица sales и дневная сводка sales_daily,
+-- пересчет сумм заказов одним запросом на оператор
+
+-- Заказ внешней системы (SalesDrive): ID и время последнего изменения там
+ALTER TABLE orders ADD COLUMN external_id VARCHAR(100) UNIQUE;
+ALTER TABLE orders ADD COLUMN external_updated_at TIMESTAMP;
+
+-- Продажи (таблица описана в моделях, но не создавалась миграциями)
+CREATE TABLE IF NOT EXISTS sales (
+    id UUID PRIMARY KEY DEFAULT uuid_generate_v4(),
+    product_id UUID NOT NULL REFERENCES products(id),
+    quantity INTEGER NOT NULL,
+    unit_price DECIMAL(12,2) NOT NULL,
+    total_amount DECIMAL(12,2) NOT NULL,
+    sale_date TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    customer_name VARCHAR(255),
+    customer_email VARCHAR(100),
+    order_id UUID REFERENCES orders(id),
+    location VARCHAR(100) DEFAULT 'Основной склад',
+    discount_amount DECIMAL(12,2) DEFAULT 0,
+    tax_amount DECIMAL(12,2) DEFAULT 0,
+    payment_method VARCHAR(50),
+    notes TEXT,
+    created_by UUID REFERENCES users(id),
+    created_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP,
+    updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+);
+
+CREATE INDEX IF NOT EXISTS idx_sales_date_product ON sales(sale_date, product_id);
+CREATE INDEX IF NOT EXISTS idx_sales_order ON sales(order_id);
+
+-- Продажи товара за день
+CREATE TABLE sales_daily (
+    product_id UUID NOT NULL REFERENCES products(id) ON DELETE CASCADE,
+    sale_date DATE NOT NULL,
+    quantity INTEGER NOT NULL DEFAULT 0,
+    total_amount DECIMAL(14,2) NOT NULL DEFAULT 0,
+    sales_count INTEGER NOT NULL DEFAULT 0,
+    updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    PRIMARY KEY (product_id, sale_date)
+);
+
+CREATE INDEX idx_sales_daily_date ON sales_daily(sale_date);
+
+-- Функции и триггеры (тот же файл устанавливается после create_all)
+\ir ../../backend/app/database/sql/sales_daily.sql
+
+-- Заполнение по текущим продажам
+SELECT refresh_sales_daily(
+    array_agg(product_id ORDER BY product_id, sale_date),
+    array_agg(sale_date ORDER BY product_id, sale_date)
+)
+FROM (SELECT DISTINCT product_id, sale_date::date AS sale_date FROM sales) k;
+
+-- Сумма заказа пересчитывается один раз на оператор, а не на каждую позицию:
+-- массовая вставка позиций не обновляет заказ тысячи раз
+DROP TRIGGER IF EXISTS update_order_total_trigger ON order_items;
+
+CREATE OR REPLACE FUNCTION refresh_order_totals(p_order_ids UUID[])
+RETURNS void AS $$
+BEGIN
+    UPDATE orders o
+    SET total_amount = COALESCE((
+        SELECT SUM(i.total_amount) FROM order_items i WHERE i.order_id = o.id
+    ), 0)
+    WHERE o.id = ANY(p_order_ids);
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE OR REPLACE FUNCTION sync_order_totals()
+RETURNS TRIGGER AS $$
+BEGIN
+    IF TG_OP = 'INSERT' THEN
+        PERFORM refresh_order_totals(ARRAY(SELECT DISTINCT order_id FROM new_rows));
+    ELSIF TG_OP = 'DELETE' THEN
+        PERFORM refresh_order_totals(ARRAY(SELECT DISTINCT order_id FROM old_rows));
+    ELSE
+        PERFORM refresh_order_totals(ARRAY(
+            SELECT order_id FROM new_rows UNION SELECT order_id FROM old_rows
+        ));
+    END IF;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE TRIGGER order_items_total_insert
+    AFTER INSERT ON order_items
+    REFERENCING NEW TABLE AS new_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION sync_order_totals();
+
+CREATE TRIGGER order_items_total_update
+    AFTER UPDATE ON order_items
+    REFERENCING OLD TABLE AS old_rows NEW TABLE AS new_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION sync_order_totals();
+
+CREATE TRIGGER order_items_total_delete
+    AFTER DELETE ON order_items
+    REFERENCING OLD TABLE AS old_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION sync_order_totals();
@@ -0,0 +1,27 @@
+-- Миграция 008: Очередь webhook событий SalesDrive
+-- Дата: 2026-10-19
+-- Описание: Таблица salesdrive_webhook_events; event_id уникален для отбрасывания повторных доставок,
+-- object_key - товар или заказ события
+
+CREATE TABLE salesdrive_webhook_events (
+    id UUID PRIMARY KEY DEFAULT uuid_generate_v4(),
+    event_id VARCHAR(100) NOT NULL UNIQUE,
+    event_type VARCHAR(50) NOT NULL,
+    event_time TIMESTAMP,
+    object_key VARCHAR(255),
+    payload JSONB NOT NULL,
+    status sync_status NOT NULL DEFAULT 'idle',
+    attempts INTEGER NOT NULL DEFAULT 0,
+    error_message TEXT,
+    next_attempt_at TIMESTAMP,
+    processed_at TIMESTAMP,
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+);
+
+CREATE INDEX idx_webhook_events_status ON salesdrive_webhook_events(status, created_at);
+-- Последнее примененное событие товара или заказа (отбрасывание устаревших событий)
+CREATE INDEX idx_webhook_events_object ON salesdrive_webhook_events(object_key, event_time);
+
+CREATE TRIGGER update_salesdrive_webhook_events_updated_at BEFORE UPDATE ON salesdrive_webhook_events
+    FOR EACH ROW EXECUTE FUNCTION update_updated_at_column();
@@ -0,0 +1,13 @@
+-- Миграция 009: Версии данных для кеша ответов
+-- Дата: 2026-10-19
+-- Описание: Таблица data_versions; версия каталога увеличивается отложенными
+-- триггерами при фиксации транзакций, изменивших товары, остатки,
+-- категории, поставщиков или теги. ETag списков строится по ней.
+
+CREATE TABLE IF NOT EXISTS data_versions (
+    name VARCHAR(50) PRIMARY KEY,
+    version BIGINT NOT NULL DEFAULT 0
+);
+
+-- Функция и триггеры (тот же файл устанавливается после create_all)
+\ir ../../backend/app/database/sql/data_versions.sql